@@ -0,0 +1,134 @@
+"""parser micro-benchmarks over synthetic shaders"""
+# $ python benchmarks/run.py -o bench_output.txt
+import argparse
+import gc
+import io
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import bish  # noqa E402
+from bish import synthetic  # noqa E402
+
+
+class Benchmark:
+    name: str
+    function: Callable[[], None]
+    units: Dict[str, int]
+    # ^ {"unit": count_per_call}
+
+    def __init__(self, name: str, function: Callable[[], None], **units: int):
+        self.name = name
+        self.function = function
+        self.units = units
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} {self.name} @ 0x{id(self):016X}>"
+
+    def time(self, min_time: float = 0.2, repeat: int = 5) -> float:
+        """best seconds per call"""
+        # calibrate
+        loops, elapsed = 1, 0.0
+        while True:
+            elapsed = self.run(loops)
+            if elapsed >= min_time / repeat:
+                break
+            loops *= 2
+        return min(self.run(loops) for i in range(repeat)) / loops
+
+    def run(self, loops: int) -> float:
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for i in range(loops):
+                self.function()
+            return time.perf_counter() - start
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def allocations(self) -> Tuple[int, int]:
+        """(peak_bytes, num_blocks) for one call"""
+        # NOTE: num_blocks is blocks still allocated after the call
+        self.function()  # warm caches
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        self.function()
+        peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        num_blocks = sum(
+            max(0, stat.count_diff)
+            for stat in after.compare_to(before, "lineno"))
+        return peak, num_blocks
+
+
+def benchmarks(num_instructions: int, num_combos: int) -> List[Benchmark]:
+    raw_fxc = synthetic.fxc(num_instructions)
+    fxc = bish.Fxc.from_bytes("synthetic.fxc", raw_fxc)
+    fxc.parse()
+    raw_shex = bytes(fxc.RAW_SHEX)
+    raw_rdef = bytes(fxc.RAW_RDEF)
+    num_tokens = len(raw_shex) // 4
+    num_decoded = len(fxc.SHEX.instructions)
+    raw_vcs = synthetic.archive(num_combos, 4, num_instructions // 4)
+    num_entries = len(bish.Vcs.from_bytes("synthetic.vcs", raw_vcs).namelist())
+
+    def parse_fxc():
+        bish.Fxc.from_bytes("synthetic.fxc", raw_fxc).parse()
+
+    def parse_shex():
+        bish.chunks.Shader_v5.from_stream(io.BytesIO(raw_shex))
+
+    def decode_shex():
+        for instruction in fxc.SHEX.instructions:
+            pass
+
+    def parse_rdef():
+        bish.chunks.ResourceDefinition.from_stream(io.BytesIO(raw_rdef))
+
+    def parse_vcs():
+        bish.Vcs.from_bytes("synthetic.vcs", raw_vcs).parse()
+
+    return [
+        Benchmark("Fxc.parse", parse_fxc, bytes=len(raw_fxc), tokens=num_tokens),
+        Benchmark("Shader_v5.from_stream", parse_shex, bytes=len(raw_shex), tokens=num_tokens),
+        Benchmark("InstructionTable decode", decode_shex, tokens=num_tokens, instructions=num_decoded),
+        Benchmark("ResourceDefinition.from_stream", parse_rdef, bytes=len(raw_rdef)),
+        Benchmark("Vcs.parse", parse_vcs, bytes=len(raw_vcs), entries=num_entries)]
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-o", "--output", help="also write results to this file")
+    parser.add_argument("-n", "--instructions", type=int, default=1024, help="per synthetic shader")
+    parser.add_argument("-c", "--combos", type=int, default=64, help="static combos in synthetic .vcs")
+    parser.add_argument("-t", "--min-time", type=float, default=0.5, help="seconds per benchmark")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks w/ names containing this")
+    args = parser.parse_args(argv)
+    lines = [f"# {args.instructions} instructions, {args.combos} combos, Python {sys.version.split()[0]}"]
+    print(lines[0])
+    for benchmark in benchmarks(args.instructions, args.combos):
+        if args.filter not in benchmark.name:
+            continue
+        seconds = benchmark.time(args.min_time)
+        peak, num_blocks = benchmark.allocations()
+        rates = ", ".join(
+            f"{count / seconds:,.0f} {unit}/s"
+            for unit, count in benchmark.units.items())
+        lines.append(
+            f"{benchmark.name:<32} {seconds * 1000:9.3f} ms | {rates}"
+            f" | peak {peak / 1024:,.1f} KiB, {num_blocks:,} blocks kept")
+        print(lines[-1])
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            output_file.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    main()
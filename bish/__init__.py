@@ -1,13 +1,20 @@
 """Bikkie's Interactive Shader tool"""
 __all__ = [
-    "asm", "chunks", "fxc", "msw", "vcs",
+    "asm", "batch", "buffers", "cache", "chunks", "emulator", "fxc", "index",
+    "msw", "profiling", "vcs",
     "Fxc", "Msw", "Vcs"]
 
 
 from . import asm
+from . import batch
+from . import buffers
+from . import cache
 from . import chunks
+from . import emulator
 from . import fxc
+from . import index
 from . import msw
+from . import profiling
 from . import vcs
 
 from .fxc import Fxc
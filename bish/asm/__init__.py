@@ -1,10 +1,17 @@
 __all__ = [
-    "base", "view",
-    "Instruction", "Opcode", "opcode_for"]
+    "base", "cfg", "dataflow", "index", "table", "view",
+    "ControlFlowGraph", "Dataflow", "Instruction", "InstructionTable", "Opcode", "opcode_for"]
 
 
 from . import base
+from . import cfg
+from . import dataflow
+from . import index
+from . import table
 from . import view
 
 from .base.instructions import FullInstruction as Instruction
 from .base.opcodes import Opcode, opcode_for
+from .cfg import ControlFlowGraph
+from .dataflow import Dataflow
+from .table import InstructionTable
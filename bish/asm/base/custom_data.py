@@ -1,9 +1,10 @@
 from __future__ import annotations
 import enum
 import io
-from typing import List
+from typing import Sequence, Union
 
 from breki.binary import read_struct
+import numpy as np
 
 from . import opcodes
 
@@ -19,7 +20,10 @@ class Type(enum.Enum):
 
 class CustomDataBlock:
     type: Type
-    tokens: List[int]
+    tokens: np.ndarray
+    # ^ uint32; a view of the shader's tokens when decoded from an InstructionTable
+    constants: Union[np.ndarray, None]
+    # ^ (n, 4) uint32 view of tokens; only for DCL_IMMEDIATE_CONSTANT_BUFFER
 
     def __repr__(self) -> str:
         descriptor = f"{self.type.name} {len(self.tokens)} tokens"
@@ -31,10 +35,8 @@ class CustomDataBlock:
     def as_bytes(self) -> bytes:
         opcode = opcodes.D3D_10_0.CUSTOM_DATA
         instruction_token = opcode.value | (self.type.value << 11)
-        return b"".join(map(lambda x: x.to_bytes(4, "little"), [
-            instruction_token,
-            len(self.tokens),
-            *self.tokens]))
+        header = np.array([instruction_token, len(self)], dtype="<u4")
+        return header.tobytes() + self.tokens.astype("<u4").tobytes()
 
     @classmethod
     def from_bytes(cls, raw_block: bytes) -> CustomDataBlock:
@@ -42,17 +44,30 @@ class CustomDataBlock:
 
     @classmethod
     def from_stream(cls, stream: io.BytesIO) -> CustomDataBlock:
+        token, length = read_struct(stream, "2I")
+        assert length >= 2, "invalid custom data length"
+        data_tokens = np.frombuffer(stream.read((length - 2) * 4), dtype="<u4")
+        return cls.from_tokens(np.concatenate([[token, length], data_tokens]).astype(np.uint32))
+
+    @classmethod
+    def from_tokens(cls, tokens: Sequence[int], offset: int = 0) -> CustomDataBlock:
+        """decode the block starting at tokens[offset]
+        uint32 ndarray tokens are sliced, not copied"""
         out = cls()
-        token = read_struct(stream, "I")
+        token = int(tokens[offset])
         opcode = opcodes.opcode_for(token & 0x000003FF)  # [10:00]
         assert opcode == opcodes.D3D_10_0.CUSTOM_DATA
         out.type = Type(token >> 11)  # [32:11]
-        length = read_struct(stream, "I")
+        length = int(tokens[offset + 1])
         assert length >= 2, "invalid custom data length"
-        out.tokens = read_struct(stream, f"{length - 2}I")
-        # TODO: parse tokens (varies by out.type)
+        out.tokens = np.asarray(tokens[offset + 2:offset + length], dtype=np.uint32)
+        out.constants = None
+        if out.type == Type.DCL_IMMEDIATE_CONSTANT_BUFFER:
+            assert len(out.tokens) % 4 == 0, "immediate constant buffer isn't vec4[]"
+            out.constants = out.tokens.reshape(-1, 4)
+            # ^ .view(np.float32) for floats
+        # TODO: parse other tokens (varies by out.type)
         # GOTO: around line 1577 in .hpp reference
-        # -- DCL_IMMEDIATE_CONSTANT_BUFFER => vec4[]
         # -- SHADER_MESSAGE =>
         # --- id, format, len_string,
         # --- num_operands, len_operands, operands
@@ -0,0 +1,471 @@
+# https://github.com/tpn/winsdk-10/blob/master/Include/10.0.10240.0/um/d3d11TokenizedProgramFormat.hpp
+from __future__ import annotations
+import enum
+import struct
+from typing import List, Sequence, Union
+
+from . import extensions
+from . import opcodes
+from . import operands
+
+
+# NOTE: DCL_* instructions don't always follow the usual operand format
+# -- each opcode has it's own layout, so we look up a decoder class for it
+
+
+class Declaration:
+    """DCL_* instruction w/ unknown layout"""
+    opcode: opcodes.Opcode
+    controls: int
+    operands: List[operands.FullOperand]
+    tokens: List[int]
+    # ^ any tokens not covered by other attributes
+
+    def __init__(self, opcode=opcodes.D3D_10_0.DCL_TEMPS, controls=0):
+        self.opcode = opcode
+        self.controls = controls
+        self.operands = list()
+        self.tokens = list()
+
+    def __repr__(self) -> str:
+        descriptor = f"{self.opcode.name} {str(self)!r}"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    def __str__(self) -> str:
+        args = [str(operand) for operand in self.operands]
+        args.extend(f"0x{token:08X}" for token in self.tokens)
+        return " ".join([self.opcode.name.lower(), ", ".join(args)]).strip()
+
+    def as_tokens(self) -> List[int]:
+        """inverse of .from_tokens(); excludes instruction & extension tokens"""
+        return [*self.operand_tokens(), *self.tokens]
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> Declaration:
+        """tokens: all tokens after instruction & extension tokens"""
+        out = cls(instruction.opcode, instruction.controls)
+        out.tokens = list(tokens)
+        return out
+
+    # utilities for subclasses
+    def operand_tokens(self) -> List[int]:
+        return [
+            token
+            for operand in self.operands
+            for token in operand.as_tokens()]
+
+    def read_operand(self, tokens: Sequence[int], offset: int = 0) -> int:
+        """returns offset of the next token"""
+        operand = operands.FullOperand.from_tokens(tokens, offset)
+        self.operands.append(operand)
+        return offset + len(operand)
+
+
+class AccessPattern(enum.Enum):
+    IMMEDIATE_INDEXED = 0
+    DYNAMIC_INDEXED = 1
+
+
+class ConstantBuffer(Declaration):
+    """DCL_CONSTANT_BUFFER"""
+    access_pattern: AccessPattern
+
+    def __str__(self) -> str:
+        return f"dcl_constantbuffer {self.operands[0]}, {self.access_pattern.name}"
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> ConstantBuffer:
+        out = cls(instruction.opcode, instruction.controls)
+        out.access_pattern = AccessPattern(out.controls & 0x01)  # [11]
+        out.read_operand(tokens)
+        return out
+
+
+class Count(Declaration):
+    """DCL_TEMPS etc."""
+    count: int
+
+    def __str__(self) -> str:
+        return f"{self.opcode.name.lower()} {self.count}"
+
+    def as_tokens(self) -> List[int]:
+        return [self.count]
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> Count:
+        out = cls(instruction.opcode, instruction.controls)
+        out.count = tokens[0]
+        return out
+
+
+class ControlsValue(Declaration):
+    """DCL_* w/ a single value stored in instruction controls"""
+    value: int
+
+    def __str__(self) -> str:
+        return f"{self.opcode.name.lower()} {self.value}"
+
+    def as_tokens(self) -> List[int]:
+        return list()
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> ControlsValue:
+        out = cls(instruction.opcode, instruction.controls)
+        out.value = out.controls & 0x7F  # [17:11]
+        return out
+
+
+class GlobalFlags(enum.IntFlag):
+    REFACTORING_ALLOWED = 0x01
+    ENABLE_DOUBLE_PRECISION = 0x02
+    FORCE_EARLY_DEPTH_STENCIL = 0x04
+    ENABLE_RAW_AND_STRUCTURED_BUFFERS = 0x08
+    SKIP_OPTIMIZATION = 0x10
+    ENABLE_MINIMUM_PRECISION = 0x20
+    ENABLE_DOUBLE_EXTENSIONS = 0x40
+    ENABLE_SHADER_EXTENSIONS = 0x80
+
+
+class Flags(Declaration):
+    """DCL_GLOBAL_FLAGS"""
+    flags: GlobalFlags
+
+    def __str__(self) -> str:
+        flags = " | ".join(flag.name for flag in GlobalFlags if flag in self.flags)
+        return f"dcl_globalflags {flags}"
+
+    def as_tokens(self) -> List[int]:
+        return list()
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> Flags:
+        out = cls(instruction.opcode, instruction.controls)
+        out.flags = GlobalFlags(out.controls)  # [23:11]
+        return out
+
+
+class IndexableTemp(Declaration):
+    """DCL_INDEXABLE_TEMP"""
+    register: int
+    count: int
+    num_components: int
+
+    def __str__(self) -> str:
+        return f"dcl_indexabletemp x{self.register}[{self.count}], {self.num_components}"
+
+    def as_tokens(self) -> List[int]:
+        return [self.register, self.count, self.num_components]
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> IndexableTemp:
+        out = cls(instruction.opcode, instruction.controls)
+        out.register, out.count, out.num_components = tokens[:3]
+        return out
+
+
+class IndexRange(Declaration):
+    """DCL_INDEX_RANGE"""
+    count: int
+
+    def __str__(self) -> str:
+        return f"dcl_indexrange {self.operands[0]}, {self.count}"
+
+    def as_tokens(self) -> List[int]:
+        return [*self.operand_tokens(), self.count]
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> IndexRange:
+        out = cls(instruction.opcode, instruction.controls)
+        offset = out.read_operand(tokens)
+        out.count = tokens[offset]
+        return out
+
+
+class Interpolation(enum.Enum):
+    UNDEFINED = 0
+    CONSTANT = 1
+    LINEAR = 2
+    LINEAR_CENTROID = 3
+    LINEAR_NO_PERSPECTIVE = 4
+    LINEAR_NO_PERSPECTIVE_CENTROID = 5
+    LINEAR_SAMPLE = 6
+    LINEAR_NO_PERSPECTIVE_SAMPLE = 7
+
+
+class Register(Declaration):
+    """DCL_INPUT, DCL_OUTPUT etc."""
+
+    def __str__(self) -> str:
+        return f"{self.opcode.name.lower()} {self.operands[0]}"
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> Register:
+        out = cls(instruction.opcode, instruction.controls)
+        out.read_operand(tokens)
+        return out
+
+
+class InputPS(Register):
+    """DCL_INPUT_PS"""
+    interpolation: Interpolation
+
+    def __str__(self) -> str:
+        return f"dcl_input_ps {self.interpolation.name.lower()} {self.operands[0]}"
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> InputPS:
+        out = super(InputPS, cls).from_tokens(instruction, tokens)
+        out.interpolation = Interpolation(out.controls & 0x0F)  # [14:11]
+        return out
+
+
+class Resource(Declaration):
+    """DCL_RESOURCE"""
+    dimension: extensions.ResourceDimension
+    sample_count: int  # for TEXTURE_2D_MS(_ARRAY)
+    return_type: extensions.ReturnControls
+
+    def __str__(self) -> str:
+        return_types = ", ".join(
+            getattr(self.return_type, axis).name
+            for axis in "xyzw")
+        dimension = self.dimension.name.lower()
+        return f"dcl_resource_{dimension} ({return_types}) {self.operands[0]}"
+
+    def as_tokens(self) -> List[int]:
+        return [*self.operand_tokens(), self.return_type.as_int()]
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> Resource:
+        out = cls(instruction.opcode, instruction.controls)
+        out.dimension = extensions.ResourceDimension(out.controls & 0x1F)  # [15:11]
+        out.sample_count = (out.controls >> 5) & 0x7F  # [22:16]
+        offset = out.read_operand(tokens)
+        out.return_type = extensions.ReturnControls.from_controls(tokens[offset])
+        return out
+
+
+class SamplerMode(enum.Enum):
+    DEFAULT = 0
+    COMPARISON = 1
+    MONO = 2
+
+
+class Sampler(Declaration):
+    """DCL_SAMPLER"""
+    mode: SamplerMode
+
+    def __str__(self) -> str:
+        return f"dcl_sampler {self.operands[0]}, mode_{self.mode.name.lower()}"
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> Sampler:
+        out = cls(instruction.opcode, instruction.controls)
+        out.mode = SamplerMode(out.controls & 0x0F)  # [14:11]
+        out.read_operand(tokens)
+        return out
+
+
+class SharedMemory(Declaration):
+    """DCL_THREAD_GROUP_SHARED_MEMORY_*"""
+    stride: int  # 4 for RAW
+    count: int  # number of strides
+
+    def __str__(self) -> str:
+        return f"{self.opcode.name.lower()} {self.operands[0]}, {self.stride}, {self.count}"
+
+    def as_tokens(self) -> List[int]:
+        if self.opcode == opcodes.D3D_11_0.DCL_THREAD_GROUP_SHARED_MEMORY_RAW:
+            return [*self.operand_tokens(), self.count * 4]
+        else:  # STRUCTURED
+            return [*self.operand_tokens(), self.stride, self.count]
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> SharedMemory:
+        out = cls(instruction.opcode, instruction.controls)
+        offset = out.read_operand(tokens)
+        if out.opcode == opcodes.D3D_11_0.DCL_THREAD_GROUP_SHARED_MEMORY_RAW:
+            out.stride = 4
+            out.count = tokens[offset] // 4  # byte count
+        else:  # STRUCTURED
+            out.stride, out.count = tokens[offset:offset + 2]
+        return out
+
+
+class Structured(Declaration):
+    """DCL_RESOURCE_STRUCTURED & DCL_UNORDERED_ACCESS_VIEW_STRUCTURED"""
+    stride: int
+
+    def __str__(self) -> str:
+        return f"{self.opcode.name.lower()} {self.operands[0]}, {self.stride}"
+
+    def as_tokens(self) -> List[int]:
+        return [*self.operand_tokens(), self.stride]
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> Structured:
+        out = cls(instruction.opcode, instruction.controls)
+        offset = out.read_operand(tokens)
+        out.stride = tokens[offset]
+        return out
+
+
+class SystemValueName(enum.Enum):
+    UNDEFINED = 0
+    POSITION = 1
+    CLIP_DISTANCE = 2
+    CULL_DISTANCE = 3
+    RENDER_TARGET_ARRAY_INDEX = 4
+    VIEWPORT_ARRAY_INDEX = 5
+    VERTEX_ID = 6
+    PRIMITIVE_ID = 7
+    INSTANCE_ID = 8
+    IS_FRONT_FACE = 9
+    SAMPLE_INDEX = 10
+    # DirectX 11
+    FINAL_QUAD_U_EQ_0_EDGE_TESSFACTOR = 11
+    FINAL_QUAD_V_EQ_0_EDGE_TESSFACTOR = 12
+    FINAL_QUAD_U_EQ_1_EDGE_TESSFACTOR = 13
+    FINAL_QUAD_V_EQ_1_EDGE_TESSFACTOR = 14
+    FINAL_QUAD_U_INSIDE_TESSFACTOR = 15
+    FINAL_QUAD_V_INSIDE_TESSFACTOR = 16
+    FINAL_TRI_U_EQ_0_EDGE_TESSFACTOR = 17
+    FINAL_TRI_V_EQ_0_EDGE_TESSFACTOR = 18
+    FINAL_TRI_W_EQ_0_EDGE_TESSFACTOR = 19
+    FINAL_TRI_INSIDE_TESSFACTOR = 20
+    FINAL_LINE_DETAIL_TESSFACTOR = 21
+    FINAL_LINE_DENSITY_TESSFACTOR = 22
+
+
+class SystemValue(Declaration):
+    """DCL_INPUT_SIV, DCL_OUTPUT_SGV etc."""
+    name: SystemValueName
+    interpolation: Union[Interpolation, None]  # DCL_INPUT_PS_S*V only
+
+    def __str__(self) -> str:
+        return f"{self.opcode.name.lower()} {self.operands[0]}, {self.name.name.lower()}"
+
+    def as_tokens(self) -> List[int]:
+        return [*self.operand_tokens(), self.name.value]
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> SystemValue:
+        out = cls(instruction.opcode, instruction.controls)
+        offset = out.read_operand(tokens)
+        out.name = SystemValueName(tokens[offset] & 0xFFFF)
+        if out.opcode.name.startswith("DCL_INPUT_PS"):
+            out.interpolation = Interpolation(out.controls & 0x0F)  # [14:11]
+        else:
+            out.interpolation = None
+        return out
+
+
+class TessFactor(Declaration):
+    """DCL_HS_MAX_TESSFACTOR"""
+    max_factor: float
+
+    def __str__(self) -> str:
+        return f"dcl_hs_max_tessfactor {self.max_factor}"
+
+    def as_tokens(self) -> List[int]:
+        return list(struct.unpack("I", struct.pack("f", self.max_factor)))
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> TessFactor:
+        out = cls(instruction.opcode, instruction.controls)
+        out.max_factor = struct.unpack("f", struct.pack("I", tokens[0]))[0]
+        return out
+
+
+class ThreadGroup(Declaration):
+    """DCL_THREAD_GROUP"""
+    x: int
+    y: int
+    z: int
+
+    def __str__(self) -> str:
+        return f"dcl_thread_group {self.x}, {self.y}, {self.z}"
+
+    def as_tokens(self) -> List[int]:
+        return [self.x, self.y, self.z]
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> ThreadGroup:
+        out = cls(instruction.opcode, instruction.controls)
+        out.x, out.y, out.z = tokens[:3]
+        return out
+
+
+class UnorderedAccessView(Declaration):
+    """DCL_UNORDERED_ACCESS_VIEW_TYPED"""
+    dimension: extensions.ResourceDimension
+    is_globally_coherent: bool
+    return_type: extensions.ReturnControls
+
+    def __str__(self) -> str:
+        return_types = ", ".join(
+            getattr(self.return_type, axis).name
+            for axis in "xyzw")
+        dimension = self.dimension.name.lower()
+        return f"dcl_uav_typed_{dimension} ({return_types}) {self.operands[0]}"
+
+    def as_tokens(self) -> List[int]:
+        return [*self.operand_tokens(), self.return_type.as_int()]
+
+    @classmethod
+    def from_tokens(cls, instruction, tokens: Sequence[int]) -> UnorderedAccessView:
+        out = cls(instruction.opcode, instruction.controls)
+        out.dimension = extensions.ResourceDimension(out.controls & 0x1F)  # [15:11]
+        out.is_globally_coherent = bool((out.controls >> 5) & 0x01)  # [16]
+        offset = out.read_operand(tokens)
+        out.return_type = extensions.ReturnControls.from_controls(tokens[offset])
+        return out
+
+
+D3D_10_0 = opcodes.D3D_10_0
+D3D_11_0 = opcodes.D3D_11_0
+
+decoder = {
+    # D3D 10.0
+    D3D_10_0.DCL_RESOURCE: Resource,
+    D3D_10_0.DCL_CONSTANT_BUFFER: ConstantBuffer,
+    D3D_10_0.DCL_SAMPLER: Sampler,
+    D3D_10_0.DCL_INDEX_RANGE: IndexRange,
+    D3D_10_0.DCL_GS_OUTPUT_PRIMITIVE_TOPOLOGY: ControlsValue,
+    D3D_10_0.DCL_GS_INPUT_PRIMITIVE: ControlsValue,
+    D3D_10_0.DCL_MAX_OUTPUT_VERTEX_COUNT: Count,
+    D3D_10_0.DCL_INPUT: Register,
+    D3D_10_0.DCL_INPUT_SGV: SystemValue,
+    D3D_10_0.DCL_INPUT_SIV: SystemValue,
+    D3D_10_0.DCL_INPUT_PS: InputPS,
+    D3D_10_0.DCL_INPUT_PS_SGV: SystemValue,
+    D3D_10_0.DCL_INPUT_PS_SIV: SystemValue,
+    D3D_10_0.DCL_OUTPUT: Register,
+    D3D_10_0.DCL_OUTPUT_SGV: SystemValue,
+    D3D_10_0.DCL_OUTPUT_SIV: SystemValue,
+    D3D_10_0.DCL_TEMPS: Count,
+    D3D_10_0.DCL_INDEXABLE_TEMP: IndexableTemp,
+    D3D_10_0.DCL_GLOBAL_FLAGS: Flags,
+    # D3D 11.0
+    D3D_11_0.DCL_STREAM: Register,
+    D3D_11_0.DCL_FUNCTION_BODY: Count,
+    D3D_11_0.DCL_FUNCTION_TABLE: Declaration,
+    D3D_11_0.DCL_INTERFACE: Declaration,
+    D3D_11_0.DCL_INPUT_CONTROL_POINT_COUNT: ControlsValue,
+    D3D_11_0.DCL_OUTPUT_CONTROL_POINT_COUNT: ControlsValue,
+    D3D_11_0.DCL_TESS_DOMAIN: ControlsValue,
+    D3D_11_0.DCL_TESS_PARTITIONING: ControlsValue,
+    D3D_11_0.DCL_TESS_OUTPUT_PRIMITIVE: ControlsValue,
+    D3D_11_0.DCL_HS_MAX_TESSFACTOR: TessFactor,
+    D3D_11_0.DCL_HS_FORK_PHASE_INSTANCE_COUNT: Count,
+    D3D_11_0.DCL_HS_JOIN_PHASE_INSTANCE_COUNT: Count,
+    D3D_11_0.DCL_THREAD_GROUP: ThreadGroup,
+    D3D_11_0.DCL_UNORDERED_ACCESS_VIEW_TYPED: UnorderedAccessView,
+    D3D_11_0.DCL_UNORDERED_ACCESS_VIEW_RAW: Register,
+    D3D_11_0.DCL_UNORDERED_ACCESS_VIEW_STRUCTURED: Structured,
+    D3D_11_0.DCL_THREAD_GROUP_SHARED_MEMORY_RAW: SharedMemory,
+    D3D_11_0.DCL_THREAD_GROUP_SHARED_MEMORY_STRUCTURED: SharedMemory,
+    D3D_11_0.DCL_RESOURCE_RAW: Register,
+    D3D_11_0.DCL_RESOURCE_STRUCTURED: Structured,
+    D3D_11_0.DCL_GS_INSTANCE_COUNT: Count}
+# ^ {opcode: DeclarationClass}
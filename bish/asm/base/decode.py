@@ -0,0 +1,52 @@
+"""memoized token decoding"""
+# NOTE: shaders reuse a tiny set of distinct tokens
+# -- so we decode each distinct token once & share the result
+# -- shared tokens are read-only, DO NOT modify them!
+from __future__ import annotations
+import functools
+from typing import Dict
+
+from . import extensions
+from . import instructions
+from . import operands
+
+
+@functools.lru_cache(maxsize=4096)
+def instruction(token: int) -> instructions.Instruction:
+    return instructions.Instruction.from_token(token)
+
+
+@functools.lru_cache(maxsize=4096)
+def operand(token: int) -> operands.Operand:
+    return operands.Operand.from_token(token)
+
+
+@functools.lru_cache(maxsize=256)
+def extension(token: int) -> extensions.Extension:
+    return extensions.Extension.from_token(token)
+
+
+caches = {
+    "instruction": instruction,
+    "operand": operand,
+    "extension": extension}
+# ^ {"name": lru_cache_function}
+
+
+def cache_clear():
+    for cached_function in caches.values():
+        cached_function.cache_clear()
+
+
+def cache_info() -> Dict[str, functools._CacheInfo]:
+    return {
+        name: cached_function.cache_info()
+        for name, cached_function in caches.items()}
+
+
+def hit_rates() -> Dict[str, float]:
+    out = dict()
+    for name, info in cache_info().items():
+        lookups = info.hits + info.misses
+        out[name] = info.hits / lookups if lookups > 0 else 0.0
+    return out
@@ -16,6 +16,11 @@ def controls_for(type_: Type, controls: int):
         Type.RETURN: ReturnControls}[type_].from_controls(controls)
 
 
+def signed(value: int, bits: int) -> int:
+    """two's complement"""
+    return value - (1 << bits) if value & (1 << (bits - 1)) else value
+
+
 class Type(enum.Enum):
     EMPTY = 0x00
     SAMPLE = 0x01  # texel offsets
@@ -40,11 +45,12 @@ class Extension(tokens.Token):
             f"is_extended={self.is_extended}"])
         return f"{self.__class__.__name__}({args})"
 
-    def as_token(self) -> int:
+    def as_int(self) -> int:
+        controls = 0 if self.controls is None else self.controls.as_int()
         return functools.reduce(
             lambda a, b: a | b, [
                 self.type.value << 0,
-                self.controls.as_int() << 6,
+                controls << 6,
                 int(self.is_extended) << 31])
 
     @classmethod
@@ -75,18 +81,22 @@ class SampleControls:
         return f"{self.__class__.__name__}({args})"
 
     def as_int(self) -> int:
-        raise NotImplementedError()
+        return functools.reduce(
+            lambda a, b: a | b, [
+                (self.u_offset & 0x0F) << 0x09,
+                (self.v_offset & 0x0F) << 0x0D,
+                (self.w_offset & 0x0F) << 0x11]) >> 6
 
     @classmethod
     def from_controls(cls, controls: int) -> SampleControls:
         out = cls()
         controls = controls << 6  # [30:06]
-        assert controls & 0x000000E0 == 0  # [08:06]
-        # TODO: handle 2's complement
-        out.u_offset = controls & 0x00000F00 >> 0x08  # [12:09]
-        out.v_offset = controls & 0x0000F000 >> 0x0C  # [16:13]
-        out.w_offset = controls & 0x000F0000 >> 0x10  # [20:17]
-        assert controls & 0x3FF00000 == 0  # [30:21]
+        assert controls & 0x000001C0 == 0  # [08:06]
+        # NOTE: offsets are 4-bit signed integers [-8, 7]
+        out.u_offset = signed((controls & 0x00001E00) >> 0x09, 4)  # [12:09]
+        out.v_offset = signed((controls & 0x0001E000) >> 0x0D, 4)  # [16:13]
+        out.w_offset = signed((controls & 0x001E0000) >> 0x11, 4)  # [20:17]
+        assert controls & 0x7FE00000 == 0  # [30:21]
         return out
 
 
@@ -113,7 +123,7 @@ class DimensionControls:
 
     def __init__(self, dimension=ResourceDimension.UNKNOWN, stride=0):
         self.dimension = dimension
-        self.stride = 0
+        self.stride = stride
 
     def __repr__(self) -> str:
         args = ", ".join([
@@ -122,14 +132,14 @@ class DimensionControls:
         return f"{self.__class__.__name__}({args})"
 
     def as_int(self) -> int:
-        ...
+        return ((self.dimension.value << 0x06) | (self.stride << 0x0B)) >> 6
 
     @classmethod
-    def from_controls(cls, controls: int) -> SampleControls:
+    def from_controls(cls, controls: int) -> DimensionControls:
         out = cls()
         controls = controls << 6  # [30:06]
-        out.dimension = ResourceDimension(controls & 0x000007C0 >> 0x06)  # [10:06]
-        out.stride = controls & 0x007FF800 >> 0x0A  # [22:11]
+        out.dimension = ResourceDimension((controls & 0x000007C0) >> 0x06)  # [10:06]
+        out.stride = (controls & 0x007FF800) >> 0x0B  # [22:11]
         # if out.dimension != ResourceDimension.STRUCTURED_BUFFER:
         #     assert out.stride == 0
         assert controls & 0x7F800000 == 0  # [30:23]
@@ -174,11 +184,11 @@ class ReturnControls:
                 self.w.value << 0x0C])
 
     @classmethod
-    def from_controls(cls, controls: int) -> SampleControls:
+    def from_controls(cls, controls: int) -> ReturnControls:
         out = cls()
-        out.x = ReturnType(controls & 0x000F >> 0x00)
-        out.y = ReturnType(controls & 0x00F0 >> 0x04)
-        out.z = ReturnType(controls & 0x0F00 >> 0x08)
-        out.w = ReturnType(controls & 0xF000 >> 0x0C)
+        out.x = ReturnType((controls & 0x000F) >> 0x00)
+        out.y = ReturnType((controls & 0x00F0) >> 0x04)
+        out.z = ReturnType((controls & 0x0F00) >> 0x08)
+        out.w = ReturnType((controls & 0xF000) >> 0x0C)
         assert controls >> 16 == 0
         return out
@@ -2,11 +2,15 @@
 from __future__ import annotations
 import functools
 import io
-from typing import List, Union
+import struct
+from typing import List, Sequence, Union
 
 from breki.binary import read_struct
+import numpy as np
 
 from . import custom_data
+from . import declarations
+from . import decode
 from . import extensions
 from . import opcodes
 from . import operands
@@ -18,16 +22,25 @@ class FullInstruction:
     instruction: Instruction
     custom_data: Union[custom_data.CustomDataBlock, None]
     # ^ only used if opcode is D3D_10_0.CUSTOM_DATA
+    declaration: Union[declarations.Declaration, None]
+    # ^ only used if opcode is DCL_*
     extensions: List[extensions.Extension]
-    operands: List[int]
+    operands: List[operands.FullOperand]
+    tokens: Union[Sequence[int], None]
+    # ^ raw tokens this instruction was decoded from
+    error: Union[Exception, None]
+    # ^ why operands / declaration failed to decode; as_tokens() re-uses .tokens
 
     def __init__(self):
         instruction = Instruction()
         self.opcode = instruction.opcode
         self.instruction = instruction
         self.custom_data = None
+        self.declaration = None
         self.extensions = list()
         self.operands = list()
+        self.tokens = None
+        self.error = None
 
     def __repr__(self) -> str:
         details = [f"(0x{self.opcode.value:02X}) {self.opcode.name}"]
@@ -36,7 +49,7 @@ class FullInstruction:
         if self.opcode != opcodes.D3D_10_0.CUSTOM_DATA:
             descriptor = f"{len(self.operands)} operands"
         else:  # mimic CustomDataBlock repr
-            details.append(f"{len(self.custom_data.tokens) - 2} tokens")
+            details.append(f"{len(self.custom_data.tokens)} tokens")
         descriptor = " ".join(details)
         return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
 
@@ -49,55 +62,80 @@ class FullInstruction:
     # TODO: as_bytes(self) -> bytes:
 
     def as_tokens(self) -> List[int]:
-        return [
-            self.instruction.as_int(),
-            *[
-                extension.as_int()
-                for extension in self.extensions],
-            # *[
-            #     operand.as_tokens()
-            #     for operand in self.operands]]
-            *self.operands]
+        if self.custom_data is not None:
+            return np.frombuffer(self.custom_data.as_bytes(), dtype="<u4").tolist()
+        if self.error is not None:  # couldn't decode, can't encode
+            return [int(token) for token in self.tokens]
+        extension_tokens = [extension.as_int() for extension in self.extensions]
+        if self.declaration is not None:
+            operand_tokens = self.declaration.as_tokens()
+        else:
+            operand_tokens = [
+                token
+                for operand in self.operands
+                for token in operand.as_tokens()]
+        length = 1 + len(extension_tokens) + len(operand_tokens)
+        # NOTE: length is recalculated, in case operands were edited
+        instruction_token = (self.instruction.as_int() & ~0x7F000000) | (length << 24)
+        return [instruction_token, *extension_tokens, *operand_tokens]
 
     @classmethod
     def from_bytes(cls, raw_tokens: bytes) -> FullInstruction:
         out = cls.from_stream(io.BytesIO(raw_tokens))
-        assert len(raw_tokens) == out.length
+        assert len(raw_tokens) == len(out) * 4
         return out
 
     @classmethod
     def from_stream(cls, stream: io.BytesIO) -> FullInstruction:
+        start = stream.tell()
+        token = read_struct(stream, "I")
+        length = decode.instruction(token).length
+        if opcodes.opcode_for(token & 0x000003FF) == opcodes.D3D_10_0.CUSTOM_DATA:
+            length = read_struct(stream, "I")
+        stream.seek(start)
+        instruction_tokens = struct.unpack(f"{length}I", stream.read(length * 4))
+        return cls.from_tokens(instruction_tokens)
+
+    @classmethod
+    def from_tokens(cls, tokens: Sequence[int], offset: int = 0) -> FullInstruction:
+        """decode the instruction starting at tokens[offset]"""
         out = cls()
         # instruction
-        token = read_struct(stream, "I")
-        out.instruction = Instruction.from_token(token)
+        out.instruction = decode.instruction(tokens[offset])
         out.opcode = out.instruction.opcode
         if out.opcode == opcodes.D3D_10_0.CUSTOM_DATA:
             assert not out.instruction.is_extended
-            stream.seek(-4, 1)  # go back 1 token
-            out.custom_data = custom_data.CustomDataBlock.from_stream(stream)
-            # TODO: confirm CustomDataBlock consumes full length
+            out.custom_data = custom_data.CustomDataBlock.from_tokens(tokens, offset)
+            out.tokens = tokens[offset:offset + len(out.custom_data)]
             return out
+        cursor = offset + 1
         # extensions
         prev_token = out.instruction
         while prev_token.is_extended:
-            prev_token = extensions.Extension.from_stream(stream)
+            prev_token = decode.extension(tokens[cursor])
             out.extensions.append(prev_token)
-        # operands
-        num_operand_tokens = out.instruction.length - len(out.extensions) - 1
-        operand_tokens = [
-            read_struct(stream, "I")
-            for i in range(num_operand_tokens)]
-        # NOTE: DCL_* operands use a different format
+            cursor += 1
+        end = offset + out.instruction.length
+        out.tokens = tokens[offset:end]
         try:
-            offset = 0
-            while offset < num_operand_tokens:
-                operand = operands.FullOperand.from_tokens(operand_tokens[offset:])
-                offset += len(operand)
+            # declaration
+            if out.opcode in declarations.decoder:
+                # NOTE: DCL_* operands use a different format
+                decoder = declarations.decoder[out.opcode]
+                out.declaration = decoder.from_tokens(out.instruction, tokens[cursor:end])
+                out.operands = out.declaration.operands
+                return out
+            # operands
+            while cursor < end:
+                operand = operands.FullOperand.from_tokens(tokens, cursor)
+                cursor += len(operand)
                 out.operands.append(operand)
-        except Exception:
-            # NOTE: silencing errors like this is bad practice
-            out.operands = operand_tokens
+            assert cursor == end, "operands overshot instruction length"
+        except Exception as exc:
+            # NOTE: degrade to raw tokens, so one bad instruction doesn't fail a full parse
+            out.declaration = None
+            out.operands = list()
+            out.error = exc
         return out
 
 
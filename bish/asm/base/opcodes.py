@@ -8,14 +8,8 @@ from typing import Union
 
 
 def opcode_for(value: int):
-    all_opcodes = {
-        opcode.value: opcode
-        for opcode in [
-            *D3D_10_0, *D3D_10_1,
-            *D3D_11_0, *D3D_11_1,
-            *WDDM_1_3]}
-    if value in all_opcodes:
-        return all_opcodes[value]
+    if value in opcode_table:
+        return opcode_table[value]
     else:
         raise RuntimeError(f"Invalid Opcode Value: 0x{value:02X}")
 
@@ -277,3 +271,11 @@ class WDDM_1_3(enum.Enum):
 
 
 Opcode = Union[D3D_10_0, D3D_10_1, D3D_11_0, D3D_11_1, WDDM_1_3]
+
+opcode_table = {
+    opcode.value: opcode
+    for opcode in [
+        *D3D_10_0, *D3D_10_1,
+        *D3D_11_0, *D3D_11_1,
+        *WDDM_1_3]}
+# ^ {value: opcode}
@@ -1,12 +1,12 @@
 # https://github.com/tpn/winsdk-10/blob/master/Include/10.0.10240.0/um/d3d11TokenizedProgramFormat.hpp#L690
 from __future__ import annotations
 import enum
+import functools
 import io
 import struct
-from typing import List, Tuple, Union
-
-from breki.binary import read_struct
+from typing import List, Sequence, Tuple, Union
 
+from . import decode
 from . import tokens
 # from . import opcodes
 
@@ -18,21 +18,32 @@ from . import tokens
 
 class FullOperand:
     type: Type
+    num_components: NumComponents
     selection_mode: Union[SelectionMode, None]
     mask: Union[Mask, None]
-    swizzle: Union[List[Name], None]
+    swizzle: Union[Tuple[Name, Name, Name, Name], None]
     name: Union[Name, None]
     index_representations: List[IndexRepresentation]
     indices: List[Tuple[Union[int, None], Union[FullOperand, None]]]
     # ^ [(imm, rel)]
+    # extended operand
+    is_extended: bool
+    modifier: Modifier
+    min_precision: MinPrecision
+    is_non_uniform: bool
 
     def __init__(self):
+        self.num_components = NumComponents.ZERO
         self.selection_mode = None
         self.mask = None
         self.swizzle = None
         self.name = None
         self.index_representations = list()
         self.indices = list()
+        self.is_extended = False
+        self.modifier = Modifier.NONE
+        self.min_precision = MinPrecision.DEFAULT
+        self.is_non_uniform = False
 
     def __repr__(self) -> str:
         # TODO: 4x Immediate Values
@@ -45,18 +56,22 @@ class FullOperand:
         swizzle_str = self.swizzle_str()
         if swizzle_str not in (None, "."):
             out += swizzle_str.lower()
+        if self.modifier in (Modifier.ABS, Modifier.ABS_NEG):
+            out = f"|{out}|"
+        if self.modifier in (Modifier.NEG, Modifier.ABS_NEG):
+            out = f"-{out}"
         return out
 
     def __len__(self) -> int:
         num_index_tokens = 0
         for i, index_repr in enumerate(self.index_representations):
-            if index_repr.name.startswith("IMM32"):
+            if index_repr in imm32_representations:
                 num_index_tokens += 1
-            elif index_repr.name.startswith("IMM64"):
+            elif index_repr in imm64_representations:
                 num_index_tokens += 2
-            if index_repr.name.endswith("REL"):
+            if index_repr in rel_representations:
                 num_index_tokens += len(self.indices[i][1])
-        return 1 + num_index_tokens
+        return 1 + int(self.is_extended) + num_index_tokens
 
     def swizzle_str(self) -> str:
         if self.selection_mode is None:
@@ -71,21 +86,79 @@ class FullOperand:
             raise RuntimeError("Invalid Selection Mode")
         return f".{swizzle}"
 
+    def as_tokens(self) -> List[int]:
+        """inverse of .from_tokens()"""
+        token = self.num_components.value | (self.type.value << 12)
+        if self.selection_mode is not None:
+            token |= self.selection_mode.value << 2
+            if self.selection_mode == SelectionMode.MASK:
+                token |= self.mask.value << 4
+            elif self.selection_mode == SelectionMode.SWIZZLE:
+                for i, name in enumerate(self.swizzle):
+                    token |= name.value << (4 + 2 * i)
+            elif self.selection_mode == SelectionMode.SELECT_1:
+                token |= self.name.value << 4
+        if self.type not in (Type.IMMEDIATE_32, Type.IMMEDIATE_64):
+            # NOTE: immediates don't have an index dimension, see .from_tokens()
+            token |= len(self.index_representations) << 20
+            for i, index_repr in enumerate(self.index_representations):
+                token |= index_repr.value << (22 + 3 * i)
+        token |= int(self.is_extended) << 31
+        out = [token]
+        if self.is_extended:
+            out.append(functools.reduce(
+                lambda a, b: a | b, [
+                    ExtendedType.MODIFIER.value,
+                    self.modifier.value << 6,
+                    self.min_precision.value << 14,
+                    int(self.is_non_uniform) << 17]))
+        for index_repr, (imm, rel) in zip(self.index_representations, self.indices):
+            if index_repr in imm32_representations:
+                out.append(imm)
+            elif index_repr in imm64_representations:
+                hi32, lo32 = imm >> 32, imm & 0xFFFFFFFF
+                out.extend([lo32, hi32] if self.type == Type.IMMEDIATE_64 else [hi32, lo32])
+            if index_repr in rel_representations:
+                out.extend(rel.as_tokens())
+        return out
+
     @classmethod
     def from_bytes(cls, raw_tokens: bytes) -> FullOperand:
         return cls.from_stream(io.BytesIO(raw_tokens))
 
     @classmethod
     def from_stream(cls, stream: io.BytesIO) -> FullOperand:
+        start = stream.tell()
+        raw_tokens = stream.read(max_tokens * 4)
+        num_tokens = len(raw_tokens) // 4
+        operand_tokens = struct.unpack(f"{num_tokens}I", raw_tokens[:num_tokens * 4])
+        out = cls.from_tokens(operand_tokens)
+        stream.seek(start + len(out) * 4)
+        return out
+
+    @classmethod
+    def from_tokens(cls, tokens: Sequence[int], offset: int = 0) -> FullOperand:
+        """decode the operand starting at tokens[offset]"""
         out = cls()
-        operand = Operand.from_stream(stream)
+        operand = decode.operand(tokens[offset])
+        cursor = offset + 1
         out.type = operand.type
+        out.num_components = operand.num_components
         out.selection_mode = operand.selection_mode
         out.mask = operand.mask
         out.swizzle = operand.swizzle
         out.name = operand.name
-        out.index_representations = operand.index_representations
-        assert not operand.is_extended, "Extended Operand Not Yet Implemented"
+        out.index_representations = list(operand.index_representations)
+        out.is_extended = operand.is_extended
+        if out.is_extended:
+            extended_token = tokens[cursor]
+            cursor += 1
+            extended_type = ExtendedType(extended_token & 0x3F)  # [05:00]
+            if extended_type == ExtendedType.MODIFIER:
+                out.modifier = Modifier((extended_token >> 6) & 0xFF)  # [13:06]
+                out.min_precision = MinPrecision((extended_token >> 14) & 0x07)  # [16:14]
+                out.is_non_uniform = bool((extended_token >> 17) & 0x01)  # [17]
+            assert not extended_token >> 31, "multiple extended operand tokens"
         if out.type == Type.IMMEDIATE_32:
             out.index_representations = [IndexRepresentation.IMM32]
             # 4x immediate values
@@ -93,41 +166,45 @@ class FullOperand:
                 out.index_representations *= 4
         elif out.type == Type.IMMEDIATE_64:
             out.index_representations = [IndexRepresentation.IMM64]
+            # 2x immediate values (doubles fill 2 components each)
+            if out.selection_mode == SelectionMode.MASK and out.mask == Mask(0):
+                out.index_representations *= 2
         for index_repr in out.index_representations:
             imm, rel = None, None
-            if index_repr.name.startswith("IMM32"):
-                imm = read_struct(stream, "I")
-            elif index_repr.name.startswith("IMM64"):
-                hi32, lo32 = read_struct(stream, "2I")
+            if index_repr in imm32_representations:
+                imm = tokens[cursor]
+                cursor += 1
+            elif index_repr in imm64_representations:
+                hi32, lo32 = tokens[cursor:cursor + 2]
+                if out.type == Type.IMMEDIATE_64:  # little-endian double
+                    lo32, hi32 = hi32, lo32
                 imm = (hi32 << 32) | lo32
-            if index_repr.name.endswith("REL"):
-                rel = FullOperand.from_stream(stream)
-                assert all("REL" not in ir.name for ir in rel.index_representations)
+                cursor += 2
+            if index_repr in rel_representations:
+                rel = FullOperand.from_tokens(tokens, cursor)
+                assert all(ir not in rel_representations for ir in rel.index_representations)
+                cursor += len(rel)
             out.indices.append((imm, rel))
         return out
 
-    @classmethod
-    def from_tokens(cls, tokens: List[int]) -> FullOperand:
-        return cls.from_bytes(b"".join([
-            token.to_bytes(4, "little")
-            for token in tokens]))
-
 
 class Operand(tokens.Token):
     type: Type
+    num_components: NumComponents
     selection_mode: Union[SelectionMode, None]
     mask: Union[Mask, None]
-    swizzle: Union[List[Name], None]
+    swizzle: Union[Tuple[Name, Name, Name, Name], None]
     name: Union[Name, None]
-    index_representations: List[IndexRepresentation]
+    index_representations: Tuple[IndexRepresentation, ...]
     is_extended: bool
+    # NOTE: tuples, since decoded Operands are shared (see decode.operand)
 
     def __init__(self):
         self.selection_mode = None
         self.mask = None
         self.swizzle = None
         self.name = None
-        self.index_representations = list()
+        self.index_representations = tuple()
 
     def __repr__(self) -> str:
         descriptor = self.swizzle_str()
@@ -151,27 +228,25 @@ class Operand(tokens.Token):
         out = cls()
         out.type = Type((token & 0x000FF000) >> 12)  # [19:12]
         num_components = NumComponents((token & 0x00000003) >> 0)  # [01:00]
+        out.num_components = num_components
         if num_components == NumComponents.FOUR:
             out.selection_mode = SelectionMode((token & 0x0000000C) >> 2)  # [03:02]
             if out.selection_mode == SelectionMode.MASK:
                 out.mask = Mask((token & 0x000000F0) >> 4)  # [07:04]
             elif out.selection_mode == SelectionMode.SWIZZLE:
-                out.swizzle = [  # [11:04]
+                out.swizzle = (  # [11:04]
                     Name((token & 0x00000030) >> 0x04),
                     Name((token & 0x000000C0) >> 0x06),
                     Name((token & 0x00000300) >> 0x08),
-                    Name((token & 0x00000C00) >> 0x0C)]
+                    Name((token & 0x00000C00) >> 0x0A))
             elif out.selection_mode == SelectionMode.SELECT_1:
-                out.name = Name((token & 0x00000300) >> 4)  # [05:04]
+                out.name = Name((token & 0x00000030) >> 4)  # [05:04]
         index_dimension = (token & 0x00300000) >> 20  # [21:20]
-        for i in range(index_dimension):
-            shift = 22 + 3 * i
-            mask = 0x03 << shift
-            index_repr = IndexRepresentation((token & mask) >> shift)
-            out.index_representations.append(index_repr)
+        out.index_representations = tuple(
+            IndexRepresentation((token >> (22 + 3 * i)) & 0x07)  # [24:22], [27:25], [30:28]
+            for i in range(index_dimension))
         out.is_extended = bool(token >> 31)  # [31]
         # cleanup assertions
-        # NOTE: breaking for DCL_TEMPS
         if num_components in (NumComponents.ZERO, NumComponents.ONE):
             assert (token & 0x00000FFC) >> 2 == 0
         assert num_components != NumComponents.N
@@ -233,31 +308,39 @@ class Type(enum.Enum):
     CYCLE_COUNTER = 0x28
 
 
+def index_str(imm: Union[int, None], rel: Union[FullOperand, None]) -> str:
+    """e.g. "3" or "r0.x + 3" (like fxc)"""
+    if rel is None:
+        return f"{imm}"
+    return f"{rel} + {imm or 0}"
+
+
 def register_name(type_: Type, indices) -> str:
     chars = {
         Type.CONSTANT_BUFFER: "cb",
         Type.INPUT: "v",  # vertex attribute (in a pixel shader)
+        Type.OUTPUT: "o",  # render target (in a pixel shader)
         Type.RESOURCE: "t",  # texture (in a SAMPLE call)
         Type.SAMPLER: "s",  # texture sampler register
         Type.TEMP: "r",  # temp register
     }
     if type_ in (Type.IMMEDIATE_32, Type.IMMEDIATE_64):
         out = list()
+        size, format_ = (4, "f") if type_ == Type.IMMEDIATE_32 else (8, "d")
         for imm, rel in indices:
-            float_val = struct.unpack("f", imm.to_bytes(4, "little"))[0]
+            float_val = struct.unpack(format_, imm.to_bytes(size, "little"))[0]
             # out.append(f"0x{imm:08X} ({float_val:.06f})")
             out.append(f"{float_val:.06f}")
         return f'({", ".join(out)})'
-    # TODO: IMMEDIATE_CONSTANT_BUFFER
+    if type_ == Type.IMMEDIATE_CONSTANT_BUFFER:
+        return f"icb[{index_str(*indices[0])}]"
     if len(indices) == 1:
         index = indices[0][0]  # IMM, not REL
         return f"{chars.get(type_, type_.name + ' ')}{index}"
     elif len(indices) == 2 and type_ == Type.CONSTANT_BUFFER:
-        # assuming DCL_CONSTANT_BUFFER w/ immediateIndexed AccessPattern
-        return f"cb{indices[0][0]}[{indices[1][0]}]"
+        return f"cb{indices[0][0]}[{index_str(*indices[1])}]"
     else:
-        print(f"{type_.name}: {indices=}")
-        raise RuntimeError()
+        raise RuntimeError(f"can't name {type_.name} register w/ {len(indices)} indices")
 
 
 class IndexRepresentation(enum.Enum):
@@ -268,6 +351,44 @@ class IndexRepresentation(enum.Enum):
     IMM64_PLUS_REL = 0x04  # +2 tokens, +1 operand
 
 
+imm32_representations = {
+    IndexRepresentation.IMM32,
+    IndexRepresentation.IMM32_PLUS_REL}
+
+imm64_representations = {
+    IndexRepresentation.IMM64,
+    IndexRepresentation.IMM64_PLUS_REL}
+
+rel_representations = {
+    IndexRepresentation.REL,
+    IndexRepresentation.IMM32_PLUS_REL,
+    IndexRepresentation.IMM64_PLUS_REL}
+
+max_tokens = 2 + 3 * (2 + 2 + 3)
+# ^ extended operand w/ 3x IMM64_PLUS_REL indices
+# -- each relative operand is also extended, w/ 3x IMM32 indices
+
+
+class ExtendedType(enum.Enum):
+    EMPTY = 0x00
+    MODIFIER = 0x01
+
+
+class Modifier(enum.Enum):
+    NONE = 0x00
+    NEG = 0x01
+    ABS = 0x02
+    ABS_NEG = 0x03
+
+
+class MinPrecision(enum.Enum):
+    DEFAULT = 0x00
+    FLOAT_16 = 0x01
+    FLOAT_2_8 = 0x02
+    SINT_16 = 0x04
+    UINT_16 = 0x05
+
+
 class Mask(enum.IntFlag):
     X = 0x01  # R
     Y = 0x02  # G
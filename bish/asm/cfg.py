@@ -0,0 +1,334 @@
+"""control flow graph over an InstructionTable"""
+from __future__ import annotations
+from typing import Dict, List, Set, Tuple, Union
+
+import numpy as np
+
+from .base import opcodes
+from .table import InstructionTable
+
+
+D = opcodes.D3D_10_0
+
+starts_block = {
+    D.CASE, D.DEFAULT, D.END_IF, D.END_SWITCH, D.LABEL, D.LOOP}
+# ^ jump targets
+ends_block = {
+    D.BREAK, D.BREAK_C, D.CALL, D.CALL_C, D.CONTINUE, D.CONTINUE_C,
+    D.ELSE, D.END_LOOP, D.IF, D.RET, D.RET_C, D.SWITCH}
+# ^ jumps
+unconditional = {
+    D.BREAK, D.CONTINUE, D.ELSE, D.END_LOOP, D.RET, D.SWITCH}
+# ^ never fall through to the next block
+flow_control = starts_block | ends_block
+
+
+class BasicBlock:
+    index: int
+    start: int  # first instruction
+    stop: int  # last instruction + 1
+    successors: List[int]
+    predecessors: List[int]
+    function: int  # index of entry block
+
+    def __init__(self, index: int, start: int, stop: int):
+        self.index = index
+        self.start = start
+        self.stop = stop
+        self.successors = list()
+        self.predecessors = list()
+        self.function = -1  # unreachable
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __repr__(self) -> str:
+        descriptor = f"#{self.index} [{self.start}:{self.stop}] -> {self.successors}"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+
+class Loop:
+    header: int  # block index
+    blocks: Set[int]
+    parent: Union[Loop, None]
+    children: List[Loop]
+
+    def __init__(self, header: int):
+        self.header = header
+        self.blocks = {header}
+        self.parent = None
+        self.children = list()
+
+    def __repr__(self) -> str:
+        descriptor = f"@ block #{self.header} {len(self.blocks)} blocks depth {self.depth}"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    @property
+    def depth(self) -> int:
+        return 1 if self.parent is None else self.parent.depth + 1
+
+
+class ControlFlowGraph:
+    blocks: List[BasicBlock]
+    starts: np.ndarray  # first instruction of each block, for lookups
+    entries: Dict[Union[int, None], int]
+    # ^ {label_index: block_index}; None is the main program
+    calls: List[Tuple[int, int]]
+    # ^ [(caller_block, callee_block)]
+    idom: List[int]
+    # ^ immediate dominator of each block; -1 for entries & unreachable blocks
+    loops: List[Loop]  # outermost first
+    loop_of: List[Union[Loop, None]]  # innermost loop of each block
+    # dominator tree numbering, for O(1) .dominates()
+    pre: List[int]
+    post: List[int]
+
+    def __init__(self):
+        self.blocks = list()
+        self.starts = np.zeros(0, dtype=np.uint32)
+        self.entries = dict()
+        self.calls = list()
+        self.idom = list()
+        self.loops = list()
+        self.loop_of = list()
+        self.pre = list()
+        self.post = list()
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def __repr__(self) -> str:
+        descriptor = f"{len(self.blocks)} blocks {len(self.loops)} loops {len(self.entries)} functions"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    @classmethod
+    def from_table(cls, table: InstructionTable) -> ControlFlowGraph:
+        out = cls()
+        opcode_values = {o.value: o for o in flow_control}
+        is_flow = np.isin(table.opcode, list(opcode_values))
+        flow = [
+            (i, opcode_values[value])
+            for i, value in zip(
+                np.flatnonzero(is_flow).tolist(),
+                table.opcode[is_flow].tolist())]
+        # split into blocks
+        num_instructions = len(table)
+        leaders = {0} if num_instructions > 0 else set()
+        for i, opcode in flow:
+            if opcode in starts_block:
+                leaders.add(i)
+            if opcode in ends_block and i + 1 < num_instructions:
+                leaders.add(i + 1)
+        leaders = sorted(leaders)
+        stops = [*leaders[1:], num_instructions]
+        out.blocks = [
+            BasicBlock(index, start, stop)
+            for index, (start, stop) in enumerate(zip(leaders, stops))]
+        out.starts = np.array(leaders, dtype=np.uint32)
+        if len(out.blocks) == 0:
+            return out
+        out.link(table, flow)
+        out.find_functions()
+        out.find_dominators()
+        out.find_loops()
+        return out
+
+    def block_at(self, instruction: int) -> BasicBlock:
+        """block containing instruction index"""
+        return self.blocks[int(np.searchsorted(self.starts, instruction, "right")) - 1]
+
+    # construction
+    def link(self, table: InstructionTable, flow: List[Tuple[int, opcodes.Opcode]]):
+        """connect blocks by matching structured flow control"""
+        def block(instruction: int) -> int:
+            return self.block_at(instruction).index
+
+        edges = set()
+        stack = list()
+        # ^ [[opcode, instruction, ...]]
+        labels = dict()
+        # ^ {label_index: instruction}
+        calls = list()
+        # ^ [(instruction, label_index)]
+        for i, opcode in flow:
+            if opcode in (D.IF, D.LOOP, D.SWITCH):
+                stack.append([opcode, i, list()])
+                # ^ [opcode, instruction, [else / breaks / cases]]
+            elif opcode == D.ELSE:
+                assert stack[-1][0] == D.IF, "ELSE outside IF"
+                stack[-1][2].append(i)
+            elif opcode == D.END_IF:
+                _, start, (*else_,) = stack.pop()
+                if len(else_) == 0:
+                    edges.add((block(start), block(i)))  # skip then
+                else:
+                    edges.add((block(start), block(else_[0] + 1)))  # to else
+                    edges.add((block(else_[0]), block(i)))  # then -> end_if
+            elif opcode == D.END_LOOP:
+                _, start, breaks = stack.pop()
+                assert _ == D.LOOP, "END_LOOP outside LOOP"
+                edges.add((block(i), block(start)))  # back edge
+                for j in breaks:
+                    if i + 1 < len(table):
+                        edges.add((block(j), block(i + 1)))
+            elif opcode in (D.CASE, D.DEFAULT):
+                switch = next(s for s in reversed(stack) if s[0] == D.SWITCH)
+                switch[2].append(i)
+                edges.add((block(switch[1]), block(i)))
+            elif opcode == D.END_SWITCH:
+                _, start, targets = stack.pop()
+                assert _ == D.SWITCH, "END_SWITCH outside SWITCH"
+                cases = [j for j in targets if table.opcode[j] in (D.CASE.value, D.DEFAULT.value)]
+                if not any(table.opcode[j] == D.DEFAULT.value for j in cases):
+                    edges.add((block(start), block(i)))  # no case matched
+                for j in targets:
+                    if j not in cases:  # break
+                        edges.add((block(j), block(i)))
+            elif opcode in (D.BREAK, D.BREAK_C):
+                target = next(s for s in reversed(stack) if s[0] in (D.LOOP, D.SWITCH))
+                target[2].append(i)
+            elif opcode in (D.CONTINUE, D.CONTINUE_C):
+                loop = next(s for s in reversed(stack) if s[0] == D.LOOP)
+                edges.add((block(i), block(loop[1])))
+            elif opcode in (D.CALL, D.CALL_C):
+                label = table.instruction(i).operands[-1].indices[0][0]
+                calls.append((i, label))
+            elif opcode == D.LABEL:
+                labels[table.instruction(i).operands[0].indices[0][0]] = i
+        assert len(stack) == 0, f"{stack[-1][0].name} not closed"
+        # fall through
+        for b in self.blocks[:-1]:
+            last = opcodes.opcode_for(int(table.opcode[b.stop - 1]))
+            if last not in unconditional and table.opcode[b.stop] != D.LABEL.value:
+                edges.add((b.index, b.index + 1))
+        for a, b in sorted(edges):
+            self.blocks[a].successors.append(b)
+            self.blocks[b].predecessors.append(a)
+        self.entries = {None: 0}
+        self.entries.update({
+            label: block(i)
+            for label, i in sorted(labels.items())})
+        self.calls = [
+            (block(i), self.entries[label])
+            for i, label in calls
+            if label in self.entries]
+
+    def find_functions(self):
+        for entry in self.entries.values():
+            stack = [entry]
+            while len(stack) > 0:
+                b = self.blocks[stack.pop()]
+                if b.function != -1:
+                    continue
+                b.function = entry
+                stack.extend(b.successors)
+
+    def reverse_postorder(self, entry: int) -> List[int]:
+        out, visited = list(), {entry}
+        stack = [(entry, iter(self.blocks[entry].successors))]
+        while len(stack) > 0:
+            b, successors = stack[-1]
+            for s in successors:
+                if s not in visited:
+                    visited.add(s)
+                    stack.append((s, iter(self.blocks[s].successors)))
+                    break
+            else:
+                stack.pop()
+                out.append(b)
+        return out[::-1]
+
+    def find_dominators(self):
+        """Cooper, Harvey & Kennedy's "A Simple, Fast Dominance Algorithm" """
+        self.idom = [-1] * len(self.blocks)
+        for entry in self.entries.values():
+            order = self.reverse_postorder(entry)
+            rpo = {b: i for i, b in enumerate(order)}
+            idom = {entry: entry}
+
+            def intersect(a: int, b: int) -> int:
+                while a != b:
+                    while rpo[a] > rpo[b]:
+                        a = idom[a]
+                    while rpo[b] > rpo[a]:
+                        b = idom[b]
+                return a
+
+            changed = True
+            while changed:
+                changed = False
+                for b in order[1:]:
+                    new_idom = None
+                    for p in self.blocks[b].predecessors:
+                        if p not in idom or p not in rpo:
+                            continue
+                        new_idom = p if new_idom is None else intersect(p, new_idom)
+                    if new_idom is not None and idom.get(b) != new_idom:
+                        idom[b] = new_idom
+                        changed = True
+            for b, d in idom.items():
+                self.idom[b] = d if b != entry else -1
+        # number the dominator tree
+        children = self.dominator_tree()
+        self.pre = [-1] * len(self.blocks)
+        self.post = [-1] * len(self.blocks)
+        clock = 0
+        for entry in self.entries.values():
+            stack = [(entry, False)]
+            while len(stack) > 0:
+                b, done = stack.pop()
+                if done:
+                    self.post[b] = clock
+                    clock += 1
+                    continue
+                self.pre[b] = clock
+                clock += 1
+                stack.append((b, True))
+                stack.extend((c, False) for c in reversed(children.get(b, list())))
+
+    def find_loops(self):
+        """natural loops from back edges, nested by containment"""
+        loops = dict()
+        # ^ {header: Loop}
+        for b in self.blocks:
+            for s in b.successors:
+                if self.dominates(s, b.index):  # back edge
+                    loop = loops.setdefault(s, Loop(s))
+                    stack = [b.index]
+                    while len(stack) > 0:
+                        x = stack.pop()
+                        if x not in loop.blocks:
+                            loop.blocks.add(x)
+                            stack.extend(self.blocks[x].predecessors)
+        # nest; smaller loops are inside larger ones
+        ordered = sorted(loops.values(), key=lambda loop: len(loop.blocks))
+        self.loop_of = [None] * len(self.blocks)
+        for i, loop in enumerate(ordered):
+            for outer in ordered[i + 1:]:
+                if loop.header in outer.blocks and outer is not loop:
+                    loop.parent = outer
+                    outer.children.append(loop)
+                    break
+            for b in loop.blocks:
+                if self.loop_of[b] is None:
+                    self.loop_of[b] = loop
+        self.loops = [loop for loop in ordered[::-1] if loop.parent is None]
+
+    # queries
+    def dominates(self, a: int, b: int) -> bool:
+        """does block a dominate block b?"""
+        if self.pre[a] == -1 or self.pre[b] == -1:
+            return False
+        return self.pre[a] <= self.pre[b] and self.post[b] <= self.post[a]
+
+    def dominator_tree(self) -> Dict[int, List[int]]:
+        """{block: [immediately_dominated_blocks]}"""
+        out = dict()
+        for b, d in enumerate(self.idom):
+            if d != -1:
+                out.setdefault(d, list()).append(b)
+        return out
+
+    def loop_depth(self, block: int) -> int:
+        loop = self.loop_of[block]
+        return 0 if loop is None else loop.depth
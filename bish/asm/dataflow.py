@@ -0,0 +1,457 @@
+"""per-component liveness & def-use chains over a ControlFlowGraph"""
+# NOTE: variables are (register, component) pairs, numbered slot * 4 + component
+# -- sets of variables & sets of definitions are packed into python ints
+from __future__ import annotations
+import re
+from typing import Dict, Iterator, List, Set, Tuple
+
+from .base import opcodes
+from .base.instructions import FullInstruction
+from .base.operands import FullOperand, SelectionMode, Type
+from .cfg import ControlFlowGraph
+from .table import InstructionTable
+
+
+D = opcodes.D3D_10_0
+D11 = opcodes.D3D_11_0
+
+tracked = {Type.TEMP, Type.INPUT, Type.OUTPUT, Type.INDEXABLE_TEMP}
+
+prefixes = {
+    Type.TEMP: "r",
+    Type.INPUT: "v",
+    Type.OUTPUT: "o",
+    Type.INDEXABLE_TEMP: "x"}
+# ^ {Type: "prefix"}
+prefix_types = {v: k for k, v in prefixes.items()}
+
+num_destinations = {
+    # no destination register, every operand is read
+    D.BREAK_C: 0, D.CALL: 0, D.CALL_C: 0, D.CASE: 0, D.CONTINUE_C: 0,
+    D.DISCARD: 0, D.IF: 0, D.LABEL: 0, D.RET_C: 0, D.SWITCH: 0,
+    D11.STORE_UAV_TYPED: 0, D11.STORE_RAW: 0, D11.STORE_STRUCTURED: 0,
+    D11.ATOMIC_AND: 0, D11.ATOMIC_OR: 0, D11.ATOMIC_XOR: 0,
+    D11.ATOMIC_CMP_STORE: 0, D11.ATOMIC_IADD: 0, D11.ATOMIC_IMAX: 0,
+    D11.ATOMIC_IMIN: 0, D11.ATOMIC_UMAX: 0, D11.ATOMIC_UMIN: 0,
+    D11.EMIT_STREAM: 0, D11.CUT_STREAM: 0, D11.EMIT_THEN_CUT_STREAM: 0,
+    # 2 destinations
+    D.IMUL: 2, D.SIN_COS: 2, D.UDIV: 2, D.UMUL: 2,
+    D11.SWAPC: 2, D11.UADDC: 2, D11.USUBB: 2,
+    **{
+        opcode: 2
+        for opcode in opcodes.WDDM_1_3
+        if opcode.name.endswith("_FEEDBACK")}}
+# ^ {Opcode: num_destinations}; everything else writes operands[0]
+
+componentwise = {
+    D.ADD, D.AND, D.DERIV_RTX, D.DERIV_RTY, D.DIV, D.EQ, D.EXP, D.FRC,
+    D.F_TO_I, D.F_TO_U, D.GE, D.IADD, D.IEQ, D.IGE, D.ILT, D.IMAD, D.IMAX,
+    D.IMIN, D.IMUL, D.INE, D.INEG, D.ISHL, D.ISHR, D.I_TO_F, D.LOG, D.LT,
+    D.MAD, D.MAX, D.MIN, D.MOV, D.MOV_C, D.MUL, D.NE, D.NOT, D.OR,
+    D.ROUND_NE, D.ROUND_NI, D.ROUND_PI, D.ROUND_Z, D.RSQ, D.SIN_COS, D.SQRT,
+    D.UDIV, D.UGE, D.ULT, D.UMAD, D.UMAX, D.UMIN, D.UMUL, D.USHR, D.U_TO_F,
+    D.XOR,
+    D11.BFI, D11.BFREV, D11.COUNTBITS, D11.DERIV_RTX_COARSE,
+    D11.DERIV_RTX_FINE, D11.DERIV_RTY_COARSE, D11.DERIV_RTY_FINE,
+    D11.F16_TO_F32, D11.F32_TO_F16, D11.FIRSTBIT_HI, D11.FIRSTBIT_LO,
+    D11.FIRSTBIT_SHI, D11.IBFE, D11.RCP, D11.SWAPC, D11.UADDC, D11.UBFE,
+    D11.USUBB}
+# ^ destination component N reads swizzle[N] of each source
+
+dot_products = {D.DP_2: 2, D.DP_3: 3, D.DP_4: 4}
+# ^ {Opcode: num_components_read}
+# NOTE: other opcodes conservatively read all 4 swizzled components
+
+Key = Tuple[Type, Tuple[int, ...]]
+# ^ (register_type, (index, ...))
+Access = Tuple[Key, Tuple[int, ...], bool]
+# ^ (register, components, is_killing)
+
+
+def components(operand: FullOperand) -> Tuple[int, ...]:
+    """components selected by mask / swizzle / select_1"""
+    if operand.selection_mode is None:
+        return (0,)
+    elif operand.selection_mode == SelectionMode.MASK:
+        return tuple(c for c in range(4) if operand.mask & (1 << c))
+    elif operand.selection_mode == SelectionMode.SWIZZLE:
+        return tuple(name.value for name in operand.swizzle)
+    else:  # SELECT_1
+        return (operand.name.value,)
+
+
+def register_key(operand: FullOperand) -> Key:
+    # NOTE: relative indices only track the base register
+    # -- and indexable temps are tracked as a whole array
+    indices = tuple(imm if imm is not None else 0 for imm, rel in operand.indices)
+    if operand.type == Type.INDEXABLE_TEMP:
+        indices = indices[:1]
+    return (operand.type, indices)
+
+
+def relative_reads(operand: FullOperand) -> Iterator[Access]:
+    for imm, rel in operand.indices:
+        if rel is not None and rel.type in tracked:
+            yield (register_key(rel), components(rel), False)
+
+
+def accesses(instruction: FullInstruction) -> Tuple[List[Access], List[Access]]:
+    """(reads, writes) of tracked registers"""
+    reads, writes = list(), list()
+    opcode = instruction.opcode
+    if instruction.declaration is not None or instruction.custom_data is not None:
+        return reads, writes
+    num_dst = num_destinations.get(opcode, 1 if len(instruction.operands) > 0 else 0)
+    destinations = instruction.operands[:num_dst]
+    sources = instruction.operands[num_dst:]
+    written = set()
+    for operand in destinations:
+        reads.extend(relative_reads(operand))
+        if operand.selection_mode == SelectionMode.MASK:
+            written.update(components(operand))
+        if operand.type not in tracked:
+            continue
+        is_killing = operand.type != Type.INDEXABLE_TEMP and all(
+            rel is None for imm, rel in operand.indices)
+        writes.append((register_key(operand), components(operand), is_killing))
+    for operand in sources:
+        reads.extend(relative_reads(operand))
+        if operand.type not in tracked:
+            continue
+        selected = components(operand)
+        if operand.selection_mode == SelectionMode.SWIZZLE:
+            if opcode in dot_products:
+                selected = selected[:dot_products[opcode]]
+            elif opcode in componentwise and len(written) > 0:
+                selected = tuple(selected[c] for c in sorted(written))
+        reads.append((register_key(operand), tuple(sorted(set(selected))), False))
+    return reads, writes
+
+
+def bits(bitset: int) -> Iterator[int]:
+    """indices of set bits, lowest first"""
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+class Dataflow:
+    """liveness & reaching definitions for each (register, component)"""
+    cfg: ControlFlowGraph
+    slots: List[Key]
+    slot_of: Dict[Key, int]
+    # per instruction bitsets of variables
+    reads: List[int]
+    writes: List[int]
+    kills: List[int]
+    # definitions
+    defs: List[Tuple[int, int]]
+    # ^ [(instruction, variable)]
+    defs_at: List[int]  # bitset of def ids made by each instruction
+    defs_of: List[int]  # bitset of def ids for each variable
+    def_base: List[int]  # first def id of each variable
+    returns: List[int]
+    # ^ [block_index]; blocks ending in RET / RET_C
+    conditional_calls: Set[int]
+    # ^ {block_index}; blocks ending in CALL_C
+    # per block bitsets
+    live_in: List[int]  # variables
+    live_out: List[int]
+    reach_in: List[int]  # def ids
+    reach_out: List[int]
+    uses_of: List[List[int]]
+    # ^ [[instruction]] for each def id
+
+    def __init__(self):
+        self.cfg = ControlFlowGraph()
+        self.slots = list()
+        self.slot_of = dict()
+        self.reads = list()
+        self.writes = list()
+        self.kills = list()
+        self.defs = list()
+        self.defs_at = list()
+        self.defs_of = list()
+        self.def_base = list()
+        self.returns = list()
+        self.conditional_calls = set()
+        self.live_in = list()
+        self.live_out = list()
+        self.reach_in = list()
+        self.reach_out = list()
+        self.uses_of = list()
+
+    def __repr__(self) -> str:
+        descriptor = f"{len(self.slots)} registers {len(self.defs)} definitions"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    @classmethod
+    def from_table(cls, table: InstructionTable, cfg: ControlFlowGraph = None) -> Dataflow:
+        out = cls()
+        out.cfg = ControlFlowGraph.from_table(table) if cfg is None else cfg
+        out.collect(table)
+        out.find_liveness()
+        out.find_reaching()
+        out.link()
+        return out
+
+    # construction
+    def slot(self, key: Key) -> int:
+        if key not in self.slot_of:
+            self.slot_of[key] = len(self.slots)
+            self.slots.append(key)
+        return self.slot_of[key]
+
+    def bitset(self, key: Key, components: Tuple[int, ...]) -> int:
+        base = self.slot(key) * 4
+        out = 0
+        for c in components:
+            out |= 1 << (base + c)
+        return out
+
+    def collect(self, table: InstructionTable):
+        """read / write bitsets for each instruction"""
+        skip = {
+            o.value
+            for o in opcodes.opcode_table.values()
+            if o.name.startswith("DCL_") or o in (D.CUSTOM_DATA, D.NOP)}
+        seen = dict()
+        # ^ {instruction_tokens: (read, write, kill)}
+        # NOTE: shaders repeat a lot of instructions, each is only decoded once
+        for i, opcode in enumerate(table.opcode.tolist()):
+            if opcode in skip:
+                self.reads.append(0)
+                self.writes.append(0)
+                self.kills.append(0)
+                continue
+            raw = table.instruction_tokens(i).tobytes()
+            if raw not in seen:
+                read = write = kill = 0
+                reads, writes = accesses(table.instruction(i))
+                for key, selected, _ in reads:
+                    read |= self.bitset(key, selected)
+                for key, selected, is_killing in writes:
+                    written = self.bitset(key, selected)
+                    write |= written
+                    if is_killing:
+                        kill |= written
+                seen[raw] = (read, write, kill)
+            read, write, kill = seen[raw]
+            self.reads.append(read)
+            self.writes.append(write)
+            self.kills.append(kill)
+        ret = {D.RET.value, D.RET_C.value}
+        self.returns = [b.index for b in self.cfg.blocks if int(table.opcode[b.stop - 1]) in ret]
+        self.conditional_calls = {
+            b.index
+            for b in self.cfg.blocks
+            if int(table.opcode[b.stop - 1]) == D.CALL_C.value}
+        # number definitions, grouped by variable
+        # -- so each variable's definitions are a contiguous run of bits
+        written_by = [list() for v in range(len(self.slots) * 4)]
+        for i, write in enumerate(self.writes):
+            for variable in bits(write):
+                written_by[variable].append(i)
+        self.defs_at = [0] * len(self.writes)
+        for variable, instructions in enumerate(written_by):
+            self.def_base.append(len(self.defs))
+            self.defs_of.append(((1 << len(instructions)) - 1) << len(self.defs))
+            for i in instructions:
+                self.defs_at[i] |= 1 << len(self.defs)
+                self.defs.append((i, variable))
+
+    def outputs(self) -> int:
+        """every output component; live at exit"""
+        out = 0
+        for key, slot in self.slot_of.items():
+            if key[0] == Type.OUTPUT:
+                out |= 0xF << (slot * 4)
+        return out
+
+    def successors(self) -> List[List[int]]:
+        """successors of each block, w/ calls running through the callee
+        CALL -> callee entry & callee RET / RET_C -> block after the CALL
+        only CALL_C also falls through to the block after it"""
+        blocks = self.cfg.blocks
+        out = [list(b.successors) for b in blocks]
+        returns_of = dict()
+        # ^ {function: [RET / RET_C block]}
+        for b in self.returns:
+            returns_of.setdefault(blocks[b].function, list()).append(b)
+        for caller, callee in self.cfg.calls:
+            out[caller].append(callee)
+            after = caller + 1
+            if after >= len(blocks) or callee not in returns_of:
+                continue  # never returns, keep the fall through to be safe
+            for b in returns_of[callee]:
+                if after not in out[b]:
+                    out[b].append(after)
+            if caller not in self.conditional_calls and after in out[caller]:
+                out[caller].remove(after)
+        return out
+
+    def find_liveness(self):
+        """backwards worklist over .successors(); outputs are live at every RET / RET_C"""
+        blocks = self.cfg.blocks
+        gen, kill = list(), list()
+        for b in blocks:
+            g = k = 0
+            for i in range(b.stop - 1, b.start - 1, -1):
+                g = (g & ~self.kills[i]) | self.reads[i]
+                k |= self.kills[i]
+            gen.append(g)
+            kill.append(k)
+        successors = self.successors()
+        is_exit = [len(s) == 0 for s in successors]
+        for b in self.returns:
+            is_exit[b] = True
+        predecessors = [list() for b in blocks]
+        for b, s in enumerate(successors):
+            for x in s:
+                predecessors[x].append(b)
+        exit_ = self.outputs()
+        self.live_in = [0] * len(blocks)
+        self.live_out = [0] * len(blocks)
+        worklist = list(range(len(blocks)))
+        queued = set(worklist)
+        while len(worklist) > 0:
+            b = worklist.pop()
+            queued.discard(b)
+            out = exit_ if is_exit[b] else 0
+            for s in successors[b]:
+                out |= self.live_in[s]
+            self.live_out[b] = out
+            live_in = gen[b] | (out & ~kill[b])
+            if live_in != self.live_in[b]:
+                self.live_in[b] = live_in
+                for p in predecessors[b]:
+                    if p not in queued:
+                        queued.add(p)
+                        worklist.append(p)
+
+    def find_reaching(self):
+        """forwards worklist over .successors(); callee definitions reach the block after each CALL"""
+        blocks = self.cfg.blocks
+        gen, kill = list(), list()
+        for b in blocks:
+            g = k = 0
+            for i in range(b.start, b.stop):
+                killed = 0
+                for variable in bits(self.kills[i]):
+                    killed |= self.defs_of[variable]
+                g = (g & ~killed) | self.defs_at[i]
+                k |= killed
+            gen.append(g)
+            kill.append(k)
+        successors = self.successors()
+        predecessors = [list() for b in blocks]
+        for b, s in enumerate(successors):
+            for x in s:
+                predecessors[x].append(b)
+        self.reach_in = [0] * len(blocks)
+        self.reach_out = [0] * len(blocks)
+        worklist = list(range(len(blocks)))[::-1]
+        queued = set(worklist)
+        while len(worklist) > 0:
+            b = worklist.pop()
+            queued.discard(b)
+            in_ = 0
+            for p in predecessors[b]:
+                in_ |= self.reach_out[p]
+            self.reach_in[b] = in_
+            out = gen[b] | (in_ & ~kill[b])
+            if out != self.reach_out[b]:
+                self.reach_out[b] = out
+                for s in successors[b]:
+                    if s not in queued:
+                        queued.add(s)
+                        worklist.append(s)
+
+    def walk(self, block: int) -> Iterator[Tuple[int, int]]:
+        """(instruction, reaching_def_ids) for each instruction in block"""
+        b = self.cfg.blocks[block]
+        reach = self.reach_in[block]
+        for i in range(b.start, b.stop):
+            yield i, reach
+            for variable in bits(self.kills[i]):
+                reach &= ~self.defs_of[variable]
+            reach |= self.defs_at[i]
+
+    def reaching(self, variable: int, reach: int) -> Iterator[int]:
+        """def ids of variable in reach"""
+        base = self.def_base[variable]
+        for d in bits((reach & self.defs_of[variable]) >> base):
+            yield base + d
+
+    def link(self):
+        """def-use chains from reaching definitions"""
+        self.uses_of = [list() for d in self.defs]
+        for b in self.cfg.blocks:
+            for i, reach in self.walk(b.index):
+                for variable in bits(self.reads[i]):
+                    for d in self.reaching(variable, reach):
+                        self.uses_of[d].append(i)
+
+    # names
+    def name(self, variable: int) -> str:
+        """e.g. 'r3.y'"""
+        type_, indices = self.slots[variable // 4]
+        first, *rest = indices
+        register = f"{prefixes[type_]}{first}{''.join(f'[{i}]' for i in rest)}"
+        return f"{register}.{'xyzw'[variable % 4]}"
+
+    def names(self, bitset: int) -> List[str]:
+        return [self.name(v) for v in bits(bitset)]
+
+    def variables(self, register: str) -> int:
+        """bitset of variables for e.g. 'r3.y'; no swizzle selects all 4 components"""
+        match = re.fullmatch(r"([rvox])(\d+)((?:\[\d+\])*)(?:\.([xyzw]{1,4}))?", register)
+        if match is None:
+            raise ValueError(f"invalid register: '{register}'")
+        prefix, first, rest, swizzle = match.groups()
+        indices = (int(first), *map(int, re.findall(r"\d+", rest)))
+        key = (prefix_types[prefix], indices)
+        if key not in self.slot_of:
+            return 0
+        return self.bitset(key, tuple("xyzw".index(c) for c in swizzle or "xyzw"))
+
+    # queries
+    def definitions(self, instruction: int, register: str) -> List[int]:
+        """instructions whose writes reach this use of register"""
+        # NOTE: an empty list means the value comes from outside the shader
+        block = self.cfg.block_at(instruction).index
+        reach = next(r for i, r in self.walk(block) if i == instruction)
+        out = set()
+        for variable in bits(self.variables(register) & self.reads[instruction]):
+            out.update(self.defs[d][0] for d in self.reaching(variable, reach))
+        return sorted(out)
+
+    def uses(self, instruction: int, register: str = None) -> List[int]:
+        """instructions reading the values written by instruction"""
+        out = set()
+        selected = self.writes[instruction] if register is None else self.variables(register)
+        for d in bits(self.defs_at[instruction]):
+            if (selected >> self.defs[d][1]) & 1:
+                out.update(self.uses_of[d])
+        return sorted(out)
+
+    def live_after(self, instruction: int) -> int:
+        block = self.cfg.block_at(instruction)
+        live = self.live_out[block.index]
+        for i in range(block.stop - 1, instruction, -1):
+            live = (live & ~self.kills[i]) | self.reads[i]
+        return live
+
+    def live_before(self, instruction: int) -> int:
+        live = self.live_after(instruction)
+        return (live & ~self.kills[instruction]) | self.reads[instruction]
+
+    def is_dead(self, instruction: int) -> bool:
+        """writes nothing that is read later"""
+        # NOTE: partial & relative writes never count as dead
+        write = self.writes[instruction]
+        if write == 0 or write != self.kills[instruction]:
+            return False
+        return self.live_after(instruction) & write == 0
+
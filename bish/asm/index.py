@@ -0,0 +1,51 @@
+"""vectorised instruction header decoding"""
+# NOTE: walks the SHEX token stream once to find where each instruction starts
+# -- per-operand decoding can then happen in any order, or not at all
+from typing import Tuple
+
+import numpy as np
+
+from .. import buffers
+from .base import opcodes
+
+
+CUSTOM_DATA = opcodes.D3D_10_0.CUSTOM_DATA.value
+
+
+def tokens_for(raw: buffers.Buffer) -> np.ndarray:
+    """zero-copy uint32 view of raw bytes"""
+    return np.frombuffer(raw, dtype="<u4")
+
+
+def instruction_offsets(tokens: np.ndarray, start: int = 2) -> np.ndarray:
+    """token offset of each instruction, from start until the end of tokens"""
+    # NOTE: start skips the version & length tokens of a SHEX chunk
+    lengths = (tokens >> 24) & 0x7F  # [30:24]
+    is_custom = (tokens & 0x3FF) == CUSTOM_DATA  # [10:00]
+    # CUSTOM_DATA stores it's length in the next token
+    steps = lengths.astype(np.int64)
+    steps[:-1][is_custom[:-1]] = tokens[1:][is_custom[:-1]]
+    steps = steps.tolist()  # python ints are faster to walk
+    offsets = list()
+    offset, end = start, len(tokens)
+    while offset < end:
+        step = steps[offset]
+        assert step >= 1, f"invalid instruction length @ token {offset}"
+        offsets.append(offset)
+        offset += step
+    assert offset == end, f"overshot by {offset - end} tokens"
+    return np.array(offsets, dtype=np.uint32)
+
+
+def headers(tokens: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """(opcode, controls, length, is_extended) for each instruction"""
+    # NOTE: same fields as base.instructions.Instruction.from_token
+    heads = tokens[offsets]
+    opcode = (heads & 0x000003FF).astype(np.uint16)  # [10:00]
+    controls = ((heads & 0x00FFF800) >> 11).astype(np.uint16)  # [23:11]
+    length = ((heads & 0x7F000000) >> 24).astype(np.uint32)  # [30:24]
+    is_extended = (heads >> 31).astype(bool)  # [31]
+    # CUSTOM_DATA stores it's length in the next token
+    is_custom = opcode == CUSTOM_DATA
+    length[is_custom] = tokens[offsets[is_custom] + 1]
+    return opcode, controls, length, is_extended
@@ -0,0 +1,85 @@
+from __future__ import annotations
+import time
+from typing import Dict, Iterator, List, Union
+
+import numpy as np
+
+from . import index
+from .base import opcodes
+from .base.instructions import FullInstruction
+
+
+class InstructionTable:
+    """struct-of-arrays instruction index over SHEX tokens"""
+    tokens: np.ndarray  # uint32 view of the original chunk
+    # columns
+    opcode: np.ndarray  # uint16 opcode values
+    length: np.ndarray  # uint32 length in tokens
+    token_offset: np.ndarray  # uint32 index of instruction token
+    operand_offset: np.ndarray  # uint32 index of first token after extensions
+    num_extended: int  # extended instructions, walked one at a time
+    build_time: float  # seconds spent indexing; see profiling.ParseStats
+    # NOTE: FullInstructions are decoded on demand & not kept
+
+    def __init__(self, tokens: np.ndarray = None, start: int = 2):
+        start_time = time.perf_counter()
+        if tokens is None:
+            tokens = np.zeros(start, dtype=np.uint32)
+        self.tokens = tokens
+        self.token_offset = index.instruction_offsets(tokens, start)
+        opcode, controls, length, is_extended = index.headers(tokens, self.token_offset)
+        self.opcode = opcode
+        self.length = length
+        # skip past extended instruction tokens
+        self.operand_offset = self.token_offset + 1
+        self.operand_offset[opcode == index.CUSTOM_DATA] += 1  # length token
+        extended = np.flatnonzero(is_extended).tolist()
+        self.num_extended = len(extended)
+        for i in extended:
+            offset = int(self.operand_offset[i])
+            while tokens[offset] >> 31:  # extension is extended
+                offset += 1
+            self.operand_offset[i] = offset + 1
+        self.build_time = time.perf_counter() - start_time
+
+    def __repr__(self) -> str:
+        descriptor = f"{len(self)} instructions ({len(self.tokens)} tokens)"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[FullInstruction, List[FullInstruction]]:
+        if isinstance(index, slice):
+            return [
+                self.instruction(i)
+                for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("instruction index out of range")
+        return self.instruction(index)
+
+    def __iter__(self) -> Iterator[FullInstruction]:
+        for i in range(len(self)):
+            yield self.instruction(i)
+
+    def __len__(self) -> int:
+        return len(self.token_offset)
+
+    def instruction(self, index: int) -> FullInstruction:
+        """decode a FullInstruction"""
+        tokens = self.instruction_tokens(index)
+        if self.opcode[index] != opcodes.D3D_10_0.CUSTOM_DATA.value:
+            tokens = tokens.tolist()
+        # NOTE: custom data blocks (e.g. immediate constant buffers) keep a view of self.tokens
+        out = FullInstruction.from_tokens(tokens)
+        assert len(out) == self.length[index]
+        return out
+
+    def instruction_tokens(self, index: int) -> np.ndarray:
+        start = int(self.token_offset[index])
+        return self.tokens[start:start + int(self.length[index])]
+
+    def opcode_counts(self) -> Dict[opcodes.Opcode, int]:
+        values, counts = np.unique(self.opcode, return_counts=True)
+        return {
+            opcodes.opcode_for(value): count
+            for value, count in zip(values.tolist(), counts.tolist())}
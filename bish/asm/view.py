@@ -1,65 +1,158 @@
-import struct
-from typing import List
+import io
+import sys
+from typing import Iterator, List, TextIO, TYPE_CHECKING
 
 # from bish.asm.base import custom_data
 from bish.asm.base import opcodes
 
+if TYPE_CHECKING:
+    from bish import chunks
 
-# TODO: colour (highlighting)
-# -- opcode byte
-# -- instruction segments
-def r2(fxc, limit=None, start=0):
+
+D = opcodes.D3D_10_0
+
+flow_control = {
+    D.BREAK, D.BREAK_C, D.CALL, D.CALL_C, D.CASE, D.CONTINUE, D.CONTINUE_C,
+    D.DEFAULT, D.DISCARD, D.ELSE, D.END_IF, D.END_LOOP, D.END_SWITCH,
+    D.IF, D.LABEL, D.LOOP, D.RET, D.RET_C, D.SWITCH}
+
+colours = {
+    "offset": "\x1b[2m",  # dim
+    "declaration": "\x1b[36m",  # cyan
+    "flow_control": "\x1b[35;1m",  # bold magenta
+    "opcode": "\x1b[1m",  # bold
+    "custom_data": "\x1b[33m",  # yellow
+    "operand": "\x1b[32m",  # green
+    "reset": "\x1b[0m"}
+# ^ {"segment": "ANSI escape code"}
+
+
+class Viewer:
     """radare 2 inspired assembly bytecode viewer"""
-    assert "SHEX" in fxc.chunks
-    # 0000 | version & shader type token
-    # 0004 | chunk size
-    offset = 8  # first instruction
-    offset += sum(
-        len(instruction) * 4
-        for instruction in fxc.SHEX.instructions[:start])
-    limit = start + limit if limit is not None else None
-    for i, instruction in enumerate(fxc.SHEX.instructions[start:limit]):
-        i = start + i
-        num_tokens = len(instruction)
-        bytes_length = num_tokens * 4
-
-        raw_tokens = fxc.RAW_SHEX[offset:offset + bytes_length]
-        tokens = struct.unpack(f"{num_tokens}I", raw_tokens)
-        opcode = instruction.opcode.name
-        # TODO: group tokens by instruction data instead
+    shader: "chunks.Shader_v5"
+    colour: bool  # ANSI highlighting
+    page_size: int  # instructions per page
+    position: int  # instruction index of current page
+
+    def __init__(self, shader, colour: bool = False, page_size: int = 32):
+        self.shader = shader
+        self.colour = colour
+        self.page_size = page_size
+        self.position = 0
+
+    def __len__(self) -> int:
+        return len(self.shader.instructions)
+
+    def __repr__(self) -> str:
+        descriptor = f"{len(self)} instructions @ {self.position}"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
 
+    def paint(self, segment: str, text: str) -> str:
+        if not self.colour:
+            return text
+        return f"{colours[segment]}{text}{colours['reset']}"
+
+    def offset(self, index: int) -> int:
+        """byte offset of instruction in SHEX"""
+        return int(self.shader.instructions.token_offset[index]) * 4
+
+    # rendering
+    def lines(self, index: int) -> Iterator[str]:
+        """lines for a single instruction"""
+        table = self.shader.instructions
+        instruction = table.instruction(index)
+        tokens = table.instruction_tokens(index).tolist()
+        offset = self.offset(index)
+        opcode = instruction.opcode
+        if opcode == D.CUSTOM_DATA:
+            head = f"{index:4}"
+            yield from self.lines_for(offset, tokens[:2], head, opcode.name, "custom_data")
+            yield from self.lines_for(offset + 8, tokens[2:])
+            return
+        if opcode.name.startswith("DCL_"):
+            segment = "declaration"
+        elif opcode in flow_control:
+            segment = "flow_control"
+        else:
+            segment = "opcode"
         # TODO: better extension & operand reprs
         token_groups = list()
-        if not opcode.startswith("DCL_"):
+        if instruction.declaration is None:
             token_offset = 1
             for extension in instruction.extensions:
-                sub_tokens = tokens[token_offset:token_offset+1]
                 tail = f"  {extension.type.name} ..."
-                token_groups.append((sub_tokens, tail))
+                token_groups.append((tokens[token_offset:token_offset + 1], tail))
                 token_offset += 1
-            if not all(isinstance(o, int) for o in instruction.operands):
-                for operand in instruction.operands:
-                    sub_tokens = tokens[token_offset:token_offset+len(operand)]
-                    tail = f"  {operand}"
-                    token_groups.append((sub_tokens, tail))
-                    token_offset += len(operand)
+            for operand in instruction.operands:
+                sub_tokens = tokens[token_offset:token_offset + len(operand)]
+                token_groups.append((sub_tokens, f"  {operand}"))
+                token_offset += len(operand)
             if len(tokens) > token_offset:
                 token_groups.append((tokens[token_offset:], ""))
-
-        if instruction.opcode == opcodes.D3D_10_0.CUSTOM_DATA:
-            print_tokens(offset, tokens[:2], f"{i:4}", opcode)
-            print_tokens(offset + 8, tokens[2:])
-        # TODO: lines for extensions & opcodes
-        elif len(token_groups) > 0:
-            print_tokens(offset, tokens[:1], f"{i:4}", opcode)
+        if len(token_groups) > 0:
+            yield from self.lines_for(offset, tokens[:1], f"{index:4}", opcode.name, segment)
             sub_offset = offset + 4
             for group, tail in token_groups:
-                print_tokens(sub_offset, group, tail=tail)
+                yield from self.lines_for(sub_offset, group, tail=tail, segment="operand")
                 sub_offset += len(group) * 4
         else:  # basic print
-            print_tokens(offset, tokens, f"{i:4}", opcode)
+            tail = opcode.name if instruction.declaration is None else str(instruction.declaration)
+            yield from self.lines_for(offset, tokens, f"{index:4}", tail, segment)
 
-        offset += bytes_length
+    def lines_for(self, offset: int, tokens: List[int], head=" "*4, tail="", segment="operand") -> Iterator[str]:
+        for i in range(0, len(tokens), 5):
+            line = line_for(offset, tokens[i:i + 5], head, self.paint(segment, tail) if tail else "")
+            if self.colour:  # dim offset & tokens
+                head_, offset_, hex_, tail_ = line.split(" | ", 3)
+                line = " | ".join([head_, self.paint("offset", offset_), hex_, tail_])
+            yield line.rstrip()
+            offset += 20
+            # clear head & tail after first line
+            head = " " * 4
+            tail = ""
+
+    def render(self, start: int = 0, limit: int = None, writer: TextIO = None) -> str:
+        """render instructions[start:start + limit]; returns "" if writing to writer"""
+        out = io.StringIO() if writer is None else writer
+        stop = len(self) if limit is None else min(len(self), start + limit)
+        for index in range(start, stop):
+            out.write("\n".join(self.lines(index)))
+            out.write("\n")
+        return out.getvalue() if writer is None else ""
+
+    # paging
+    @property
+    def num_pages(self) -> int:
+        return -(-len(self) // self.page_size)
+
+    def page(self, number: int = None) -> str:
+        """render a page of instructions (defaults to current page)"""
+        if number is not None:
+            self.seek(number * self.page_size)
+        return self.render(self.position, self.page_size)
+
+    def seek(self, index: int):
+        """move to instruction index; the last page is always full"""
+        if index < 0:
+            index += len(self)
+        self.position = max(0, min(index, len(self) - self.page_size))
+
+    # NOTE: next & previous move a whole page, unless clamped at either end
+    def next(self) -> str:
+        self.seek(self.position + self.page_size)
+        return self.page()
+
+    def previous(self) -> str:
+        self.seek(max(0, self.position - self.page_size))
+        return self.page()
+
+
+def r2(fxc, limit=None, start=0, colour=False):
+    """radare 2 inspired assembly bytecode viewer"""
+    assert "SHEX" in fxc.chunks
+    # 0000 | version & shader type token
+    # 0004 | chunk size
+    Viewer(fxc.SHEX, colour).render(start, limit, writer=sys.stdout)
 
 
 def line_for(offset: int, tokens: List[int], head=" "*4, tail="") -> str:
@@ -69,13 +162,3 @@ def line_for(offset: int, tokens: List[int], head=" "*4, tail="") -> str:
     assert len(tokens) == 5
     hex_ = " ".join(tokens)
     return f"{head} | {offset:04X} | {hex_} | {tail}"
-
-
-def print_tokens(offset: int, tokens: List[int], head=" "*4, tail=""):
-    for i in range(0, len(tokens), 5):
-        sub_tokens = tokens[i:i + 5]
-        print(line_for(offset, sub_tokens, head, tail))
-        offset += 16
-        # clear head & tail after first line
-        head = " " * 4
-        tail = ""
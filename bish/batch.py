@@ -0,0 +1,157 @@
+"""parse lots of shaders at once"""
+from __future__ import annotations
+import concurrent.futures
+import copy
+import os
+import time
+from typing import Any, Dict, Iterator, List, Tuple, Union
+
+from . import buffers
+from . import chunks
+from . import fxc
+from . import profiling
+from . import vcs
+
+
+class Summary:
+    """compact parse results for one Fxc"""
+    name: str
+    checksum: bytes
+    chunks: Dict[str, Tuple[int, int]]
+    # ^ {"id": (offset, length)}
+    stat: Union[chunks.Statistics, None]
+    num_instructions: int  # 0 if SHEX failed to parse
+    parse_time: float  # seconds
+    stats: Union[profiling.ParseStats, None]  # if fxc.Fxc.profile
+    loading_errors: Dict[str, str]
+    # ^ {"id": "repr(Error)"}
+    # NOTE: container errors are stored under "DXBC"
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.checksum = b"\x00" * 16
+        self.chunks = dict()
+        self.stat = None
+        self.num_instructions = 0
+        self.parse_time = 0.0
+        self.stats = None
+        self.loading_errors = dict()
+
+    def __repr__(self) -> str:
+        descriptor = f'"{self.name}" {len(self.chunks)} chunks'
+        descriptor += f" {self.num_instructions} instructions"
+        if len(self.loading_errors) > 0:
+            descriptor += f" {len(self.loading_errors)} errors"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    @classmethod
+    def from_fxc(cls, name: str, shader: fxc.Fxc) -> Summary:
+        out = cls(name)
+        out.checksum = shader.header.checksum
+        out.chunks = dict(shader.chunks)
+        out.stat = getattr(shader, "STAT", None)
+        if "SHEX" in shader.chunks and hasattr(shader, "SHEX"):
+            out.num_instructions = len(shader.SHEX.instructions)
+        out.loading_errors = {
+            chunk: repr(exc)
+            for chunk, exc in shader.loading_errors.items()}
+        out.stats = shader.stats
+        return out
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSON-friendly"""
+        out = {
+            "name": self.name,
+            "checksum": self.checksum.hex(),
+            "chunks": list(self.chunks),
+            "stat": None if self.stat is None else vars(self.stat),
+            "num_instructions": self.num_instructions,
+            "parse_time": self.parse_time,
+            "loading_errors": self.loading_errors}
+        if self.stats is not None:
+            out["stats"] = self.stats.as_dict()
+        return out
+
+
+def summarise(name: str, raw_fxc: buffers.Buffer) -> Summary:
+    """parse a single .fxc"""
+    return summarise_fxc(name, fxc.Fxc.from_bytes(name, raw_fxc))
+
+
+def summarise_fxc(name: str, shader: fxc.Fxc) -> Summary:
+    start = time.perf_counter()
+    try:
+        shader.parse()
+    except Exception as exc:
+        out = Summary(name)
+        out.loading_errors["DXBC"] = repr(exc)
+    else:
+        out = Summary.from_fxc(name, shader)
+    out.parse_time = time.perf_counter() - start
+    return out
+
+
+# NOTE: each worker process opens it's own copy of the archive
+# -- so only entry names have to be sent to workers
+worker_archive: Union[vcs.Vcs, None] = None
+
+
+def init_worker(archive_filepath: str):
+    global worker_archive
+    worker_archive = vcs.Vcs.from_file(archive_filepath)
+    worker_archive.mapped = True
+    worker_archive.parse()
+
+
+def summarise_entry(name: str) -> Summary:
+    return summarise(name, worker_archive.read(name))
+
+
+def summarise_raw(name_and_raw: Tuple[str, bytes]) -> Summary:
+    return summarise(*name_and_raw)
+
+
+def parse_archive(archive: vcs.Vcs, names: List[str] = None, workers: int = None, deduplicate: bool = True) -> Iterator[Summary]:
+    """parse entries across a pool of processes, yielding Summaries in order"""
+    names = archive.namelist() if names is None else names
+    if not deduplicate:
+        yield from parse_entries(archive, names, workers)
+        return
+    # only parse the first of each set of identical entries
+    checksums = [archive.checksum(name) for name in names]
+    unique_names = dict()
+    # ^ {checksum: first_name}
+    for name, checksum in zip(names, checksums):
+        unique_names.setdefault(checksum, name)
+    summaries = parse_entries(archive, list(unique_names.values()), workers)
+    parsed = dict()
+    # ^ {checksum: Summary}
+    for name, checksum in zip(names, checksums):
+        if checksum not in parsed:  # 1st appearance, parsed in the same order
+            parsed[checksum] = next(summaries)
+            yield parsed[checksum]
+        else:
+            summary = copy.copy(parsed[checksum])
+            summary.name = name
+            yield summary
+
+
+def parse_entries(archive: vcs.Vcs, names: List[str], workers: int = None) -> Iterator[Summary]:
+    workers = os.cpu_count() if workers is None else workers
+    if workers <= 1:
+        for name in names:
+            yield summarise(name, archive.read(name))
+        return
+    chunksize = max(1, min(64, len(names) // (workers * 4)))
+    on_disk = archive.archive is None and os.path.isfile(archive.filepath)
+    if on_disk:
+        pool = concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=init_worker, initargs=(archive.filepath,))
+        tasks = (summarise_entry, names)
+    else:  # send each entry to the workers
+        pool = concurrent.futures.ProcessPoolExecutor(workers)
+        raw_entries = ((name, bytes(archive.read(name))) for name in names)
+        tasks = (summarise_raw, raw_entries)
+    with pool:
+        for summary in pool.map(*tasks, chunksize=chunksize):
+            yield summary
@@ -0,0 +1,76 @@
+"""zero-copy access to file contents"""
+from __future__ import annotations
+import io
+import mmap
+from typing import Union
+
+import breki
+
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+class MemoryStream:
+    """read-only stream over a buffer, .read() returns memoryview slices"""
+    buffer: memoryview
+    position: int
+
+    def __init__(self, buffer: Buffer):
+        self.buffer = memoryview(buffer).cast("B")
+        self.position = 0
+
+    def __repr__(self) -> str:
+        descriptor = f"{self.position} / {len(self.buffer)} bytes"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def getbuffer(self) -> memoryview:
+        return self.buffer
+
+    def read(self, size: int = -1) -> memoryview:
+        start = self.position
+        if size is None or size < 0:
+            end = len(self.buffer)
+        else:
+            end = min(start + size, len(self.buffer))
+        self.position = max(start, end)
+        return self.buffer[start:end]
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        assert whence in (0, 1, 2)
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            offset += len(self.buffer)
+        assert offset >= 0, "cannot seek before start of buffer"
+        self.position = offset
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+
+def buffer_for(file: breki.File) -> memoryview:
+    """map a file's contents into memory w/o copying"""
+    if file.archive is not None:
+        # NOTE: only zero-copy if the archive is also mapped
+        return memoryview(file.archive.read(file.filepath))
+    stream = file.__dict__.get("stream")  # don't open a new stream
+    if isinstance(stream, MemoryStream):
+        return stream.getbuffer()
+    elif isinstance(stream, io.BytesIO):  # .from_bytes
+        return stream.getbuffer()
+    with open(file.filepath, "rb") as disk_file:
+        # NOTE: mmap holds it's own handle to the file
+        mapping = mmap.mmap(disk_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapping)
+
+
+def stream_for(raw: Buffer) -> Union[io.BytesIO, MemoryStream]:
+    """wrap bytes or a buffer in a stream w/o copying"""
+    if isinstance(raw, bytes):
+        # NOTE: CPython's BytesIO shares bytes objects until written to
+        return io.BytesIO(raw)
+    return MemoryStream(raw)
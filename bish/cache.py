@@ -0,0 +1,68 @@
+"""persistent on-disk cache of parsed chunks"""
+# NOTE: opt-in, set bish.cache.directory to enable
+# -- entries are keyed by DXBC checksum, so identical shaders share an entry
+# -- & by version, so outdated entries are just misses (nothing is deleted
+# -- while other processes might be reading the directory)
+from __future__ import annotations
+import os
+import pickle
+import tempfile
+from typing import Any, Dict, Union
+
+
+version = 4
+# ^ bump whenever parsed chunk classes change, invalidating old entries
+directory: Union[str, None] = None
+# ^ cache is disabled if None
+# NOTE: entries are unpickled & compiled kernels are exec'd (see emulator.compiler)
+# -- so directory must only be writable by users you trust
+
+
+class Entry:
+    version: int
+    chunks: Dict[str, Any]
+    # ^ {"id": parsed_chunk}
+    loading_errors: Dict[str, Exception]
+    # ^ {"id": Error}
+
+    def __init__(self, chunks=None, loading_errors=None):
+        self.version = version
+        self.chunks = dict() if chunks is None else chunks
+        self.loading_errors = dict() if loading_errors is None else loading_errors
+
+    def __repr__(self) -> str:
+        descriptor = f"v{self.version} {len(self.chunks)} chunks"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+
+def is_enabled() -> bool:
+    return directory is not None
+
+
+def filepath_for(checksum: bytes) -> str:
+    return os.path.join(directory, f"{checksum.hex()}.v{version}.pickle")
+
+
+def load(checksum: bytes) -> Union[Entry, None]:
+    """returns None if missing, outdated or unreadable"""
+    try:
+        with open(filepath_for(checksum), "rb") as cache_file:
+            entry = pickle.load(cache_file)
+    except Exception:  # missing or unreadable, save will overwrite it
+        return None
+    if not isinstance(entry, Entry) or entry.version != version:
+        return None
+    return entry
+
+
+def save(checksum: bytes, entry: Entry):
+    os.makedirs(directory, exist_ok=True)
+    # NOTE: write to a temp file first, in case other processes are reading
+    handle, temp_filepath = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as temp_file:
+            pickle.dump(entry, temp_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filepath, filepath_for(checksum))
+    except BaseException:  # don't leave partial entries behind
+        os.remove(temp_filepath)
+        raise
@@ -1,15 +1,86 @@
 from __future__ import annotations
 import enum
 import io
-from typing import Any, List, Tuple
+from typing import Any, Dict, List, Tuple, Type
 
 from breki.binary import read_str, read_struct
 
+from .. import buffers
+
+
+class Cache:
+    """strings & ShaderTypes shared across one ResourceDefinition parse"""
+    # NOTE: lots of ShaderTypes & strings are referenced more than once
+    # -- keyed by offset, so each is only parsed once
+    # -- also tracks which bytes were read, to confirm the whole chunk is parsed
+    raw: memoryview  # whole chunk (not a copy), for fast string lookups
+    strings: Dict[int, str]
+    # ^ {offset: string}
+    types: Dict[int, ShaderType]
+    # ^ {offset: ShaderType}
+    consumed: List[Tuple[int, int]]
+    # ^ [(start, end)]
+
+    def __init__(self, stream: io.BytesIO = None):
+        self.raw = memoryview(b"")
+        if stream is not None and hasattr(stream, "getbuffer"):
+            self.raw = stream.getbuffer()
+            # ^ io.BytesIO & buffers.MemoryStream share their buffer
+        self.strings = dict()
+        self.types = dict()
+        self.consumed = list()
 
-# NOTE: lots of ShaderTypes & strings will be parsed more than once
-# -- would be clever to keep a cache of what was parsed from where
-# -- also lets us confirm the whole chunk has been parsed
-# -- instead of manually checking debug prints
+    def __repr__(self) -> str:
+        descriptor = f"{len(self.strings)} strings {len(self.types)} types"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    def consume(self, start: int, length: int):
+        self.consumed.append((start, start + length))
+
+    def string(self, stream: io.BytesIO, offset: int) -> str:
+        if offset not in self.strings:
+            if len(self.raw) > 0:
+                end = self.find_null(offset)
+                string = bytes(self.raw[offset:end]).decode("utf-8")
+            else:  # no buffer to search
+                stream.seek(offset)
+                string = read_str(stream)
+                end = offset + len(string.encode("utf-8"))
+            self.strings[offset] = string
+            self.consume(offset, end + 1 - offset)
+        return self.strings[offset]
+
+    def find_null(self, offset: int) -> int:
+        """index of the first b"\x00" at or after offset"""
+        # NOTE: memoryviews can't .index(), so we search a few bytes at a time
+        # -- copying only the string & not the rest of the chunk
+        end = offset
+        while True:
+            window = bytes(self.raw[end:end + 64])
+            if len(window) == 0:
+                raise ValueError("unterminated string")
+            null = window.find(b"\x00")
+            if null != -1:
+                return end + null
+            end += len(window)
+
+    def check(self, offset: int, length: int):
+        """assert offset & length are within the chunk"""
+        if len(self.raw) > 0:
+            assert 0 <= offset and offset + length <= len(self.raw), "offset out of bounds"
+
+    def type(self, stream: io.BytesIO, offset: int, version: Tuple[int, int]) -> ShaderType:
+        # NOTE: ShaderType.from_stream adds itself to .types before parsing members
+        # -- so a type which contains itself resolves to the same object
+        # -- instead of recursing forever
+        type_class = shader_type_class(version)
+        if offset not in self.types:
+            self.check(offset, type_class.size)
+            stream.seek(offset)
+            type_class.from_stream(stream, version, self)
+        out = self.types[offset]
+        assert isinstance(out, type_class), "ShaderType read as 2 different versions"
+        return out
 
 
 class ResourceDefinition:
@@ -20,10 +91,13 @@ class ResourceDefinition:
     const_buffers: List[Any]
     resource_bindings: List[Any]
     creator: str  # compiler name & version etc.
+    consumed: List[Tuple[int, int]]
+    # ^ [(start, end)] byte ranges parsed, may overlap
 
     def __init__(self):
         self.const_buffers = list()
         self.resource_bindings = list()
+        self.consumed = list()
 
     def __repr__(self) -> str:
         descriptor = f"v{self.version[0]}.{self.version[1]}"
@@ -31,54 +105,69 @@ class ResourceDefinition:
         return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
 
     @classmethod
-    def from_bytes(cls, raw_chunk: bytes) -> ResourceDefinition:
-        return cls.from_stream(io.BytesIO(raw_chunk))
+    def from_bytes(cls, raw_chunk: buffers.Buffer) -> ResourceDefinition:
+        return cls.from_stream(buffers.stream_for(raw_chunk))
 
     @classmethod
     def from_stream(cls, stream: io.BytesIO) -> ResourceDefinition:
         out = cls()
         start = stream.tell()
-        num_const_buffers = read_struct(stream, "I")
-        const_buffer_offset = read_struct(stream, "I")
-        num_resource_bindings = read_struct(stream, "I")
-        resource_binding_offset = read_struct(stream, "I")
+        cache = Cache(stream)
+        num_const_buffers, const_buffer_offset = read_struct(stream, "2I")
+        num_resource_bindings, resource_binding_offset = read_struct(stream, "2I")
         out.version = read_struct(stream, "2B")
         out.program_type = read_struct(stream, "h")
-        out.flags = read_struct(stream, "I")
-        creator_offset = read_struct(stream, "I")
+        out.flags, creator_offset = read_struct(stream, "2I")
         if out.version == (0, 5):
             # struct sizes?
             unknown = read_struct(stream, "4s7I")
             expected = (b"RD11", 60, 24, 32, 40, 36, 12, 0)
             assert unknown == expected, f"{unknown}"
+        cache.consume(start, stream.tell() - start)
         # fingers crossed we support v4.0 already
         assert out.version in ((0, 4), (0, 5)), f"v{out.version[0]}.{out.version[1]} unsupported"
         # resource bindings
+        cache.check(start + resource_binding_offset, ResourceBinding.size * num_resource_bindings)
         stream.seek(start + resource_binding_offset)
         out.resource_bindings = [
-            ResourceBinding.from_stream(stream)
+            ResourceBinding.from_stream(stream, cache)
             for i in range(num_resource_bindings)]
         # const buffers
-        # NOTE: ConstBuffer.from_stream accepts version as an argument
-        # -- however, it currently get trapped in a loop looking up parents
-        # -- something we need to be avoiding anyway
-        if out.version == (0, 5):  # breaking on v0.4
-            stream.seek(start + const_buffer_offset)
-            out.const_buffers = [
-                ConstBuffer.from_stream(stream)
-                for i in range(num_const_buffers)]
-        else:  # v0.4
-            # good luck buddy
-            out.const_buffer_offset = const_buffer_offset
-            out.num_const_buffers = num_const_buffers
+        cache.check(start + const_buffer_offset, ConstBuffer.size * num_const_buffers)
+        stream.seek(start + const_buffer_offset)
+        out.const_buffers = [
+            ConstBuffer.from_stream(stream, out.version, cache)
+            for i in range(num_const_buffers)]
         # creator
-        stream.seek(start + creator_offset)
-        out.creator = read_str(stream)
-        # NOTE: stream.tell() should be at the end of the lump
+        out.creator = cache.string(stream, start + creator_offset)
+        out.consumed = cache.consumed
+        return out
+
+    def coverage(self) -> List[Tuple[int, int]]:
+        """merged (start, end) ranges of parsed bytes"""
+        out = list()
+        for start, end in sorted(self.consumed):
+            if len(out) > 0 and start <= out[-1][1]:
+                out[-1] = (out[-1][0], max(out[-1][1], end))
+            else:
+                out.append((start, end))
+        return out
+
+    def gaps(self, length: int) -> List[Tuple[int, int]]:
+        """(start, end) ranges of a length byte chunk which weren't parsed"""
+        out = list()
+        position = 0
+        for start, end in self.coverage():
+            if start > position:
+                out.append((position, start))
+            position = max(position, end)
+        if position < length:
+            out.append((position, length))
         return out
 
 
 class ConstBuffer:
+    size: int = 24  # bytes
     name: str
     variables: List[ShaderVariable]
     flags: int
@@ -90,22 +179,19 @@ class ConstBuffer:
         return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
 
     @classmethod
-    def from_bytes(cls, raw_chunk: bytes) -> ConstBuffer:
-        return cls.from_stream(io.BytesIO(raw_chunk))
+    def from_bytes(cls, raw_chunk: buffers.Buffer) -> ConstBuffer:
+        return cls.from_stream(buffers.stream_for(raw_chunk))
 
     @classmethod
-    def from_stream(cls, stream: io.BytesIO, version=(0, 5)) -> ConstBuffer:
+    def from_stream(cls, stream: io.BytesIO, version=(0, 5), cache: Cache = None) -> ConstBuffer:
+        cache = Cache(stream) if cache is None else cache
         out = cls()
         start = stream.tell()
-        name_offset = read_struct(stream, "I")
-        variable_count = read_struct(stream, "I")
-        variable_offset = read_struct(stream, "I")
-        out.flags = read_struct(stream, "I")
-        out.buffer_type = read_struct(stream, "I")
-        out.unknown = read_struct(stream, "I")
+        name_offset, variable_count, variable_offset = read_struct(stream, "3I")
+        out.flags, out.buffer_type, out.unknown = read_struct(stream, "3I")
+        cache.consume(start, 24)
         # name
-        stream.seek(name_offset)
-        out.name = read_str(stream)
+        out.name = cache.string(stream, name_offset)
         # variables
         assert version[0] == 0
         if version[1] < 5:
@@ -116,15 +202,17 @@ class ConstBuffer:
             v = f"v{version[0]}.{version[1]}"
             raise NotImplementedError(f"unknown ShaderVariable version: {v}")
         # variables
+        cache.check(variable_offset, variable_class.size * variable_count)
         stream.seek(variable_offset)
         out.variables = [
-            variable_class.from_stream(stream, version)
+            variable_class.from_stream(stream, version, cache)
             for i in range(variable_count)]
         stream.seek(start + 24)
         return out
 
 
 class ShaderType:
+    size: int = 16  # bytes
     var_class: VariableClass
     var_type: VariableType
     rows: int
@@ -137,48 +225,52 @@ class ShaderType:
         return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
 
     @classmethod
-    def from_stream(cls, stream) -> ShaderType:
+    def from_stream(cls, stream, version: Tuple[int, int] = (0, 4), cache: Cache = None) -> ShaderType:
+        cache = Cache(stream) if cache is None else cache
         out = cls()
         start = stream.tell()
-        out.var_class = VariableClass(read_struct(stream, "h"))
-        out.var_type = VariableType(read_struct(stream, "H"))
-        out.rows = read_struct(stream, "H")
-        out.columns = read_struct(stream, "H")
-        out.num_elements = read_struct(stream, "H")
-        num_members = read_struct(stream, "H")
-        member_offset = read_struct(stream, "I")
+        cache.types[start] = out  # before members, in case they refer back to us
+        var_class, var_type, *dimensions, member_offset = read_struct(stream, "h5HI")
+        out.var_class = VariableClass(var_class)
+        out.var_type = VariableType(var_type)
+        out.rows, out.columns, out.num_elements, num_members = dimensions
+        cache.consume(start, 16)
         # members
+        if num_members > 0:
+            cache.check(member_offset, Member.size * num_members)
         stream.seek(member_offset)
         out.members = [
-            Member.from_stream(stream)
+            Member.from_stream(stream, version, cache)
             for i in range(num_members)]
         stream.seek(start + 16)
         return out
 
 
 class ShaderType_v5(ShaderType):
+    size: int = 36  # bytes
     parent_type_offset: int
     unknown: Tuple[int, int, int]
     parent_name: str
     # NOTE: if .parent_type_offset is 0, .parent_name may as well be .name
 
     @classmethod
-    def from_stream(cls, stream) -> ShaderType_v5:
-        out = super(ShaderType_v5, cls).from_stream(stream)
+    def from_stream(cls, stream, version: Tuple[int, int] = (0, 5), cache: Cache = None) -> ShaderType_v5:
+        cache = Cache(stream) if cache is None else cache
+        out = super(ShaderType_v5, cls).from_stream(stream, version, cache)
         start = stream.tell()
-        out.parent_type_offset = read_struct(stream, "I")
-        out.unknown = read_struct(stream, "3I")
-        parent_name_offset = read_struct(stream, "I")
+        out.parent_type_offset, *unknown, parent_name_offset = read_struct(stream, "5I")
+        out.unknown = tuple(unknown)
+        cache.consume(start, 20)
         # parent_name
-        stream.seek(parent_name_offset)
-        out.parent_name = read_str(stream)
+        out.parent_name = cache.string(stream, parent_name_offset)
         stream.seek(start + 20)
         return out
 
 
 class Member:
+    size: int = 12  # bytes
     name: str
-    type: ShaderType_v5
+    type: ShaderType
     offset: int  # struct offset?
 
     def __repr__(self) -> str:
@@ -187,22 +279,31 @@ class Member:
         return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
 
     @classmethod
-    def from_stream(cls, stream: io.BytesIO) -> Member:
+    def from_stream(cls, stream: io.BytesIO, version: Tuple[int, int] = (0, 5), cache: Cache = None) -> Member:
+        cache = Cache(stream) if cache is None else cache
         out = cls()
         start = stream.tell()
-        name_offset = read_struct(stream, "I")
-        type_offset = read_struct(stream, "I")
-        out.offset = read_struct(stream, "I")
+        name_offset, type_offset, out.offset = read_struct(stream, "3I")
+        cache.consume(start, 12)
         # name
-        stream.seek(name_offset)
-        out.name = read_str(stream)
-        # unknown
-        stream.seek(type_offset)
-        out.type = ShaderType_v5.from_stream(stream)
+        out.name = cache.string(stream, name_offset)
+        # type
+        out.type = cache.type(stream, type_offset, version)
         stream.seek(start + 12)
         return out
 
 
+def shader_type_class(version: Tuple[int, int]) -> Type[ShaderType]:
+    assert version[0] == 0
+    if version[1] < 5:
+        return ShaderType
+    elif version[1] == 5:
+        return ShaderType_v5
+    else:
+        v = f"v{version[0]}.{version[1]}"
+        raise NotImplementedError(f"unknown ShaderType version: {v}")
+
+
 class VariableClass(enum.Enum):
     D3D_SCALAR = 0
     D3D_VECTOR = 1
@@ -274,6 +375,7 @@ class VariableType(enum.Enum):
 
 
 class ShaderVariable:
+    size: int = 24  # bytes
     name: str
     variable: Tuple[int, int]
     # ^ (offset, length)
@@ -286,58 +388,51 @@ class ShaderVariable:
         return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
 
     @classmethod
-    def from_stream(cls, stream: io.BytesIO, version: Tuple[int, int] = (0, 5)) -> ShaderVariable:
+    def from_stream(cls, stream: io.BytesIO, version: Tuple[int, int] = (0, 5), cache: Cache = None) -> ShaderVariable:
+        cache = Cache(stream) if cache is None else cache
         out = cls()
         start = stream.tell()
-        name_offset = read_struct(stream, "I")
-        variable_offset = read_struct(stream, "I")  # relative to something?
-        variable_length = read_struct(stream, "I")
+        name_offset, variable_offset, variable_length = read_struct(stream, "3I")
+        # NOTE: variable_offset relative to something?
         out.variable = (variable_offset, variable_length)
-        out.flags = read_struct(stream, "I")
-        type_offset = read_struct(stream, "I")  # ShaderType?
-        out.default_variable_offset = read_struct(stream, "I")  # ???
+        out.flags, type_offset, out.default_variable_offset = read_struct(stream, "3I")
+        # NOTE: type_offset -> ShaderType?, default_variable_offset ???
+        cache.consume(start, 24)
         # name
-        stream.seek(name_offset)
-        out.name = read_str(stream)
+        out.name = cache.string(stream, name_offset)
         # type
-        assert version[0] == 0
-        if version[1] < 5:
-            type_class = ShaderType
-        elif version[1] == 5:
-            type_class = ShaderType_v5
-        else:
-            v = f"v{version[0]}.{version[1]}"
-            raise NotImplementedError(f"unknown ShaderVariable version: {v}")
-        stream.seek(type_offset)
-        out.type = type_class.from_stream(stream)
+        out.type = cache.type(stream, type_offset, version)
         stream.seek(start + 24)
         return out
 
 
 class ShaderVariable_v5(ShaderVariable):
+    size: int = 40  # bytes
     # type: ShaderType_v5
     texture: bytes
     sampler: bytes
 
     @classmethod
-    def from_stream(cls, stream: io.BytesIO, version: Tuple[int, int] = (0, 5)) -> ShaderVariable:
-        out = super(ShaderVariable_v5, cls).from_stream(stream, version)
+    def from_stream(cls, stream: io.BytesIO, version: Tuple[int, int] = (0, 5), cache: Cache = None) -> ShaderVariable:
+        cache = Cache(stream) if cache is None else cache
+        out = super(ShaderVariable_v5, cls).from_stream(stream, version, cache)
         start = stream.tell()
-        texture_offset = read_struct(stream, "i")
-        texture_length = read_struct(stream, "I")
-        sampler_offset = read_struct(stream, "i")
-        sampler_length = read_struct(stream, "I")
+        texture_offset, texture_length = read_struct(stream, "iI")
+        sampler_offset, sampler_length = read_struct(stream, "iI")
+        cache.consume(start, 16)
         # texture
         if texture_offset != -1:
             stream.seek(texture_offset)
-            out.texture = stream.read(texture_length)
+            out.texture = bytes(stream.read(texture_length))
+            cache.consume(texture_offset, texture_length)
         else:
             assert texture_length == 0
             out.texture = b""
         # sampler
         if sampler_offset != -1:
             stream.seek(sampler_offset)
-            out.sampler = stream.read(sampler_length)
+            out.sampler = bytes(stream.read(sampler_length))
+            cache.consume(sampler_offset, sampler_length)
         else:
             assert sampler_length == 0
             out.sampler = b""
@@ -346,6 +441,7 @@ class ShaderVariable_v5(ShaderVariable):
 
 
 class ResourceBinding:
+    size: int = 32  # bytes
     name: str
     type: int  # TODO: enum
     return_type: int  # TODO: enum
@@ -361,23 +457,18 @@ class ResourceBinding:
         return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
 
     @classmethod
-    def from_bytes(cls, raw_chunk: bytes) -> ResourceBinding:
-        return cls.from_stream(io.BytesIO(raw_chunk))
+    def from_bytes(cls, raw_chunk: buffers.Buffer) -> ResourceBinding:
+        return cls.from_stream(buffers.stream_for(raw_chunk))
 
     @classmethod
-    def from_stream(cls, stream: io.BytesIO) -> ResourceBinding:
+    def from_stream(cls, stream: io.BytesIO, cache: Cache = None) -> ResourceBinding:
+        cache = Cache(stream) if cache is None else cache
         out = cls()
         start = stream.tell()
-        name_offset = read_struct(stream, "I")
-        out.type = read_struct(stream, "I")
-        out.return_type = read_struct(stream, "I")
-        out.dimension = read_struct(stream, "I")
-        out.num_samples = read_struct(stream, "i")
-        out.bind_point = read_struct(stream, "I")
-        out.bind_count = read_struct(stream, "I")
-        out.flags = read_struct(stream, "I")
+        name_offset, out.type, out.return_type, out.dimension = read_struct(stream, "4I")
+        out.num_samples, out.bind_point, out.bind_count, out.flags = read_struct(stream, "i3I")
+        cache.consume(start, 32)
         # name
-        stream.seek(name_offset)
-        out.name = read_str(stream)
+        out.name = cache.string(stream, name_offset)
         stream.seek(start + 32)
         return out
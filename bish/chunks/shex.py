@@ -1,11 +1,14 @@
 from __future__ import annotations
 import enum
+import functools
 import io
-from typing import List, Tuple
+from typing import Tuple
 
 from breki.binary import read_struct
+import numpy as np
 
 from .. import asm
+from .. import buffers
 
 
 class ShaderType(enum.Enum):
@@ -24,12 +27,25 @@ class Shader_v5:
     """DirectX 11 (Shader Model 5) Shader"""
     type: ShaderType
     version: Tuple[int, int]
-    instructions: List[asm.Instruction]
+    instructions: asm.InstructionTable
+    # ^ asm.Instructions are decoded when indexed
+    tokens: np.ndarray  # uint32 view of the whole chunk
 
     def __init__(self):
         self.type = ShaderType(0x00)
         self.version = (5, 0)
-        self.instructions = list()
+        self.tokens = np.array([0x00000050, 2], dtype=np.uint32)
+        self.instructions = asm.InstructionTable(self.tokens)
+
+    @functools.cached_property
+    def cfg(self) -> asm.ControlFlowGraph:
+        """control flow graph, built on first access"""
+        return asm.ControlFlowGraph.from_table(self.instructions)
+
+    @functools.cached_property
+    def dataflow(self) -> asm.Dataflow:
+        """per-component liveness & def-use chains, built on first access"""
+        return asm.Dataflow.from_table(self.instructions, self.cfg)
 
     def __repr__(self) -> str:
         descriptor = f"v{self.version[0]}.{self.version[1]} ({self.type.name})"
@@ -37,29 +53,24 @@ class Shader_v5:
         return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
 
     @classmethod
-    def from_bytes(cls, raw_chunk: bytes) -> Shader_v5:
-        return cls.from_stream(io.BytesIO(raw_chunk))
-
-    @classmethod
-    def from_stream(cls, stream: io.BytesIO) -> Shader_v5:
+    def from_bytes(cls, raw_chunk: buffers.Buffer) -> Shader_v5:
         out = cls()
-        version = read_struct(stream, "I")
+        tokens = asm.index.tokens_for(raw_chunk)
+        version, length = map(int, tokens[:2])
         type_ = (version & 0xFFFF0000) >> 16
         major = (version & 0x000000F0) >> 4
         minor = (version & 0x0000000F) >> 0
         out.type = ShaderType(type_)
         out.version = (major, minor)
-        length = read_struct(stream, "I")
         assert length >= 2, f"invalid length: {length}"
-        out.instructions = list()
-        tokens_read = 2
-        while (tokens_read < length):
-            try:
-                instruction = asm.Instruction.from_stream(stream)
-            except Exception as exc:
-                print(f"! {tokens_read=}")
-                raise exc
-            tokens_read += len(instruction)
-            out.instructions.append(instruction)
-        assert tokens_read == length, f"overshot by {tokens_read - length} tokens"
+        assert length <= len(tokens), f"{length - len(tokens)} tokens short"
+        out.tokens = tokens[:length]
+        out.instructions = asm.InstructionTable(out.tokens)
         return out
+
+    @classmethod
+    def from_stream(cls, stream: io.BytesIO) -> Shader_v5:
+        start = stream.tell()
+        version, length = read_struct(stream, "2I")
+        stream.seek(start)
+        return cls.from_bytes(stream.read(length * 4))
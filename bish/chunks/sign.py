@@ -4,6 +4,8 @@ from typing import List
 
 from breki.binary import read_str, read_struct
 
+from .. import buffers
+
 
 class Signature:
     """Input (ISGN) / Output (OSGN) Signature"""
@@ -15,8 +17,8 @@ class Signature:
         return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
 
     @classmethod
-    def from_bytes(cls, raw_isgn: bytes) -> Signature:
-        return cls.from_stream(io.BytesIO(raw_isgn))
+    def from_bytes(cls, raw_isgn: buffers.Buffer) -> Signature:
+        return cls.from_stream(buffers.stream_for(raw_isgn))
 
     @classmethod
     def from_stream(cls, stream: io.BytesIO) -> Signature:
@@ -3,6 +3,8 @@ import io
 
 from breki.binary import read_struct
 
+from .. import buffers
+
 
 class Statistics:
     num_instructions: int
@@ -11,9 +13,9 @@ class Statistics:
     ...
 
     @classmethod
-    def from_bytes(cls, raw_chunk: bytes) -> Statistics:
+    def from_bytes(cls, raw_chunk: buffers.Buffer) -> Statistics:
         assert len(raw_chunk) == 148, f"unexpected size: {len(raw_chunk)} bytes"
-        return cls.from_stream(io.BytesIO(raw_chunk))
+        return cls.from_stream(buffers.stream_for(raw_chunk))
 
     @classmethod
     def from_stream(cls, stream: io.BytesIO) -> Statistics:
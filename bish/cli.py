@@ -0,0 +1,174 @@
+"""command-line interface"""
+# $ bish scan shaders/ -o scan.jsonl -j 8 --resume
+from __future__ import annotations
+import argparse
+import concurrent.futures
+import fnmatch
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Set
+
+from . import batch
+from . import cache
+from . import fxc
+from . import msw
+from . import profiling
+from . import vcs
+
+
+file_patterns = ("*.fxc", "*.msw", "*.vcs")
+
+
+def find_files(paths: List[str]) -> Iterator[str]:
+    """folders are searched recursively"""
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, subfolders, filenames in os.walk(path):
+                subfolders.sort()
+                for filename in sorted(filenames):
+                    if any(fnmatch.fnmatch(filename.lower(), p) for p in file_patterns):
+                        yield os.path.join(folder, filename)
+        else:
+            yield path
+
+
+def init_worker(cache_directory: str, profile: bool = False):
+    cache.directory = cache_directory
+    fxc.Fxc.profile = profile
+
+
+def scan_file(filepath: str) -> List[Dict[str, Any]]:
+    """one record per shader; files w/o shaders get one record w/ an empty "shaders" list"""
+    records = list()
+    start = time.perf_counter()
+    base = {"file": filepath, "entry": None}
+    try:
+        if filepath.lower().endswith(".vcs"):
+            archive = vcs.Vcs.from_file(filepath)
+            archive.mapped = True
+            for name, shader in archive.iter_shaders():
+                summary = batch.summarise_fxc(name, shader)
+                records.append({**base, **summary.as_dict(), "entry": name})
+        elif filepath.lower().endswith(".msw"):
+            # NOTE: embedded shaders aren't parsed yet, only the header
+            wrapper = msw.Msw.from_file(filepath)
+            record = {**base, "msw_type": None, "loading_errors": dict()}
+            try:
+                wrapper.parse()
+            except Exception as exc:
+                record["loading_errors"]["MSW"] = repr(exc)
+            if hasattr(wrapper, "msw_type"):
+                record["msw_type"] = wrapper.msw_type.name
+            records.append(record)
+        else:
+            summary = batch.summarise_fxc(filepath, fxc.Fxc.from_file(filepath))
+            records.append({**base, **summary.as_dict()})
+    except Exception as exc:  # couldn't open the file / walk the archive
+        container = os.path.splitext(filepath)[1][1:].upper()
+        records.append({**base, "loading_errors": {container: repr(exc)}})
+    if len(records) == 0:  # e.g. an empty .vcs
+        records.append({**base, "loading_errors": dict(), "shaders": list(), "mtime": os.path.getmtime(filepath)})
+    for record in records:
+        record.pop("name", None)
+    records[-1]["file_time"] = time.perf_counter() - start
+    # ^ only the last record for each file has a "file_time"
+    # -- on --resume, a file is finished if it's last record was written
+    return records
+
+
+def finished_files(output_filepath: str) -> Set[str]:
+    """files w/ a complete set of records in output"""
+    # NOTE: truncates records of unfinished files, they'll be scanned again
+    out = set()
+    if not os.path.exists(output_filepath):
+        return out
+    position = finished_length = 0
+    with open(output_filepath, "rb") as output_file:
+        for line in output_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break  # interrupted mid-write
+            if not line.endswith(b"\n"):
+                break
+            position += len(line)
+            if "file_time" in record:
+                out.add(record["file"])
+                finished_length = position
+    with open(output_filepath, "rb+") as output_file:
+        output_file.truncate(finished_length)
+    return out
+
+
+def scan(args: argparse.Namespace) -> int:
+    filepaths = list(find_files(args.paths))
+    if args.resume:
+        if args.output is None:
+            print("--resume requires --output", file=sys.stderr)
+            return 2
+        done = finished_files(args.output)
+        filepaths = [f for f in filepaths if f not in done]
+    if args.output is None:
+        output_file = sys.stdout
+    else:
+        output_file = open(args.output, "a" if args.resume else "w")
+    num_records = num_errors = 0
+    total_stats = profiling.ParseStats()
+    start = time.perf_counter()
+    if args.workers <= 1:
+        init_worker(args.cache, args.profile)
+        results = map(scan_file, filepaths)
+        pool = None
+    else:
+        pool = concurrent.futures.ProcessPoolExecutor(
+            args.workers, initializer=init_worker, initargs=(args.cache, args.profile))
+        results = pool.map(scan_file, filepaths)
+    try:
+        for i, records in enumerate(results):
+            for record in records:
+                output_file.write(json.dumps(record) + "\n")
+                num_errors += len(record["loading_errors"]) > 0
+                if "stats" in record:
+                    total_stats += profiling.ParseStats.from_dict(record["stats"])
+            output_file.flush()  # each file's records are written together
+            num_shaders = sum("shaders" not in record for record in records)
+            num_records += num_shaders
+            if not args.quiet:
+                print(
+                    f"[{i + 1}/{len(filepaths)}] {filepaths[i]} ({num_shaders} shaders)",
+                    file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if output_file is not sys.stdout:
+            output_file.close()
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        print(
+            f"scanned {len(filepaths)} files ({num_records} shaders, "
+            f"{num_errors} w/ errors) in {elapsed:.2f}s", file=sys.stderr)
+    if args.profile:
+        print("\n".join(total_stats.as_lines()), file=sys.stderr)
+    return 0
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="bish", description="Bikkie's Interactive Shader Tool")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    scan_parser = subparsers.add_parser(
+        "scan", help="parse shaders & write one JSON line per shader")
+    scan_parser.add_argument("paths", nargs="+", help=".fxc, .msw & .vcs files or folders")
+    scan_parser.add_argument("-o", "--output", help="JSON lines file (default: stdout)")
+    scan_parser.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    scan_parser.add_argument(
+        "--resume", action="store_true", help="skip files already in --output")
+    scan_parser.add_argument("--cache", help="bish.cache directory")
+    scan_parser.add_argument(
+        "--profile", action="store_true", help="per-chunk timings & counters")
+    scan_parser.add_argument("-q", "--quiet", action="store_true", help="no progress")
+    scan_parser.set_defaults(function=scan)
+    args = parser.parse_args(argv)
+    return args.function(args)
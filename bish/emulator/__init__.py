@@ -0,0 +1,19 @@
+__all__ = [
+    "compiler", "compute", "interpreter", "memory", "operations", "state", "textures",
+    "Interpreter", "Program", "Sampler", "State", "Texture", "UnsupportedInstruction",
+    "dispatch", "run"]
+
+
+from . import compiler
+from . import compute
+from . import interpreter
+from . import memory
+from . import operations
+from . import state
+from . import textures
+
+from .compiler import Program
+from .compute import dispatch
+from .interpreter import Interpreter, UnsupportedInstruction, run
+from .state import State
+from .textures import Sampler, Texture
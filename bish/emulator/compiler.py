@@ -0,0 +1,449 @@
+"""compile SHEX into python source over numpy arrays"""
+# NOTE: each straight-line run of instructions (a basic block w/o it's flow
+# -- control) becomes one python function; operand lookups, swizzles &
+# -- write masks are resolved while compiling, so runs skip decode & dispatch
+# -- flow control is still run by the Interpreter, w/ execution masks
+from __future__ import annotations
+import os
+import tempfile
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+from .. import cache
+from ..asm.base import opcodes
+from ..asm.base.operands import FullOperand, SelectionMode, Type
+from ..asm.dataflow import componentwise
+from . import memory
+from . import operations
+from . import textures
+from .interpreter import Frame, Interpreter, flow_control, gather, mask_components, scatter, texel_offsets, thread_ids
+from .state import State
+
+
+D = opcodes.D3D_10_0
+D11 = opcodes.D3D_11_0
+
+version = 6
+# ^ bump whenever generated code changes, invalidating cached kernels
+programs = dict()
+# ^ {checksum: Program}
+
+register_arrays = {
+    Type.TEMP: "r",
+    Type.INPUT: "v",
+    Type.OUTPUT: "o"}
+# ^ {Type: "local_name"}; see prologue
+
+prologue = [
+    "r, v, o = s.temps, s.inputs, s.outputs",
+    "x, cb = s.indexable_temps, s.constant_buffers",
+    "n = s.num_invocations"]
+
+dtype_names = {"f": "np.float32", "i": "np.int32", "u": "np.uint32"}
+
+
+namespace = {
+    **operations.namespace,
+    "gather": gather, "scatter": scatter, "as_bits": operations.as_bits,
+    "address": memory.address, "atomic": memory.atomic, "flat": memory.flat,
+    "load": memory.load, "store": memory.store, "D11": D11, "Type": Type,
+    "evaluate": textures.evaluate, "default_sampler": textures.default_sampler, "opcodes": opcodes,
+    "EMPTY": np.zeros((0, 4), dtype=np.uint32)}
+# ^ globals for generated code
+
+
+def columns(components: List[int]) -> str:
+    """index expression; slices are views, lists are copies"""
+    lo = components[0]
+    if components == list(range(lo, lo + len(components))):
+        return f"{lo}:{lo + len(components)}"
+    return repr(components)
+
+
+def bits(expression: str, type_: str, saturate: bool = False) -> str:
+    """inline operations.as_bits"""
+    if type_ == "b" or saturate:
+        return f"as_bits({expression}, {type_!r}, {saturate})"
+    expression = f"np.asarray({expression}, dtype={dtype_names[type_]})"
+    return expression if type_ == "u" else f"{expression}.view(np.uint32)"
+
+
+def selected(operand: FullOperand) -> List[int]:
+    """component read for each of x, y, z & w"""
+    if operand.selection_mode == SelectionMode.SWIZZLE:
+        return [name.value for name in operand.swizzle]
+    elif operand.selection_mode == SelectionMode.SELECT_1:
+        return [operand.name.value] * 4
+    return [0, 1, 2, 3]
+
+
+class Compiler:
+    """generates python source for one shader
+    raises UnsupportedInstruction (via Interpreter) for shaders we can't run"""
+    interpreter: Interpreter
+    # ^ decodes the shader, rejects unsupported instructions & matches flow control for us
+    constants: Dict[str, str]
+    # ^ {"definition": "name"}
+
+    def __init__(self, shader):
+        self.interpreter = Interpreter(shader)
+        self.constants = dict()
+
+    def constant(self, value: np.ndarray) -> str:
+        definition = f"np.array({value.view(np.uint32).tolist()}, dtype=np.uint32)"
+        if value.dtype != np.uint32:
+            definition = f"{definition}.view(np.{value.dtype.name})"
+        if definition not in self.constants:
+            self.constants[definition] = f"K{len(self.constants)}"
+        return self.constants[definition]
+
+    # operands
+    def index(self, operand: FullOperand, i: int) -> Union[int, str]:
+        imm, rel = operand.indices[i]
+        if rel is None:
+            return imm
+        return f"({self.read(rel, 'u', [0])}[:, 0].astype(np.int64) + {imm or 0})"
+
+    def registers(self, operand: FullOperand) -> Tuple[str, Union[int, str]]:
+        """(array, index)"""
+        type_ = operand.type
+        if type_ in register_arrays:
+            i = len(operand.indices) - 1 if type_ == Type.INPUT else 0
+            return register_arrays[type_], self.index(operand, i)
+        elif type_ == Type.INDEXABLE_TEMP:
+            return f"x[{operand.indices[0][0]}]", self.index(operand, 1)
+        elif type_ == Type.CONSTANT_BUFFER:
+            return f"cb.get({operand.indices[0][0]}, EMPTY)", self.index(operand, 1)
+        elif type_ == Type.IMMEDIATE_CONSTANT_BUFFER:
+            return "immediate_constants", self.index(operand, 0)
+        raise RuntimeError(f"unchecked {type_.name} operand")  # see Interpreter.check
+
+    def read(self, operand: FullOperand, type_: str, components: List[int] = None) -> str:
+        """expression for a source operand; components: destination components (if componentwise)"""
+        read = selected(operand)
+        if components is not None:
+            read = [read[c] for c in components]
+            if len(set(read)) == 1:  # (N, 1) broadcasts
+                read = read[:1]
+        modifier = operand.modifier.value
+        if operand.type == Type.IMMEDIATE_32:
+            values = [imm for imm, rel in operand.indices]
+            value = np.array([values * (4 // len(values))], dtype=np.uint32)[:, read]
+            value = value.view(operations.dtypes[type_])
+            if modifier != 0:
+                value = operations.modify(value, type_, modifier)
+            return self.constant(value)
+        elif operand.type in thread_ids:
+            out = f"s.system_values[Type.{operand.type.name}][:, {columns(read)}]"
+            return out if type_ == "u" else f"{out}.view({dtype_names[type_]})"
+        array, index = self.registers(operand)
+        if isinstance(index, int) and operand.type not in (Type.CONSTANT_BUFFER, Type.IMMEDIATE_CONSTANT_BUFFER):
+            out = f"{array}[:, {index}, {columns(read)}]"
+        else:
+            out = f"gather({array}, {index})[:, {columns(read)}]"
+        if type_ != "u":
+            out = f"{out}.view({dtype_names[type_]})"
+        if modifier & 2 and type_ != "u":  # ABS
+            out = f"np.abs({out})"
+        if modifier & 1:  # NEG
+            out = f"(-{out})" if type_ != "u" else f"(0 - {out})"
+        return out
+
+    def write(self, operand: FullOperand, value: str, is_full: bool) -> List[str]:
+        """is_full: value has all 4 components, rather than one per written component"""
+        if operand.type == Type.NULL:
+            return list()
+        written = mask_components(operand)
+        if len(written) == 0:
+            return list()
+        out = [f"w = {value}[:, {columns(written)}]" if is_full else f"w = {value}"]
+        if operand.type == Type.INDEXABLE_TEMP:
+            array, index = f"x[{operand.indices[0][0]}]", self.index(operand, 1)
+        elif operand.type in (Type.TEMP, Type.OUTPUT):
+            array, index = self.registers(operand)
+        else:
+            raise RuntimeError(f"unchecked {operand.type.name} destination")  # see Interpreter.check
+        is_contiguous = ":" in columns(written)
+        if not is_contiguous or isinstance(index, str):
+            # NOTE: w might be a view of the registers we are writing to
+            # -- np.copyto handles overlaps & broadcasting for us otherwise
+            out.append(f"w = np.ascontiguousarray(np.broadcast_to(w, (n, {len(written)})))")
+        if isinstance(index, str):
+            out.append(f"scatter({array}, {index}, {written}, w, m)")
+        elif is_contiguous:
+            out.append(f"np.copyto({array}[:, {index}, {columns(written)}], w, where=mc)")
+        else:
+            out.extend(
+                f"np.copyto({array}[:, {index}, {c}], w[:, {i}], where=m)"
+                for i, c in enumerate(written))
+        return out
+
+    # instructions
+    def instruction(self, instruction) -> List[str]:
+        opcode = instruction.opcode
+        operands = instruction.operands
+        saturate = bool(instruction.instruction.controls & 0x04)
+        out = [f"# {opcode.name}"]
+        if opcode in operations.alu:
+            sources, dest, expression = operations.alu[opcode]
+            written = mask_components(operands[0]) if opcode in componentwise else None
+            for name, operand, type_ in zip("abc", operands[1:], sources):
+                out.append(f"{name} = {self.read(operand, type_, written)}")
+            out.append(f"t = {bits(expression, dest, saturate)}")
+            out.extend(self.write(operands[0], "t", False))
+        elif opcode in operations.multi:
+            sources, dests, expression = operations.multi[opcode]
+            for name, operand, type_ in zip("abc", operands[len(dests):], sources):
+                out.append(f"{name} = {self.read(operand, type_)}")
+            out.append(f"t = {expression}")
+            for i, (operand, dest) in enumerate(zip(operands, dests)):
+                out.extend(self.write(operand, bits(f"t[{i}]", dest, saturate), True))
+        elif opcode in memory.handled:
+            out.extend(self.access(instruction))
+        elif opcode in textures.handled:
+            out.extend(self.sample(instruction))
+        else:
+            raise RuntimeError(f"unchecked {opcode.name}")  # see Interpreter.check
+        return out
+
+    def buffer(self, operand: FullOperand) -> Tuple[str, str, str]:
+        """("memory", "row", "name"); see Interpreter.buffer"""
+        register = operand.indices[0][0]
+        if operand.type == Type.THREAD_GROUP_SHARED_MEMORY:
+            return f"s.shared_memory[{register}]", "s.group", f"g{register}"
+        elif operand.type == Type.UNORDERED_ACCESS_VIEW:
+            return f"s.uavs[{register}]", "0", f"u{register}"
+        elif operand.type == Type.RESOURCE:
+            return f"s.resources[{register}]", "0", f"t{register}"
+        raise RuntimeError(f"unchecked {operand.type.name} memory")  # see Interpreter.check
+
+    def access(self, instruction) -> List[str]:
+        """loads, stores & atomics; see Interpreter.access"""
+        opcode = instruction.opcode
+        operands = instruction.operands
+        if opcode in memory.loads:
+            dest, *addresses, source = operands
+        elif opcode in memory.stores:
+            source, *addresses, value = operands
+        elif opcode.name.startswith("IMM"):
+            dest, source, *addresses, a = operands[:4]
+        else:
+            source, *addresses, a = operands[:3]
+        array, row, name = self.buffer(source)
+        words = array if name.startswith("g") else f"flat({array})"
+        layout = self.interpreter.layouts[name]
+        if len(addresses) > 1:  # .x of each operand
+            parts = [f"{self.read(operand, 'u', [0])}[:, 0]" for operand in addresses]
+        elif layout == "typed":  # texel coords
+            address = self.read(addresses[0], "u")
+            parts = [f"{address}[:, {i}]" for i in range(4)]
+        else:  # .x (raw) or .xy (structured)
+            address = self.read(addresses[0], "u", [0, 1][:1 + (layout == "structured")])
+            parts = [f"{address}[:, {i}]" for i in range(1 + (layout == "structured"))]
+        stride = self.interpreter.strides.get(name, 0)
+        out = [f"i = address({layout!r}, {stride}, {array}.shape, [{', '.join(parts)}])"]
+        if opcode in memory.loads:
+            swizzle = selected(source)
+            components = [swizzle[c] for c in mask_components(dest)]
+            out.append(f"t = load({words}, {row}, i, {components})")
+            out.extend(self.write(dest, "t", False))
+        elif opcode in memory.stores:
+            components = mask_components(source)
+            value = self.read(value, "u", components)
+            out.append(f"store({words}, {row}, i, {components}, {value}, s.active)")
+        else:
+            a = f"{self.read(a, 'u', [0])}[:, 0]"
+            b = f"{self.read(operands[-1], 'u', [0])}[:, 0]" if opcode in memory.compare_atomics else "None"
+            out.append(f"t = atomic(D11.{opcode.name}, {words}, {row}, i, {a}, {b}, s.active)")
+            if opcode.name.startswith("IMM"):
+                out.extend(self.write(dest, "t", False))
+        return out
+
+    def sample(self, instruction) -> List[str]:
+        """SAMPLE*, LD & GATHER_4*; see Interpreter.sample"""
+        opcode = instruction.opcode
+        dest, coords, resource, *extras = instruction.operands
+        sampler, channel = "default_sampler", 0
+        if opcode != D.LD:
+            operand, *extras = extras
+            sampler = f"s.samplers.get({operand.indices[0][0]}, default_sampler)"
+            channel = selected(operand)[0]
+        arguments = ", ".join([
+            f"opcodes.{type(opcode).__name__}.{opcode.name}", f"s.textures[{resource.indices[0][0]}]", sampler,
+            self.read(coords, "u"), f"[{', '.join(self.read(extra, 'u') for extra in extras)}]",
+            repr(texel_offsets(instruction)), repr(selected(resource)), str(channel)])
+        return [f"t = evaluate({arguments})", *self.write(dest, "t", True)]
+
+    def function(self, name: str, body: List[str]) -> List[str]:
+        return [f"def {name}(s, m=True, mc=True):", *(f"    {line}" for line in [*prologue, *body]), ""]
+
+    def source(self, name: str = "shader") -> str:
+        emulator = self.interpreter
+        functions, blocks, tests, flow = list(), dict(), dict(), dict()
+        # ^ {start: (stop, "function")}, {pc: "function"}, {pc: "OPCODE"}
+        pc = 0
+        while pc < emulator.num_instructions:
+            instruction = emulator.instructions[pc]
+            if instruction is not None and instruction.opcode in flow_control:
+                opcode = instruction.opcode
+                flow[pc] = opcode.name
+                if opcode == D.SWITCH:
+                    value = self.read(instruction.operands[0], "u", [0])
+                    tests[pc] = f"test_{pc}"
+                    functions.extend(self.function(tests[pc], [
+                        f"return np.broadcast_to({value}[:, 0], s.active.shape)"]))
+                elif opcode in (D.BREAK_C, D.CALL_C, D.CONTINUE_C, D.DISCARD, D.IF, D.RET_C):
+                    value = self.read(instruction.operands[0], "u", [0])
+                    test = "!=" if instruction.instruction.controls & 0x80 else "=="
+                    tests[pc] = f"test_{pc}"
+                    functions.extend(self.function(tests[pc], [
+                        f"return np.broadcast_to({value}[:, 0] {test} 0, s.active.shape)"]))
+                pc += 1
+                continue
+            # straight-line run
+            start, body = pc, list()
+            while pc < emulator.num_instructions:
+                instruction = emulator.instructions[pc]
+                if instruction is not None:
+                    if instruction.opcode in flow_control:
+                        break
+                    body.extend(self.instruction(instruction))
+                pc += 1
+            if len(body) > 0:
+                functions.extend(self.function(f"block_{start}", body))
+                blocks[start] = (pc, f"block_{start}")
+            else:
+                blocks[start] = (pc, None)
+        lines = [
+            f"# {name!r}; generated by bish.emulator.compiler",
+            f"version = {version}",
+            "",
+            f"num_instructions = {emulator.num_instructions}",
+            f"num_temps = {emulator.num_temps}",
+            f"num_inputs = {emulator.num_inputs}",
+            f"num_outputs = {emulator.num_outputs}",
+            f"indexable_temps = {emulator.indexable_temps!r}",
+            "immediate_constants = np.frombuffer(bytes.fromhex(",
+            f"    {emulator.immediate_constants.astype('<u4').tobytes().hex()!r}), dtype=np.uint32).reshape(-1, 4)",
+            *(
+                f"{attr} = {getattr(emulator, attr)!r}"
+                for attr in ("thread_group", "shared_memory", "layouts", "strides", "uav_atomics")),
+            *(
+                f"{attr} = {getattr(emulator, attr)!r}"
+                for attr in ("ends", "elses", "cases", "case_values", "labels", "constants")),
+            f"flow = {flow!r}",
+            "",
+            *(f"{name} = {definition}" for definition, name in self.constants.items()),
+            "",
+            "",
+            *functions,
+            "blocks = {",
+            *(f"    {start}: ({stop}, {function})," for start, (stop, function) in blocks.items()),
+            "}",
+            "tests = {",
+            *(f"    {pc}: {function}," for pc, function in tests.items()),
+            "}",
+            ""]
+        return "\n".join(lines)
+
+
+class Program(Interpreter):
+    """compiled kernels & flow control tables; runs w/o decoding the shader"""
+    source: str
+    blocks: Dict[int, Tuple[int, Union[Callable, None]]]
+    # ^ {start: (stop, kernel)}
+    tests: Dict[int, Callable]
+    # ^ {pc: function(state) -> (N,) condition / selector}
+    flow_opcodes: Dict[int, opcodes.Opcode]
+    # ^ {pc: opcode}
+
+    def __init__(self, source: str, filename: str = "<bish.emulator.compiler>"):
+        # NOTE: doesn't call Interpreter.__init__, there's nothing to decode
+        module = dict(namespace)
+        exec(compile(source, filename, "exec"), module)
+        self.source = source
+        self.shader = None
+        self.instructions = list()
+        for attr in (
+                "num_instructions", "num_temps", "num_inputs", "num_outputs", "indexable_temps", "immediate_constants",
+                "thread_group", "shared_memory", "layouts", "strides", "uav_atomics",
+                "ends", "elses", "cases", "case_values", "labels", "constants", "blocks", "tests"):
+            setattr(self, attr, module[attr])
+        self.flow_opcodes = {pc: D[name] for pc, name in module["flow"].items()}
+
+    @classmethod
+    def from_shader(cls, shader, name: str = "shader") -> Program:
+        return cls(Compiler(shader).source(name))
+
+    def condition(self, state: State, pc: int) -> np.ndarray:
+        return self.tests[pc](state)
+
+    def selector(self, state: State, pc: int) -> np.ndarray:
+        return self.tests[pc](state)
+
+    def execute(self, state: State):
+        stack = [Frame(D.CALL, -1, state.active)]
+        pc = 0
+        with np.errstate(all="ignore"):
+            while pc < self.num_instructions:
+                if pc in self.flow_opcodes:
+                    pc = self.flow(state, stack, pc, self.flow_opcodes[pc])
+                    continue
+                pc, kernel = self.blocks[pc]
+                if kernel is None:
+                    continue
+                active = state.active
+                if active.all():
+                    kernel(state)
+                else:
+                    kernel(state, active, active[:, None])
+
+
+def filepath_for(checksum: bytes) -> str:
+    return os.path.join(cache.directory, f"{checksum.hex()}.v{version}.kernels.py")
+
+
+def header_for(checksum: bytes) -> str:
+    """first line of a cached kernels file"""
+    return f"# bish.emulator.compiler v{version} {checksum.hex()}\n"
+
+
+def load(checksum: bytes) -> Union[Program, None]:
+    """cached Program; None if missing, outdated or broken"""
+    try:
+        with open(filepath_for(checksum)) as kernels_file:
+            if kernels_file.readline() != header_for(checksum):
+                return None
+            return Program(kernels_file.read(), f"<{checksum.hex()}>")
+    except Exception:  # missing, truncated etc.; we'll recompile & overwrite it
+        return None
+
+
+def save(checksum: bytes, program: Program):
+    os.makedirs(cache.directory, exist_ok=True)
+    # NOTE: write to a temp file first, in case other processes are reading
+    handle, temp_filepath = tempfile.mkstemp(dir=cache.directory, suffix=".tmp")
+    with os.fdopen(handle, "w") as temp_file:
+        temp_file.write(header_for(checksum))
+        temp_file.write(program.source)
+    os.replace(temp_filepath, filepath_for(checksum))
+
+
+def program_for(fxc) -> Program:
+    """compiled SHEX of fxc; cached by DXBC checksum (on disk too, if bish.cache is enabled)"""
+    # NOTE: w/ fxc.lazy, a cache hit never reads or decodes SHEX
+    # NOTE: cached kernels are python source & are exec'd when loaded
+    # -- only point bish.cache.directory at a directory you trust
+    fxc.parse()
+    checksum = fxc.header.checksum
+    if checksum in programs:
+        return programs[checksum]
+    program = load(checksum) if cache.is_enabled() else None
+    if program is None:
+        # NOTE: raises UnsupportedInstruction before anything is cached
+        program = Program(Compiler(fxc.SHEX).source(fxc.filename), f"<{checksum.hex()}>")
+        if cache.is_enabled():
+            save(checksum, program)
+    programs[checksum] = program
+    return program
@@ -0,0 +1,146 @@
+"""dispatch a compute shader over a grid of thread groups"""
+# NOTE: thread groups are batched into one State; each thread of each group in
+# -- a batch runs in lock-step, so every SYNC is a barrier for free
+# -- batches are spread across worker processes, w/ UAVs & resources in shared
+# -- memory, so workers read & write the same buffers
+from __future__ import annotations
+import concurrent.futures
+from multiprocessing import shared_memory
+import os
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from ..asm.base.operands import Type
+from ..chunks.shex import Shader_v5
+from . import compiler
+from .interpreter import Interpreter
+from .state import State, as_bits
+from .textures import Sampler, Texture
+
+
+batch_size = 4096
+# ^ invocations per State; whole thread groups only
+
+worker = dict()
+# ^ {"emulator": Interpreter, "uavs": {u#: array}, ...} in each worker process
+
+
+def system_values(thread_group: Tuple[int, int, int], groups: Tuple[int, int, int], start: int, stop: int) -> Dict[Type, np.ndarray]:
+    """thread ids for flattened thread groups start:stop; x is the fastest axis"""
+    x, y, z = thread_group
+    threads = np.arange(x * y * z)
+    thread_id = np.stack([threads % x, threads // x % y, threads // (x * y)], axis=1)
+    group_ids = np.arange(start, stop)
+    group_id = np.stack([group_ids % groups[0], group_ids // groups[0] % groups[1], group_ids // (groups[0] * groups[1])], axis=1)
+    thread_id = np.tile(thread_id, (stop - start, 1))
+    group_id = np.repeat(group_id, x * y * z, axis=0)
+
+    def vector(*columns: np.ndarray) -> np.ndarray:
+        out = np.zeros((len(thread_id), 4), dtype=np.uint32)
+        for i, column in enumerate(columns):
+            out[:, i] = column
+        return out
+
+    return {
+        Type.INPUT_THREAD_ID: vector(*(group_id * thread_group + thread_id).T),
+        Type.INPUT_THREAD_GROUP_ID: vector(*group_id.T),
+        Type.INPUT_THREAD_ID_IN_GROUP: vector(*thread_id.T),
+        Type.INPUT_THREAD_ID_IN_GROUP_FLATTENED: vector(np.tile(threads, stop - start))}
+
+
+def run_groups(emulator: Interpreter, groups: Tuple[int, int, int], start: int, stop: int, uavs: Dict[int, np.ndarray], resources: Dict[int, np.ndarray], constant_buffers: Dict[int, np.ndarray], textures: Dict[int, Texture] = None, samplers: Dict[int, Sampler] = None) -> State:
+    """run flattened thread groups start:stop in one batch"""
+    num_threads = int(np.prod(emulator.thread_group))
+    state = emulator.state((stop - start) * num_threads, None, constant_buffers, textures, samplers)
+    state.system_values = system_values(emulator.thread_group, groups, start, stop)
+    state.group = np.repeat(np.arange(stop - start), num_threads)
+    state.shared_memory = {
+        register: np.zeros((stop - start, words), dtype=np.uint32)
+        for register, words in emulator.shared_memory.items()}
+    state.uavs = uavs
+    state.resources = resources
+    emulator.execute(state)
+    return state
+
+
+def batches(emulator: Interpreter, groups: Tuple[int, int, int]) -> List[Tuple[int, int]]:
+    """[(start, stop)] flattened thread group ranges"""
+    num_groups = int(np.prod(groups))
+    step = max(1, batch_size // int(np.prod(emulator.thread_group)))
+    return [(start, min(start + step, num_groups)) for start in range(0, num_groups, step)]
+
+
+# worker processes
+def initialise(kind: str, code: Union[str, bytes], groups: Tuple[int, int, int], segments: Dict[Tuple[str, int], Tuple[str, tuple]], constant_buffers: Dict[int, np.ndarray], textures: Dict[int, Texture], samplers: Dict[int, Sampler]):
+    """kind: "program" (compiler source) or "shader" (raw SHEX)"""
+    if kind == "program":
+        worker["emulator"] = compiler.Program(code)
+    else:
+        worker["emulator"] = Interpreter(Shader_v5.from_bytes(code))
+    worker["groups"] = groups
+    worker["segments"] = list()
+    worker["uavs"], worker["resources"] = dict(), dict()
+    for (attr, register), (name, shape) in segments.items():
+        segment = shared_memory.SharedMemory(name)
+        # NOTE: workers share the dispatching process' resource tracker
+        # -- only the dispatching process unlinks segments
+        worker["segments"].append(segment)  # keeps the buffer alive
+        worker[attr][register] = np.ndarray(shape, dtype=np.uint32, buffer=segment.buf)
+    worker["constant_buffers"] = constant_buffers
+    worker["textures"], worker["samplers"] = textures, samplers
+
+
+def work(start: int, stop: int):
+    run_groups(
+        worker["emulator"], worker["groups"], start, stop,
+        worker["uavs"], worker["resources"], worker["constant_buffers"],
+        worker["textures"], worker["samplers"])
+
+
+def dispatch(emulator: Interpreter, groups: Tuple[int, int, int], uavs: Dict[int, np.ndarray] = None, resources: Dict[int, np.ndarray] = None, constant_buffers: Dict[int, np.ndarray] = None, textures: Dict[int, Texture] = None, samplers: Dict[int, Sampler] = None, workers: int = None) -> Dict[int, np.ndarray]:
+    """run groups (x, y, z) of thread groups; returns {u#: uint32 array} w/ the final UAV contents
+    uavs & resources: {register: array}; typed UAVs are (..., [y,] x, 4) arrays
+    textures & samplers: {register: Texture / Sampler}; copied to each worker
+    emulator: Interpreter or compiler.Program; workers: processes (defaults to os.cpu_count())"""
+    uavs = {register: as_bits(array).copy() for register, array in (uavs or dict()).items()}
+    resources = {register: as_bits(array) for register, array in (resources or dict()).items()}
+    constant_buffers = {register: as_bits(array).reshape(-1, 4) for register, array in (constant_buffers or dict()).items()}
+    groups = tuple(groups)
+    ranges = batches(emulator, groups)
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    if len(emulator.uav_atomics) > 0:
+        # NOTE: atomics aren't atomic across processes
+        workers = 1
+    if workers <= 1:
+        for start, stop in ranges:
+            run_groups(emulator, groups, start, stop, uavs, resources, constant_buffers, textures, samplers)
+        return uavs
+    # copy buffers into shared memory
+    segments, arrays = dict(), dict()
+    # ^ {("attr", register): SharedMemory}, {("attr", register): array}
+    try:
+        for attr, buffers in (("uavs", uavs), ("resources", resources)):
+            for register, array in buffers.items():
+                segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                segments[(attr, register)] = segment
+                arrays[(attr, register)] = np.ndarray(array.shape, dtype=np.uint32, buffer=segment.buf)
+                arrays[(attr, register)][...] = array
+        if isinstance(emulator, compiler.Program):
+            kind, code = "program", emulator.source
+        else:
+            kind, code = "shader", emulator.shader.tokens.tobytes()
+        names = {key: (segment.name, arrays[key].shape) for key, segment in segments.items()}
+        with concurrent.futures.ProcessPoolExecutor(
+                workers, initializer=initialise,
+                initargs=(kind, code, groups, names, constant_buffers, textures, samplers)) as executor:
+            starts, stops = zip(*ranges)
+            list(executor.map(work, starts, stops, chunksize=max(1, len(ranges) // (workers * 4))))
+        for register in uavs:
+            uavs[register][...] = arrays[("uavs", register)]
+    finally:
+        arrays.clear()  # release views before closing
+        for segment in segments.values():
+            segment.close()
+            segment.unlink()
+    return uavs
@@ -0,0 +1,631 @@
+"""run a decoded shader over a batch of invocations"""
+# NOTE: every invocation steps through the same instruction at once
+# -- divergent flow control is handled w/ execution masks, like a GPU
+from __future__ import annotations
+import bisect
+from typing import Dict, List, Set, Tuple, Union, TYPE_CHECKING
+
+import numpy as np
+
+from ..asm.base import extensions
+from ..asm.base import opcodes
+from ..asm.base.instructions import FullInstruction
+from ..asm.base.operands import FullOperand, SelectionMode, Type
+from . import memory
+from . import operations
+from . import textures
+from .state import Arrays, State
+
+if TYPE_CHECKING:
+    from .. import chunks
+
+
+D = opcodes.D3D_10_0
+D11 = opcodes.D3D_11_0
+
+flow_control = {
+    D.BREAK, D.BREAK_C, D.CALL, D.CALL_C, D.CASE, D.CONTINUE, D.CONTINUE_C,
+    D.DEFAULT, D.DISCARD, D.ELSE, D.END_IF, D.END_LOOP, D.END_SWITCH,
+    D.IF, D.LABEL, D.LOOP, D.RET, D.RET_C, D.SWITCH}
+
+skipped = {D.CUSTOM_DATA, D.NOP, D11.SYNC}
+# NOTE: DCL_* instructions are also skipped
+# -- every invocation in a batch runs in lock-step, so SYNC is always satisfied
+
+thread_ids = {
+    Type.INPUT_THREAD_ID, Type.INPUT_THREAD_GROUP_ID,
+    Type.INPUT_THREAD_ID_IN_GROUP, Type.INPUT_THREAD_ID_IN_GROUP_FLATTENED}
+# ^ compute shader system values; see State.system_values
+
+supported = {*flow_control, *operations.alu, *operations.multi, *memory.handled, *textures.handled}
+# ^ opcodes we can execute; see Interpreter.check
+sources = {
+    Type.IMMEDIATE_32, Type.TEMP, Type.INPUT, Type.OUTPUT, Type.INDEXABLE_TEMP,
+    Type.CONSTANT_BUFFER, Type.IMMEDIATE_CONSTANT_BUFFER, *thread_ids}
+destinations = {Type.NULL, Type.TEMP, Type.OUTPUT, Type.INDEXABLE_TEMP}
+buffers = set(memory.prefixes)
+
+
+class UnsupportedInstruction(Exception):
+    """raised while preparing a shader w/ instructions we can't emulate"""
+    opcode: opcodes.Opcode
+    pc: int
+
+    def __init__(self, opcode: opcodes.Opcode, pc: int, reason: str = "isn't emulated yet"):
+        self.opcode = opcode
+        self.pc = pc
+        super().__init__(f"{opcode.name} @ {pc} {reason}")
+
+
+def mask_components(operand: FullOperand) -> List[int]:
+    if operand.selection_mode == SelectionMode.MASK:
+        return [c for c in range(4) if operand.mask.value & (1 << c)]
+    elif operand.selection_mode == SelectionMode.SELECT_1:
+        return [operand.name.value]
+    return [0, 1, 2, 3]
+
+
+def swizzle_components(operand: FullOperand) -> Union[List[int], None]:
+    """None if no swizzle is needed"""
+    if operand.selection_mode == SelectionMode.SWIZZLE:
+        swizzle = [name.value for name in operand.swizzle]
+        return None if swizzle == [0, 1, 2, 3] else swizzle
+    elif operand.selection_mode == SelectionMode.SELECT_1:
+        return [operand.name.value] * 4
+    return None
+
+
+def texel_offsets(instruction: FullInstruction) -> Tuple[int, int, int]:
+    """immediate (u, v, w) offsets from a SAMPLE extension token"""
+    for extension in instruction.extensions:
+        if extension.type == extensions.Type.SAMPLE:
+            controls = extension.controls
+            return (controls.u_offset, controls.v_offset, controls.w_offset)
+    return (0, 0, 0)
+
+
+def gather(registers: np.ndarray, index: Union[int, np.ndarray]) -> np.ndarray:
+    """registers[:, index] or (1, 4) for shared registers; out of range reads 0"""
+    shared = registers.ndim == 2
+    # ^ constant buffers are (count, 4) & shared by every invocation
+    count = registers.shape[0 if shared else 1]
+    if isinstance(index, int):
+        if not 0 <= index < count:
+            return np.zeros((1, 4), dtype=np.uint32)
+        return registers[index][None] if shared else registers[:, index]
+    valid = (index >= 0) & (index < count)
+    is_valid = valid.all()
+    clamped = index if is_valid else np.where(valid, index, 0)
+    out = registers.take(clamped, axis=0) if shared else registers[np.arange(len(index)), clamped]
+    if not is_valid:
+        out[~valid] = 0
+    return out
+
+
+def scatter(registers: np.ndarray, index: np.ndarray, components: List[int], value: np.ndarray, active: np.ndarray):
+    """registers[:, index, components] = value for active invocations; out of range writes are dropped"""
+    lanes = np.flatnonzero(active & (index >= 0) & (index < registers.shape[1]))
+    for i, c in enumerate(components):
+        registers[lanes, index[lanes], c] = value[lanes, i]
+
+
+class Frame:
+    """an open IF / LOOP / SWITCH or subroutine CALL"""
+    kind: opcodes.Opcode  # IF, LOOP, SWITCH or CALL
+    pc: int  # instruction that opened the frame
+    saved: np.ndarray  # execution mask on entry
+    condition: np.ndarray  # IF: lanes taking the branch; SWITCH: default lanes
+    exited: np.ndarray  # lanes that left via BREAK (LOOP / SWITCH) or RET (CALL)
+    continued: np.ndarray  # LOOP only
+    selector: np.ndarray  # SWITCH only
+    is_else: bool
+    return_pc: int  # CALL only
+    iterations: int
+
+    def __init__(self, kind: opcodes.Opcode, pc: int, saved: np.ndarray):
+        self.kind = kind
+        self.pc = pc
+        self.saved = saved.copy()
+        self.condition = None
+        self.exited = np.zeros_like(saved)
+        self.continued = np.zeros_like(saved)
+        self.selector = None
+        self.is_else = False
+        self.return_pc = None
+        self.iterations = 0
+
+    def __repr__(self) -> str:
+        descriptor = f"{self.kind.name} @ {self.pc}"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+
+class Interpreter:
+    """executes Shader_v5 instructions for N invocations at once"""
+    shader: chunks.Shader_v5
+    instructions: List[Union[FullInstruction, None]]
+    # ^ None for skipped instructions
+    num_instructions: int
+    # structure
+    ends: Dict[int, int]
+    # ^ {IF / ELSE / LOOP / SWITCH: END_*}
+    elses: Dict[int, int]
+    # ^ {IF: ELSE}
+    cases: Dict[int, List[int]]
+    # ^ {SWITCH: [CASE / DEFAULT]}
+    case_values: Dict[int, List[int]]
+    # ^ {SWITCH: [value]}
+    labels: Dict[int, int]
+    # ^ {label_index: LABEL}
+    constants: Dict[int, int]
+    # ^ {CASE: value, CALL: label_index}
+    # register file sizes
+    num_temps: int
+    num_inputs: int
+    num_outputs: int
+    indexable_temps: Dict[int, int]
+    # ^ {x#: count}
+    immediate_constants: np.ndarray
+    # ^ (count, 4) uint32 icb; a view of the shader's tokens
+    # compute shaders
+    thread_group: Tuple[int, int, int]
+    shared_memory: Dict[int, int]
+    # ^ {g#: words}
+    layouts: Dict[str, str]
+    # ^ {"u0": "raw" / "structured" / "typed"}
+    strides: Dict[str, int]
+    # ^ {"u0": bytes}; structured only
+    uav_atomics: Set[int]
+    # ^ {u#}; UAVs w/ atomic operations
+    max_iterations: int = 1 << 16  # per LOOP, guards against runaway loops
+
+    def __init__(self, shader):
+        self.shader = shader
+        self.instructions = list()
+        self.num_instructions = 0
+        self.ends = dict()
+        self.elses = dict()
+        self.cases = dict()
+        self.case_values = dict()
+        self.labels = dict()
+        self.constants = dict()
+        self.num_temps = self.num_inputs = self.num_outputs = 0
+        self.indexable_temps = dict()
+        self.immediate_constants = np.zeros((0, 4), dtype=np.uint32)
+        self.thread_group = (1, 1, 1)
+        self.shared_memory = dict()
+        self.layouts = dict()
+        self.strides = dict()
+        self.uav_atomics = set()
+        self.prepare()
+
+    def __repr__(self) -> str:
+        descriptor = f"{self.num_instructions} instructions"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    def prepare(self):
+        """decode every instruction once & match flow control
+        raises UnsupportedInstruction before any state is allocated"""
+        table = self.shader.instructions
+        stack = list()
+        counts = {Type.TEMP: 0, Type.INPUT: 0, Type.OUTPUT: 0}
+        for pc in range(len(table)):
+            opcode = opcodes.opcode_for(int(table.opcode[pc]))
+            if opcode in skipped:
+                self.instructions.append(None)
+                if opcode == D.CUSTOM_DATA:
+                    block = table.instruction(pc).custom_data
+                    if block.constants is not None:
+                        self.immediate_constants = block.constants
+                continue
+            instruction = table.instruction(pc)
+            if instruction.declaration is not None:
+                self.instructions.append(None)
+                declaration = instruction.declaration
+                if opcode == D.DCL_TEMPS:
+                    self.num_temps = max(self.num_temps, declaration.count)
+                elif opcode == D.DCL_INDEXABLE_TEMP:
+                    self.indexable_temps[declaration.register] = declaration.count
+                elif opcode == D11.DCL_THREAD_GROUP:
+                    self.thread_group = (declaration.x, declaration.y, declaration.z)
+                elif opcode in memory.layouts:
+                    operand = declaration.operands[0]
+                    name = f"{memory.prefixes[operand.type]}{operand.indices[0][0]}"
+                    self.layouts[name] = memory.layouts[opcode]
+                    if hasattr(declaration, "stride"):
+                        self.strides[name] = declaration.stride
+                    if operand.type == Type.THREAD_GROUP_SHARED_MEMORY:
+                        self.shared_memory[operand.indices[0][0]] = declaration.stride * declaration.count // 4
+                operands = declaration.operands
+            else:
+                self.check(pc, instruction)
+                self.instructions.append(instruction)
+                operands = instruction.operands
+                if opcode in memory.atomics:
+                    operand = operands[1 if opcode.name.startswith("IMM") else 0]
+                    if operand.type == Type.UNORDERED_ACCESS_VIEW:
+                        self.uav_atomics.add(operand.indices[0][0])
+            for operand in operands:
+                if operand.type in counts and len(operand.indices) > 0:
+                    index = operand.indices[-1][0] or 0
+                    counts[operand.type] = max(counts[operand.type], index + 1)
+            # structure
+            if opcode in (D.IF, D.LOOP, D.SWITCH):
+                stack.append(pc)
+                if opcode == D.SWITCH:
+                    self.cases[pc] = list()
+                    self.case_values[pc] = list()
+            elif opcode == D.ELSE:
+                self.elses[stack[-1]] = pc
+            elif opcode in (D.CASE, D.DEFAULT):
+                switch = next(s for s in reversed(stack) if s in self.cases)
+                self.cases[switch].append(pc)
+                if opcode == D.CASE:
+                    self.constants[pc] = instruction.operands[0].indices[0][0]
+                    self.case_values[switch].append(self.constants[pc])
+            elif opcode in (D.END_IF, D.END_LOOP, D.END_SWITCH):
+                start = stack.pop()
+                self.ends[start] = pc
+                if start in self.elses:
+                    self.ends[self.elses[start]] = pc
+            elif opcode in (D.CALL, D.CALL_C):
+                self.constants[pc] = instruction.operands[-1].indices[0][0]
+            elif opcode == D.LABEL:
+                self.labels[instruction.operands[0].indices[0][0]] = pc
+        self.num_instructions = len(self.instructions)
+        assert len(stack) == 0, "unclosed flow control"
+        self.num_temps = max(self.num_temps, counts[Type.TEMP])
+        self.num_inputs = counts[Type.INPUT]
+        self.num_outputs = counts[Type.OUTPUT]
+
+    def check(self, pc: int, instruction: FullInstruction):
+        """raise UnsupportedInstruction if instruction can't be run"""
+        opcode = instruction.opcode
+        if instruction.error is not None:
+            raise UnsupportedInstruction(opcode, pc, f"failed to decode ({instruction.error})")
+        elif opcode not in supported:
+            raise UnsupportedInstruction(opcode, pc)
+        operands = instruction.operands
+        roles = ["source"] * len(operands)
+        if opcode in flow_control:
+            roles = ["label" if o.type == Type.LABEL else "source" for o in operands]
+        elif opcode in operations.alu:
+            roles[:1] = ["destination"]
+        elif opcode in operations.multi:
+            num_dests = len(operations.multi[opcode][1])
+            roles[:num_dests] = ["destination"] * num_dests
+        elif opcode in memory.loads:
+            roles[:1], roles[-1:] = ["destination"], ["buffer"]
+        elif opcode in memory.stores or opcode in memory.atomics:
+            roles[:1] = ["buffer"]
+        elif opcode in memory.handled:  # IMM_ATOMIC_*
+            roles[:2] = ["destination", "buffer"]
+        else:  # textures; dest, coords, t# & s# (except LD)
+            num_bindings = 1 if opcode == D.LD else 2
+            roles[:1] = ["destination"]
+            roles[2:2 + num_bindings] = ["binding"] * num_bindings
+        for operand, role in zip(operands, roles):
+            relative = [rel for imm, rel in operand.indices if rel is not None]
+            for rel in relative:
+                if rel.type not in sources:
+                    raise UnsupportedInstruction(opcode, pc, f"{rel.type.name} indices aren't emulated yet")
+            if role == "source" and operand.type not in sources:
+                raise UnsupportedInstruction(opcode, pc, f"{operand.type.name} operands aren't emulated yet")
+            elif role == "destination" and operand.type not in destinations:
+                raise UnsupportedInstruction(opcode, pc, f"{operand.type.name} destinations aren't emulated yet")
+            elif role == "buffer":
+                if operand.type not in buffers:
+                    raise UnsupportedInstruction(opcode, pc, f"{operand.type.name} memory isn't emulated yet")
+                name = f"{memory.prefixes[operand.type]}{operand.indices[0][0]}"
+                if name not in self.layouts:
+                    raise UnsupportedInstruction(opcode, pc, f"{name} isn't declared")
+            if operand.type == Type.INDEXABLE_TEMP and operand.indices[0][0] not in self.indexable_temps:
+                raise UnsupportedInstruction(opcode, pc, f"x{operand.indices[0][0]} isn't declared")
+
+    def state(self, num_invocations: int, inputs: Arrays = None, constant_buffers: Dict[int, np.ndarray] = None, textures: Dict[int, textures.Texture] = None, samplers: Dict[int, textures.Sampler] = None) -> State:
+        out = State.from_arrays(
+            num_invocations, inputs, constant_buffers,
+            self.num_temps, self.num_inputs, self.num_outputs, self.indexable_temps)
+        out.textures = dict(textures or dict())
+        out.samplers = dict(samplers or dict())
+        return out
+
+    def run(self, num_invocations: int, inputs: Arrays = None, constant_buffers: Dict[int, np.ndarray] = None, textures: Dict[int, textures.Texture] = None, samplers: Dict[int, textures.Sampler] = None) -> State:
+        """inputs: (N, registers, 4) or {v#: (N, components)}; constant_buffers: {cb#: (count, 4)}
+        textures: {t#: Texture}; samplers: {s#: Sampler}; see textures.bind"""
+        state = self.state(num_invocations, inputs, constant_buffers, textures, samplers)
+        self.execute(state)
+        return state
+
+    def execute(self, state: State):
+        stack = [Frame(D.CALL, -1, state.active)]
+        # ^ the main program is a CALL frame w/o a return_pc
+        pc = 0
+        with np.errstate(all="ignore"):  # inactive lanes compute garbage
+            while pc < self.num_instructions:
+                instruction = self.instructions[pc]
+                if instruction is None:
+                    pc += 1
+                elif instruction.opcode in flow_control:
+                    pc = self.flow(state, stack, pc, instruction.opcode)
+                else:
+                    self.alu(state, instruction)
+                    pc += 1
+
+    # operands
+    def index(self, state: State, operand: FullOperand, i: int) -> Union[int, np.ndarray]:
+        """int, or (N,) int64 array for relative indices"""
+        imm, rel = operand.indices[i]
+        if rel is None:
+            return imm
+        offset = self.read(state, rel, "u")[:, 0].astype(np.int64)
+        return offset + (imm or 0)
+
+    def fetch(self, state: State, operand: FullOperand) -> np.ndarray:
+        """raw (N, 4) or (1, 4) uint32 bits of a source operand"""
+        type_ = operand.type
+        if type_ == Type.IMMEDIATE_32:
+            values = [imm for imm, rel in operand.indices]
+            return np.array([values * (4 // len(values))], dtype=np.uint32)
+        elif type_ == Type.TEMP:
+            return gather(state.temps, self.index(state, operand, 0))
+        elif type_ == Type.INPUT:
+            return gather(state.inputs, self.index(state, operand, len(operand.indices) - 1))
+        elif type_ == Type.OUTPUT:
+            return gather(state.outputs, self.index(state, operand, 0))
+        elif type_ == Type.INDEXABLE_TEMP:
+            registers = state.indexable_temps[operand.indices[0][0]]
+            return gather(registers, self.index(state, operand, 1))
+        elif type_ == Type.CONSTANT_BUFFER:
+            registers = state.constant_buffers.get(operand.indices[0][0], np.zeros((0, 4), np.uint32))
+            return gather(registers, self.index(state, operand, 1))
+        elif type_ == Type.IMMEDIATE_CONSTANT_BUFFER:
+            return gather(self.immediate_constants, self.index(state, operand, 0))
+        elif type_ in thread_ids:
+            return state.system_values[type_]
+        raise RuntimeError(f"unchecked {type_.name} operand")  # see .check()
+
+    def buffer(self, state: State, operand: FullOperand) -> Tuple[np.ndarray, Union[int, np.ndarray], str]:
+        """(memory, row, "name") of a t#, u# or g# operand; see emulator.memory"""
+        register = operand.indices[0][0]
+        if operand.type == Type.THREAD_GROUP_SHARED_MEMORY:
+            return state.shared_memory[register], state.group, f"g{register}"
+        elif operand.type == Type.UNORDERED_ACCESS_VIEW:
+            return state.uavs[register], 0, f"u{register}"
+        elif operand.type == Type.RESOURCE:
+            return state.resources[register], 0, f"t{register}"
+        raise RuntimeError(f"unchecked {operand.type.name} memory")  # see .check()
+
+    def read(self, state: State, operand: FullOperand, type_: str) -> np.ndarray:
+        """swizzled & modified source operand, viewed as type_"""
+        value = self.fetch(state, operand)
+        swizzle = swizzle_components(operand)
+        if swizzle is not None:
+            value = value[:, swizzle]
+        value = value.view(operations.dtypes[type_])
+        if operand.modifier.value != 0:
+            value = operations.modify(value, type_, operand.modifier.value)
+        return value
+
+    def write(self, state: State, operand: FullOperand, value: np.ndarray):
+        """masked write of uint32 bits to active invocations"""
+        type_ = operand.type
+        if type_ == Type.NULL:
+            return
+        elif type_ == Type.TEMP:
+            registers, index = state.temps, self.index(state, operand, 0)
+        elif type_ == Type.OUTPUT:
+            registers, index = state.outputs, self.index(state, operand, 0)
+        elif type_ == Type.INDEXABLE_TEMP:
+            registers = state.indexable_temps[operand.indices[0][0]]
+            index = self.index(state, operand, 1)
+        else:
+            raise RuntimeError(f"unchecked {type_.name} destination")  # see .check()
+        value = np.broadcast_to(value, (state.num_invocations, 4))
+        components = mask_components(operand)
+        if not isinstance(index, int):
+            scatter(registers, index, components, value[:, components], state.active)
+            return
+        for c in components:
+            np.copyto(registers[:, index, c], value[:, c], where=state.active)
+
+    def condition(self, state: State, pc: int) -> np.ndarray:
+        """(N,) bool for *_NZ / *_Z instructions"""
+        instruction = self.instructions[pc]
+        value = self.read(state, instruction.operands[0], "u")[:, 0]
+        is_nonzero = bool(instruction.instruction.controls & 0x80)
+        return np.broadcast_to(value != 0 if is_nonzero else value == 0, state.active.shape)
+
+    def selector(self, state: State, pc: int) -> np.ndarray:
+        """(N,) uint32 for SWITCH"""
+        value = self.read(state, self.instructions[pc].operands[0], "u")[:, 0]
+        return np.broadcast_to(value, state.active.shape)
+
+    # execution
+    def alu(self, state: State, instruction: FullInstruction):
+        opcode = instruction.opcode
+        saturate = bool(instruction.instruction.controls & 0x04)
+        function = operations.functions.get(opcode)
+        if opcode in operations.alu:
+            sources, dest, _ = operations.alu[opcode]
+            operands = instruction.operands
+            args = [self.read(state, o, t) for o, t in zip(operands[1:], sources)]
+            result = operations.as_bits(function(*args), dest, saturate)
+            self.write(state, operands[0], result)
+        elif opcode in operations.multi:
+            sources, dests, _ = operations.multi[opcode]
+            operands = instruction.operands
+            args = [self.read(state, o, t) for o, t in zip(operands[len(dests):], sources)]
+            for operand, result, dest in zip(operands, function(*args), dests):
+                self.write(state, operand, operations.as_bits(result, dest, saturate))
+        elif opcode in memory.handled:
+            self.access(state, instruction)
+        elif opcode in textures.handled:
+            self.sample(state, instruction)
+        else:
+            raise RuntimeError(f"unchecked {opcode.name}")  # see .check()
+
+    def access(self, state: State, instruction: FullInstruction):
+        """loads, stores & atomics"""
+        opcode = instruction.opcode
+        operands = instruction.operands
+        if opcode in memory.loads:
+            dest, *addresses, source = operands
+        elif opcode in memory.stores:
+            source, *addresses, value = operands
+        elif opcode.name.startswith("IMM"):
+            dest, source, *addresses, a = operands[:4]
+        else:
+            source, *addresses, a = operands[:3]
+        array, row, name = self.buffer(state, source)
+        words = array if name.startswith("g") else memory.flat(array)
+        if len(addresses) == 1:  # all components of one operand
+            columns = list(self.read(state, addresses[0], "u").T)
+        else:  # .x of each operand
+            columns = [self.read(state, operand, "u")[:, 0] for operand in addresses]
+        word = memory.address(self.layouts[name], self.strides.get(name, 0), array.shape, columns)
+        if opcode in memory.loads:
+            components = mask_components(dest)
+            swizzle = swizzle_components(source) or [0, 1, 2, 3]
+            value = memory.load(words, row, word, [swizzle[c] for c in components])
+            out = np.zeros((value.shape[0], 4), dtype=np.uint32)
+            out[:, components] = value
+            self.write(state, dest, out)
+        elif opcode in memory.stores:
+            components = mask_components(source)
+            value = self.read(state, value, "u")[:, components]
+            memory.store(words, row, word, components, value, state.active)
+        else:
+            b = operands[-1] if opcode in memory.compare_atomics else None
+            a = self.read(state, a, "u")[:, 0]
+            b = self.read(state, b, "u")[:, 0] if b is not None else None
+            original = memory.atomic(opcode, words, row, word, a, b, state.active)
+            if opcode.name.startswith("IMM"):
+                self.write(state, dest, original)
+
+    def sample(self, state: State, instruction: FullInstruction):
+        """SAMPLE*, LD & GATHER_4*"""
+        opcode = instruction.opcode
+        dest, coords, resource, *extras = instruction.operands
+        sampler, channel = textures.default_sampler, 0
+        if opcode != D.LD:
+            operand, *extras = extras
+            sampler = state.samplers.get(operand.indices[0][0], textures.default_sampler)
+            channel = (swizzle_components(operand) or [0])[0]
+        value = textures.evaluate(
+            opcode, state.textures[resource.indices[0][0]], sampler,
+            self.read(state, coords, "u"), [self.read(state, extra, "u") for extra in extras],
+            texel_offsets(instruction), swizzle_components(resource) or [0, 1, 2, 3], channel)
+        self.write(state, dest, value)
+
+    def restore(self, stack: List[Frame], saved: np.ndarray) -> np.ndarray:
+        """saved execution mask, minus lanes that have left an open frame"""
+        out = saved.copy()
+        for frame in stack:
+            out &= ~frame.exited
+            out &= ~frame.continued
+        return out
+
+    def flow(self, state: State, stack: List[Frame], pc: int, opcode: opcodes.Opcode) -> int:
+        """returns the next pc"""
+        if opcode == D.IF:
+            frame = Frame(D.IF, pc, state.active)
+            frame.condition = self.condition(state, pc)
+            stack.append(frame)
+            state.active = state.active & frame.condition
+        elif opcode == D.ELSE:
+            frame = stack[-1]
+            frame.is_else = True
+            state.active = self.restore(stack, frame.saved) & ~frame.condition
+        elif opcode in (D.END_IF, D.END_SWITCH):
+            frame = stack.pop()
+            state.active = self.restore(stack, frame.saved)
+        elif opcode == D.LOOP:
+            stack.append(Frame(D.LOOP, pc, state.active))
+        elif opcode == D.END_LOOP:
+            frame = stack[-1]
+            frame.continued[:] = False
+            frame.iterations += 1
+            if frame.iterations > self.max_iterations:
+                raise RuntimeError(f"LOOP @ {frame.pc} ran over {self.max_iterations} iterations")
+            state.active = self.restore(stack, frame.saved)
+            if state.active.any():
+                return frame.pc + 1
+            stack.pop()
+            state.active = self.restore(stack, frame.saved)
+        elif opcode in (D.BREAK, D.BREAK_C, D.CONTINUE, D.CONTINUE_C):
+            lanes = state.active.copy()
+            if opcode in (D.BREAK_C, D.CONTINUE_C):
+                lanes &= self.condition(state, pc)
+            if opcode in (D.BREAK, D.BREAK_C):
+                frame = next(f for f in reversed(stack) if f.kind in (D.LOOP, D.SWITCH))
+                frame.exited |= lanes
+            else:
+                frame = next(f for f in reversed(stack) if f.kind == D.LOOP)
+                frame.continued |= lanes
+            state.active = state.active & ~lanes
+        elif opcode == D.SWITCH:
+            frame = Frame(D.SWITCH, pc, state.active)
+            frame.selector = self.selector(state, pc)
+            frame.condition = ~np.isin(frame.selector, self.case_values[pc])
+            stack.append(frame)
+            state.active = np.zeros_like(state.active)
+        elif opcode in (D.CASE, D.DEFAULT):
+            frame = stack[-1]
+            if opcode == D.CASE:
+                lanes = frame.selector == self.constants[pc]
+            else:
+                lanes = frame.condition
+            state.active = state.active | (self.restore(stack, frame.saved) & lanes)
+        elif opcode in (D.CALL, D.CALL_C):
+            lanes = state.active.copy()
+            if opcode == D.CALL_C:
+                lanes &= self.condition(state, pc)
+            if lanes.any():
+                frame = Frame(D.CALL, pc, state.active)
+                frame.return_pc = pc + 1
+                stack.append(frame)
+                state.active = lanes
+                return self.labels[self.constants[pc]] + 1
+        elif opcode in (D.RET, D.LABEL) and stack[-1].kind == D.CALL:
+            return self.leave(state, stack)
+        elif opcode in (D.RET, D.RET_C, D.DISCARD):
+            lanes = state.active.copy()
+            if opcode != D.RET:
+                lanes &= self.condition(state, pc)
+            if opcode == D.DISCARD:
+                state.discarded |= lanes
+                stack[0].exited |= lanes
+            else:
+                next(f for f in reversed(stack) if f.kind == D.CALL).exited |= lanes
+            state.active = state.active & ~lanes
+        return self.settle(state, stack, pc + 1)
+
+    def leave(self, state: State, stack: List[Frame]) -> int:
+        """return from the innermost CALL"""
+        frame = stack.pop()
+        if len(stack) == 0:  # end of the main program
+            return self.num_instructions
+        state.active = self.restore(stack, frame.saved)
+        return self.settle(state, stack, frame.return_pc)
+
+    def settle(self, state: State, stack: List[Frame], pc: int) -> int:
+        """skip ahead while no invocations are active"""
+        if state.active.any():
+            return pc
+        frame = stack[-1]
+        if frame.kind == D.IF:
+            if not frame.is_else and frame.pc in self.elses:
+                return self.elses[frame.pc]
+            return self.ends[frame.pc]
+        elif frame.kind == D.LOOP:
+            return self.ends[frame.pc]
+        elif frame.kind == D.SWITCH:
+            cases = self.cases[frame.pc]
+            i = bisect.bisect_left(cases, pc)
+            return cases[i] if i < len(cases) else self.ends[frame.pc]
+        else:  # CALL
+            return self.leave(state, stack)
+
+
+def run(shader, num_invocations: int, inputs: Arrays = None, constant_buffers: Dict[int, np.ndarray] = None, textures: Dict[int, textures.Texture] = None, samplers: Dict[int, textures.Sampler] = None) -> State:
+    return Interpreter(shader).run(num_invocations, inputs, constant_buffers, textures, samplers)
@@ -0,0 +1,144 @@
+"""buffer & thread group shared memory access, shared by the interpreter & compiler"""
+# NOTE: memory is addressed as (rows, words) of uint32
+# -- UAVs & resources are 1 row, shared by every invocation
+# -- thread group shared memory has 1 row per thread group; see State.group
+# -- out of range loads read 0 & out of range stores are dropped, like D3D
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from ..asm.base import opcodes
+from ..asm.base.operands import Type
+
+
+D11 = opcodes.D3D_11_0
+
+prefixes = {
+    Type.RESOURCE: "t",
+    Type.UNORDERED_ACCESS_VIEW: "u",
+    Type.THREAD_GROUP_SHARED_MEMORY: "g"}
+# ^ {Type: "prefix"}; layouts & strides are keyed by e.g. "u0"
+
+loads = {D11.LD_RAW, D11.LD_STRUCTURED, D11.LD_UAV_TYPED}
+stores = {D11.STORE_RAW, D11.STORE_STRUCTURED, D11.STORE_UAV_TYPED}
+
+atomics = {
+    D11.ATOMIC_AND: np.bitwise_and, D11.ATOMIC_OR: np.bitwise_or, D11.ATOMIC_XOR: np.bitwise_xor,
+    D11.ATOMIC_CMP_STORE: None, D11.ATOMIC_IADD: np.add,
+    D11.ATOMIC_IMAX: np.maximum, D11.ATOMIC_IMIN: np.minimum,
+    D11.ATOMIC_UMAX: np.maximum, D11.ATOMIC_UMIN: np.minimum,
+    # return the original value
+    D11.IMM_ATOMIC_IADD: np.add, D11.IMM_ATOMIC_AND: np.bitwise_and,
+    D11.IMM_ATOMIC_OR: np.bitwise_or, D11.IMM_ATOMIC_XOR: np.bitwise_xor,
+    D11.IMM_ATOMIC_EXCH: None, D11.IMM_ATOMIC_CMP_EXCH: None,
+    D11.IMM_ATOMIC_IMAX: np.maximum, D11.IMM_ATOMIC_IMIN: np.minimum,
+    D11.IMM_ATOMIC_UMAX: np.maximum, D11.IMM_ATOMIC_UMIN: np.minimum}
+# ^ {opcode: ufunc}; None for exchanges
+# NOTE: IMM_ATOMIC_ALLOC & IMM_ATOMIC_CONSUME (structure counters) aren't emulated
+
+signed_atomics = {D11.ATOMIC_IMAX, D11.ATOMIC_IMIN, D11.IMM_ATOMIC_IMAX, D11.IMM_ATOMIC_IMIN}
+compare_atomics = {D11.ATOMIC_CMP_STORE, D11.IMM_ATOMIC_CMP_EXCH}
+
+handled = {*loads, *stores, *atomics}
+
+layouts = {
+    D11.DCL_RESOURCE_RAW: "raw",
+    D11.DCL_RESOURCE_STRUCTURED: "structured",
+    D11.DCL_UNORDERED_ACCESS_VIEW_RAW: "raw",
+    D11.DCL_UNORDERED_ACCESS_VIEW_STRUCTURED: "structured",
+    D11.DCL_UNORDERED_ACCESS_VIEW_TYPED: "typed",
+    D11.DCL_THREAD_GROUP_SHARED_MEMORY_RAW: "raw",
+    D11.DCL_THREAD_GROUP_SHARED_MEMORY_STRUCTURED: "structured"}
+# ^ {declaration: "layout"}
+
+
+def flat(memory: np.ndarray) -> np.ndarray:
+    """(1, words) view of a UAV / resource array"""
+    return memory.reshape(1, -1)
+
+
+def address(layout: str, stride: int, shape: Tuple[int, ...], columns: List[np.ndarray]) -> np.ndarray:
+    """word address of component x; -1 if out of range
+    columns: uint32 address components (byte offset / index & byte offset / texel coords)"""
+    if layout == "raw":
+        return columns[0].astype(np.int64) >> 2
+    elif layout == "structured":
+        return (columns[0].astype(np.int64) * stride + columns[1]) >> 2
+    elif layout == "typed":
+        # NOTE: typed memory is (..., [z,] [y,] x, 4); 1 texel per element
+        dimensions = shape[-2::-1]
+        # ^ (x, y, z) sizes
+        element, is_valid, scale = 0, True, 1
+        for size, column in zip(dimensions, columns):
+            column = column.astype(np.int64)
+            element = element + column * scale
+            is_valid = is_valid & (column < size)
+            scale *= size
+        return np.where(is_valid, element * 4, -1)
+    raise ValueError(f"invalid layout: '{layout}'")
+
+
+def load(memory: np.ndarray, row: Union[int, np.ndarray], word: np.ndarray, components: List[int]) -> np.ndarray:
+    """(N, len(components)) uint32 from memory[row, word + component]"""
+    count = memory.shape[1]
+    words = word[:, None] + np.array(components)
+    is_valid = (word[:, None] >= 0) & (words < count)
+    out = memory[np.asarray(row)[..., None], np.where(is_valid, words, 0)]
+    out[~is_valid] = 0
+    return out
+
+
+def store(memory: np.ndarray, row: Union[int, np.ndarray], word: np.ndarray, components: List[int], value: np.ndarray, active: np.ndarray):
+    """memory[row, word + component] = value for active invocations"""
+    count = memory.shape[1]
+    word = np.broadcast_to(word, active.shape)
+    row = np.broadcast_to(row, active.shape)
+    value = np.broadcast_to(value, (*active.shape, len(components)))
+    for i, c in enumerate(components):
+        lanes = np.flatnonzero(active & (word >= 0) & (word + c < count))
+        memory[row[lanes], word[lanes] + c] = value[lanes, i]
+
+
+def atomic(opcode: opcodes.Opcode, memory: np.ndarray, row: Union[int, np.ndarray], word: np.ndarray, a: np.ndarray, b: np.ndarray, active: np.ndarray) -> np.ndarray:
+    """a & b: (N,) uint32 operands (b is only used by compares); returns (N, 1) original values"""
+    # NOTE: invocations in a batch apply their atomics in lane order
+    word = np.broadcast_to(word, active.shape)
+    row = np.broadcast_to(row, active.shape)
+    a = np.broadcast_to(a, active.shape)
+    lanes = np.flatnonzero(active & (word >= 0) & (word < memory.shape[1]))
+    out = np.zeros((*active.shape, 1), dtype=np.uint32)
+    rows, words = row[lanes], word[lanes]
+    if opcode in (D11.ATOMIC_IADD, D11.IMM_ATOMIC_IADD):
+        # exclusive running sum per address
+        order = np.lexsort((words, rows))
+        values = a[lanes][order].astype(np.uint64)
+        totals = np.cumsum(values)
+        is_first = np.ones(len(order), dtype=bool)
+        is_first[1:] = (rows[order][1:] != rows[order][:-1]) | (words[order][1:] != words[order][:-1])
+        starts = np.maximum.accumulate(np.where(is_first, np.arange(len(order)), 0))
+        before = totals - values - (totals - values)[starts]
+        originals = memory[rows[order], words[order]] + before
+        out[lanes[order], 0] = originals.astype(np.uint32)
+        np.add.at(memory, (rows, words), a[lanes])
+        return out
+    ufunc = atomics[opcode]
+    if ufunc is not None:
+        view = memory.view(np.int32) if opcode in signed_atomics else memory
+        values = a[lanes].view(view.dtype)
+        if opcode.name.startswith("ATOMIC"):  # no return value
+            ufunc.at(view, (rows, words), values)
+            return out
+    # sequential fallback
+    b = np.broadcast_to(b, active.shape) if b is not None else None
+    for lane, r, w in zip(lanes, rows, words):
+        original = memory[r, w]
+        out[lane, 0] = original
+        if opcode in compare_atomics:
+            if original == a[lane]:
+                memory[r, w] = b[lane]
+        elif opcode == D11.IMM_ATOMIC_EXCH:
+            memory[r, w] = a[lane]
+        else:
+            view = memory.view(np.int32) if opcode in signed_atomics else memory
+            view[r, w] = ufunc(view[r, w], a[lane:lane + 1].view(view.dtype)[0])
+    return out
@@ -0,0 +1,189 @@
+"""vectorised ALU operations, shared by the interpreter & compiler"""
+# NOTE: registers hold raw bits (uint32); each operation views them as a type
+# -- "f": float32, "i": int32, "u": uint32, "b": bool (written as 0xFFFFFFFF / 0)
+from typing import Callable, Tuple
+
+import numpy as np
+
+from ..asm.base import opcodes
+
+
+D = opcodes.D3D_10_0
+D11 = opcodes.D3D_11_0
+
+dtypes = {"f": np.float32, "i": np.int32, "u": np.uint32}
+# ^ {"type": dtype}
+
+
+def ddx(a: np.ndarray) -> np.ndarray:
+    """fine derivative across each 2x2 quad; lanes are ordered TL, TR, BL, BR"""
+    quads = a.reshape(-1, 4, *a.shape[1:])
+    out = np.empty_like(quads)
+    out[:, 0::2] = out[:, 1::2] = quads[:, 1::2] - quads[:, 0::2]
+    return out.reshape(a.shape)
+
+
+def ddy(a: np.ndarray) -> np.ndarray:
+    quads = a.reshape(-1, 4, *a.shape[1:])
+    out = np.empty_like(quads)
+    out[:, 0:2] = out[:, 2:4] = quads[:, 2:4] - quads[:, 0:2]
+    return out.reshape(a.shape)
+
+
+def ddx_coarse(a: np.ndarray) -> np.ndarray:
+    quads = a.reshape(-1, 4, *a.shape[1:])
+    return np.repeat(quads[:, 1:2] - quads[:, 0:1], 4, axis=1).reshape(a.shape)
+
+
+def ddy_coarse(a: np.ndarray) -> np.ndarray:
+    quads = a.reshape(-1, 4, *a.shape[1:])
+    return np.repeat(quads[:, 2:3] - quads[:, 0:1], 4, axis=1).reshape(a.shape)
+
+
+def f_to_i(a: np.ndarray) -> np.ndarray:
+    return np.clip(np.nan_to_num(a.astype(np.float64)), -2 ** 31, 2 ** 31 - 1).astype(np.int32)
+
+
+def f_to_u(a: np.ndarray) -> np.ndarray:
+    return np.clip(np.nan_to_num(a.astype(np.float64)), 0, 2 ** 32 - 1).astype(np.uint32)
+
+
+def bfrev(a: np.ndarray) -> np.ndarray:
+    a = a.astype(np.uint32)
+    for shift, mask in ((1, 0x55555555), (2, 0x33333333), (4, 0x0F0F0F0F), (8, 0x00FF00FF)):
+        a = ((a >> shift) & mask) | ((a & mask) << shift)
+    return (a >> 16) | (a << 16)
+
+
+def countbits(a: np.ndarray) -> np.ndarray:
+    a = a - ((a >> 1) & 0x55555555)
+    a = (a & 0x33333333) + ((a >> 2) & 0x33333333)
+    a = (a + (a >> 4)) & 0x0F0F0F0F
+    return (a * 0x01010101) >> 24
+
+
+def wide(a: np.ndarray, b: np.ndarray, dtype) -> Tuple[np.ndarray, np.ndarray]:
+    """(hi, lo) 32 bits of a 64-bit product"""
+    product = a.astype(dtype) * b.astype(dtype)
+    return (product >> 32).astype(np.uint32), (product & 0xFFFFFFFF).astype(np.uint32)
+
+
+namespace = {
+    "np": np, "ddx": ddx, "ddy": ddy, "ddx_coarse": ddx_coarse, "ddy_coarse": ddy_coarse,
+    "f_to_i": f_to_i, "f_to_u": f_to_u, "bfrev": bfrev, "countbits": countbits,
+    "wide": wide}
+# ^ globals for expressions & generated code
+
+alu = {
+    # float
+    D.ADD: ("ff", "f", "a + b"),
+    D.DIV: ("ff", "f", "a / b"),
+    D.EXP: ("f", "f", "np.exp2(a)"),
+    D.FRC: ("f", "f", "a - np.floor(a)"),
+    D.LOG: ("f", "f", "np.log2(a)"),
+    D.MAD: ("fff", "f", "a * b + c"),
+    D.MAX: ("ff", "f", "np.fmax(a, b)"),
+    D.MIN: ("ff", "f", "np.fmin(a, b)"),
+    D.MOV: ("f", "f", "a"),
+    D.MOV_C: ("uff", "f", "np.where(a != 0, b, c)"),
+    # ^ selects bits, but fxc emits float modifiers on b & c (e.g. movc r0, r1, -r2, r3)
+    D.MUL: ("ff", "f", "a * b"),
+    D.ROUND_NE: ("f", "f", "np.rint(a)"),
+    D.ROUND_NI: ("f", "f", "np.floor(a)"),
+    D.ROUND_PI: ("f", "f", "np.ceil(a)"),
+    D.ROUND_Z: ("f", "f", "np.trunc(a)"),
+    D.RSQ: ("f", "f", "1 / np.sqrt(a)"),
+    D.SQRT: ("f", "f", "np.sqrt(a)"),
+    D11.RCP: ("f", "f", "1 / a"),
+    D.DP_2: ("ff", "f", "a[:, 0:1] * b[:, 0:1] + a[:, 1:2] * b[:, 1:2]"),
+    D.DP_3: ("ff", "f", "a[:, 0:1] * b[:, 0:1] + a[:, 1:2] * b[:, 1:2] + a[:, 2:3] * b[:, 2:3]"),
+    D.DP_4: ("ff", "f", "a[:, 0:1] * b[:, 0:1] + a[:, 1:2] * b[:, 1:2] + a[:, 2:3] * b[:, 2:3] + a[:, 3:4] * b[:, 3:4]"),
+    D.DERIV_RTX: ("f", "f", "ddx(a)"),
+    D.DERIV_RTY: ("f", "f", "ddy(a)"),
+    D11.DERIV_RTX_FINE: ("f", "f", "ddx(a)"),
+    D11.DERIV_RTY_FINE: ("f", "f", "ddy(a)"),
+    D11.DERIV_RTX_COARSE: ("f", "f", "ddx_coarse(a)"),
+    D11.DERIV_RTY_COARSE: ("f", "f", "ddy_coarse(a)"),
+    # comparisons
+    D.EQ: ("ff", "b", "a == b"),
+    D.GE: ("ff", "b", "a >= b"),
+    D.LT: ("ff", "b", "a < b"),
+    D.NE: ("ff", "b", "a != b"),
+    D.IEQ: ("uu", "b", "a == b"),
+    D.IGE: ("ii", "b", "a >= b"),
+    D.ILT: ("ii", "b", "a < b"),
+    D.INE: ("uu", "b", "a != b"),
+    D.UGE: ("uu", "b", "a >= b"),
+    D.ULT: ("uu", "b", "a < b"),
+    # conversions
+    D.F_TO_I: ("f", "i", "f_to_i(a)"),
+    D.F_TO_U: ("f", "u", "f_to_u(a)"),
+    D.I_TO_F: ("i", "f", "a.astype(np.float32)"),
+    D.U_TO_F: ("u", "f", "a.astype(np.float32)"),
+    # integer
+    D.AND: ("uu", "u", "a & b"),
+    D.IADD: ("uu", "u", "a + b"),
+    D.IMAD: ("uuu", "u", "a * b + c"),
+    D.IMAX: ("ii", "i", "np.maximum(a, b)"),
+    D.IMIN: ("ii", "i", "np.minimum(a, b)"),
+    D.INEG: ("i", "i", "-a"),
+    D.ISHL: ("uu", "u", "a << (b & 31)"),
+    D.ISHR: ("iu", "i", "a >> (b & 31)"),
+    D.NOT: ("u", "u", "~a"),
+    D.OR: ("uu", "u", "a | b"),
+    D.UMAD: ("uuu", "u", "a * b + c"),
+    D.UMAX: ("uu", "u", "np.maximum(a, b)"),
+    D.UMIN: ("uu", "u", "np.minimum(a, b)"),
+    D.USHR: ("uu", "u", "a >> (b & 31)"),
+    D.XOR: ("uu", "u", "a ^ b"),
+    D11.BFREV: ("u", "u", "bfrev(a)"),
+    D11.COUNTBITS: ("u", "u", "countbits(a)"),
+}
+# ^ {opcode: ("source_types", "dest_type", "expression")}
+# NOTE: sources are named a, b & c; componentwise ops get (N, 4) arrays
+
+multi = {
+    D.IMUL: ("ii", "uu", "wide(a, b, np.int64)"),
+    D.UMUL: ("uu", "uu", "wide(a, b, np.uint64)"),
+    D.UDIV: ("uu", "uu", "(np.where(b != 0, a // np.maximum(b, 1), 0xFFFFFFFF), np.where(b != 0, a % np.maximum(b, 1), 0xFFFFFFFF))"),
+    D.SIN_COS: ("f", "ff", "(np.sin(a), np.cos(a))"),
+    D11.UADDC: ("uu", "uu", "(a + b, (a.astype(np.uint64) + b > 0xFFFFFFFF).astype(np.uint32))"),
+    D11.USUBB: ("uu", "uu", "(a - b, (a < b).astype(np.uint32))"),
+}
+# ^ {opcode: ("source_types", "dest_types", "expression -> tuple")}
+# NOTE: one result per destination; null destinations are skipped
+
+
+def function(sources: str, expression: str) -> Callable:
+    arguments = ", ".join("abc"[:len(sources)])
+    return eval(f"lambda {arguments}: {expression}", namespace)
+
+
+functions = {
+    opcode: function(sources, expression)
+    for table in (alu, multi)
+    for opcode, (sources, dest, expression) in table.items()}
+# ^ {opcode: function}
+
+
+def as_bits(value, type_: str, saturate: bool = False) -> np.ndarray:
+    """result of an operation -> uint32 bits"""
+    if type_ == "b":
+        return np.where(value, np.uint32(0xFFFFFFFF), np.uint32(0))
+    value = np.asarray(value)
+    if type_ == "f":
+        value = value.astype(np.float32, copy=False)
+        if saturate:  # NaN -> 0
+            value = np.clip(np.nan_to_num(value, nan=0.0), 0, 1).astype(np.float32)
+        return value.view(np.uint32)
+    return value.astype(dtypes[type_], copy=False).view(np.uint32)
+
+
+def modify(value: np.ndarray, type_: str, modifier: int) -> np.ndarray:
+    """apply an operand's abs / neg modifier"""
+    # NOTE: 1: NEG, 2: ABS, 3: ABS_NEG
+    if modifier & 2:
+        value = np.abs(value) if type_ != "u" else value
+    if modifier & 1:
+        value = -value if type_ != "u" else (0 - value).astype(np.uint32)
+    return value
@@ -0,0 +1,125 @@
+"""register files for a batch of shader invocations"""
+from __future__ import annotations
+import re
+from typing import Dict, Union, TYPE_CHECKING
+
+import numpy as np
+
+from ..asm.base.operands import Type
+
+if TYPE_CHECKING:
+    from . import textures
+
+
+Arrays = Union[np.ndarray, Dict[int, np.ndarray]]
+# ^ (N, registers, 4) or {register: (N, components)}
+
+
+def as_bits(array: np.ndarray) -> np.ndarray:
+    """float32 / int32 / uint32 data -> uint32 view; other dtypes are converted"""
+    array = np.asarray(array)
+    if array.dtype.kind == "f" and array.dtype != np.float32:
+        array = array.astype(np.float32)
+    elif array.dtype.kind in "iub" and array.dtype.itemsize != 4:
+        array = array.astype(np.int32 if array.dtype.kind == "i" else np.uint32)
+    return np.ascontiguousarray(array).view(np.uint32)
+
+
+def register_file(num_invocations: int, num_registers: int, arrays: Arrays = None) -> np.ndarray:
+    out = np.zeros((num_invocations, num_registers, 4), dtype=np.uint32)
+    if arrays is None:
+        return out
+    if isinstance(arrays, dict):
+        for register, array in arrays.items():
+            array = as_bits(array).reshape(num_invocations, -1)
+            out[:, register, :array.shape[1]] = array
+    else:
+        array = as_bits(arrays).reshape(num_invocations, -1, 4)
+        out[:, :array.shape[1]] = array
+    return out
+
+
+class State:
+    """registers for N invocations; each register file is (N, registers, 4) uint32"""
+    num_invocations: int
+    temps: np.ndarray  # r#
+    inputs: np.ndarray  # v#
+    outputs: np.ndarray  # o#
+    indexable_temps: Dict[int, np.ndarray]
+    # ^ {x#: (N, count, 4)}
+    constant_buffers: Dict[int, np.ndarray]
+    # ^ {cb#: (count, 4)}; shared by every invocation
+    active: np.ndarray  # (N,) bool execution mask
+    discarded: np.ndarray  # (N,) bool
+    # compute shaders
+    system_values: Dict[Type, np.ndarray]
+    # ^ {Type.INPUT_THREAD_ID etc.: (N, 4) uint32}
+    group: np.ndarray  # (N,) int64 row of shared_memory for each invocation
+    shared_memory: Dict[int, np.ndarray]
+    # ^ {g#: (groups, words) uint32}
+    uavs: Dict[int, np.ndarray]
+    # ^ {u#: uint32 words (raw / structured) or (..., 4) uint32 texels (typed)}
+    resources: Dict[int, np.ndarray]
+    # ^ {t#: uint32 words}; raw & structured buffers only
+    # textures
+    textures: Dict[int, textures.Texture]
+    # ^ {t#: Texture}
+    samplers: Dict[int, textures.Sampler]
+    # ^ {s#: Sampler}
+
+    def __init__(self, num_invocations: int = 1):
+        self.num_invocations = num_invocations
+        self.temps = register_file(num_invocations, 0)
+        self.inputs = register_file(num_invocations, 0)
+        self.outputs = register_file(num_invocations, 0)
+        self.indexable_temps = dict()
+        self.constant_buffers = dict()
+        self.active = np.ones(num_invocations, dtype=bool)
+        self.discarded = np.zeros(num_invocations, dtype=bool)
+        self.system_values = dict()
+        self.group = np.zeros(num_invocations, dtype=np.int64)
+        self.shared_memory = dict()
+        self.uavs = dict()
+        self.resources = dict()
+        self.textures = dict()
+        self.samplers = dict()
+
+    def __repr__(self) -> str:
+        descriptor = " ".join([
+            f"{self.num_invocations} invocations",
+            f"{self.temps.shape[1]} temps",
+            f"{self.inputs.shape[1]} inputs",
+            f"{self.outputs.shape[1]} outputs"])
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    @classmethod
+    def from_arrays(cls, num_invocations: int, inputs: Arrays = None, constant_buffers: Dict[int, np.ndarray] = None, num_temps: int = 0, num_inputs: int = 0, num_outputs: int = 0, indexable_temps: Dict[int, int] = None) -> State:
+        """indexable_temps: {x#: count}"""
+        out = cls(num_invocations)
+        if isinstance(inputs, dict) and len(inputs) > 0:
+            num_inputs = max(num_inputs, max(inputs) + 1)
+        elif inputs is not None and not isinstance(inputs, dict):
+            num_inputs = max(num_inputs, np.asarray(inputs).reshape(num_invocations, -1, 4).shape[1])
+        out.temps = register_file(num_invocations, num_temps)
+        out.inputs = register_file(num_invocations, num_inputs, inputs)
+        out.outputs = register_file(num_invocations, num_outputs)
+        out.indexable_temps = {
+            register: register_file(num_invocations, count)
+            for register, count in (indexable_temps or dict()).items()}
+        out.constant_buffers = {
+            slot: as_bits(array).reshape(-1, 4)
+            for slot, array in (constant_buffers or dict()).items()}
+        return out
+
+    def register(self, name: str, dtype=np.float32) -> np.ndarray:
+        """(N, 4) view of a register; e.g. state.register("o0")"""
+        match = re.fullmatch(r"([rvo])(\d+)|x(\d+)\[(\d+)\]", name)
+        if match is None:
+            raise ValueError(f"invalid register: '{name}'")
+        prefix, index, array, element = match.groups()
+        if array is not None:
+            registers = self.indexable_temps[int(array)][:, int(element)]
+        else:
+            register_files = {"r": self.temps, "v": self.inputs, "o": self.outputs}
+            registers = register_files[prefix][:, int(index)]
+        return registers.view(dtype)
@@ -0,0 +1,421 @@
+"""textures, samplers & vectorised filtering"""
+# NOTE: each mip level is a (slices, depth, height, width, 4) uint32 array
+# -- filtering views texels as float32; LD & GATHER_4 return raw bits
+# -- every call samples a whole batch of coordinates at once
+from __future__ import annotations
+import enum
+import itertools
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from ..asm.base import opcodes
+from ..asm.base.extensions import ResourceDimension
+from .state import as_bits
+
+
+D = opcodes.D3D_10_0
+D101 = opcodes.D3D_10_1
+D11 = opcodes.D3D_11_0
+RD = ResourceDimension
+
+
+class Filter(enum.Enum):
+    POINT = 0
+    BILINEAR = 1  # nearest mip
+    TRILINEAR = 2
+
+
+class Address(enum.Enum):
+    # D3D11_TEXTURE_ADDRESS_MODE
+    WRAP = 1
+    MIRROR = 2
+    CLAMP = 3
+
+
+class Comparison(enum.Enum):
+    # D3D11_COMPARISON_FUNC; SAMPLE_C passes if reference OP texel
+    NEVER = 1
+    LESS = 2
+    EQUAL = 3
+    LESS_EQUAL = 4
+    GREATER = 5
+    NOT_EQUAL = 6
+    GREATER_EQUAL = 7
+    ALWAYS = 8
+
+
+comparisons = {
+    Comparison.NEVER: lambda a, b: np.zeros(np.broadcast(a, b).shape, dtype=bool),
+    Comparison.LESS: np.less,
+    Comparison.EQUAL: np.equal,
+    Comparison.LESS_EQUAL: np.less_equal,
+    Comparison.GREATER: np.greater,
+    Comparison.NOT_EQUAL: np.not_equal,
+    Comparison.GREATER_EQUAL: np.greater_equal,
+    Comparison.ALWAYS: lambda a, b: np.ones(np.broadcast(a, b).shape, dtype=bool)}
+# ^ {Comparison: function(reference, texel)}
+
+layouts = {
+    RD.BUFFER: "W",
+    RD.TEXTURE_1D: "W",
+    RD.TEXTURE_1D_ARRAY: "SW",
+    RD.TEXTURE_2D: "HW",
+    RD.TEXTURE_2D_MS: "HW",
+    RD.TEXTURE_2D_ARRAY: "SHW",
+    RD.TEXTURE_2D_MS_ARRAY: "SHW",
+    RD.TEXTURE_3D: "DHW",
+    RD.TEXTURE_CUBE: "SHW",  # 6 faces: +X, -X, +Y, -Y, +Z, -Z
+    RD.TEXTURE_CUBE_ARRAY: "SHW"}  # 6 faces per cube
+# ^ {dimension: "axes"} of arrays passed to Texture.from_array (w/o the channel axis)
+
+coordinates = {
+    RD.BUFFER: (1, None),
+    RD.TEXTURE_1D: (1, None),
+    RD.TEXTURE_1D_ARRAY: (1, 1),
+    RD.TEXTURE_2D: (2, None),
+    RD.TEXTURE_2D_MS: (2, None),
+    RD.TEXTURE_2D_ARRAY: (2, 2),
+    RD.TEXTURE_2D_MS_ARRAY: (2, 2),
+    RD.TEXTURE_3D: (3, None),
+    RD.TEXTURE_CUBE: (3, None),
+    RD.TEXTURE_CUBE_ARRAY: (3, 3)}
+# ^ {dimension: (spatial_axes, array_slice_component)}
+
+srv_dimensions = {
+    1: RD.BUFFER, 2: RD.TEXTURE_1D, 3: RD.TEXTURE_1D_ARRAY, 4: RD.TEXTURE_2D,
+    5: RD.TEXTURE_2D_ARRAY, 6: RD.TEXTURE_2D_MS, 7: RD.TEXTURE_2D_MS_ARRAY,
+    8: RD.TEXTURE_3D, 9: RD.TEXTURE_CUBE, 10: RD.TEXTURE_CUBE_ARRAY}
+# ^ {D3D_SRV_DIMENSION: ResourceDimension}; see rdef.ResourceBinding.dimension
+
+handled = {
+    D.SAMPLE, D.SAMPLE_L, D.SAMPLE_B, D.SAMPLE_D, D.SAMPLE_C, D.SAMPLE_C_LZ, D.LD,
+    D101.GATHER_4, D11.GATHER_4_C}
+
+
+class Sampler:
+    """D3D11_SAMPLER_DESC subset; the filter is used for both min & mag"""
+    filter: Filter
+    address: Tuple[Address, Address, Address]
+    # ^ (u, v, w)
+    comparison: Comparison  # SAMPLE_C & GATHER_4_C only
+    mip_lod_bias: float
+    min_lod: float
+    max_lod: float
+
+    def __init__(self, filter_=Filter.TRILINEAR, address=Address.WRAP, comparison=Comparison.LESS_EQUAL, mip_lod_bias=0.0, min_lod=0.0, max_lod=np.inf):
+        self.filter = filter_
+        self.address = (address,) * 3 if isinstance(address, Address) else tuple(address)
+        self.comparison = comparison
+        self.mip_lod_bias = mip_lod_bias
+        self.min_lod = min_lod
+        self.max_lod = max_lod
+
+    def __repr__(self) -> str:
+        addresses = "/".join(address.name for address in self.address)
+        descriptor = f"{self.filter.name} {addresses}"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+
+default_sampler = Sampler()
+# ^ for samplers w/o a binding
+
+
+def unorm(array: np.ndarray) -> np.ndarray:
+    """8 & 16-bit unsigned texels -> float32 [0, 1]"""
+    if array.dtype in (np.uint8, np.uint16):
+        return array.astype(np.float32) / np.iinfo(array.dtype).max
+    return array
+
+
+def downsample(level: np.ndarray) -> np.ndarray:
+    """next mip; 2x2(x2) box filter of float32 texels"""
+    for axis in (1, 2, 3):  # depth, height & width
+        size = level.shape[axis]
+        if size > 1:
+            half = size // 2
+            even = level.take(np.arange(0, half * 2, 2), axis=axis)
+            odd = level.take(np.arange(1, half * 2, 2), axis=axis)
+            level = (even + odd) * np.float32(0.5)
+    return level
+
+
+class Texture:
+    """an image & it's mip chain"""
+    dimension: ResourceDimension
+    levels: List[np.ndarray]
+    # ^ [(slices, depth, height, width, 4) uint32]
+
+    def __init__(self, levels: List[np.ndarray], dimension: ResourceDimension = RD.TEXTURE_2D):
+        self.levels = levels
+        self.dimension = dimension
+
+    def __repr__(self) -> str:
+        slices, depth, height, width, _ = self.levels[0].shape
+        size = "x".join(map(str, [width, height, depth][:coordinates[self.dimension][0]]))
+        descriptor = f"{self.dimension.name} {size} {len(self.levels)} levels"
+        if slices > 1:
+            descriptor = f"{descriptor} {slices} slices"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    @classmethod
+    def from_array(cls, array: np.ndarray, dimension: ResourceDimension = RD.TEXTURE_2D, mips: Union[bool, List[np.ndarray]] = True) -> Texture:
+        """array: axes from layouts[dimension], w/ an optional channel axis (up to 4)
+        mips: generate a mip chain (float & unorm textures only), or a list of smaller arrays"""
+        levels = [cls.as_level(array, dimension)]
+        if isinstance(mips, (list, tuple)):
+            levels.extend(cls.as_level(mip, dimension) for mip in mips)
+        elif mips and unorm(np.asarray(array)).dtype.kind == "f":
+            level = levels[0].view(np.float32)
+            while any(size > 1 for size in level.shape[1:4]):
+                level = downsample(level)
+                levels.append(level.view(np.uint32))
+        return cls(levels, dimension)
+
+    @staticmethod
+    def as_level(array: np.ndarray, dimension: ResourceDimension) -> np.ndarray:
+        """array -> (slices, depth, height, width, 4) uint32"""
+        array = unorm(np.asarray(array))
+        axes = layouts[dimension]
+        if array.ndim == len(axes):  # single channel
+            array = array[..., None]
+        if array.ndim != len(axes) + 1 or array.shape[-1] > 4:
+            raise ValueError(f"expected {axes} + channels for {dimension.name}, got shape {array.shape}")
+        # missing channels default to (0, 0, 0, 1)
+        one = 1.0 if array.dtype.kind == "f" else 1
+        bits = as_bits(array)
+        out = np.zeros((*bits.shape[:-1], 4), dtype=np.uint32)
+        out[..., 3] = as_bits(np.array([one], dtype=array.dtype))[0]
+        out[..., :bits.shape[-1]] = bits
+        shape = [out.shape[axes.index(axis)] if axis in axes else 1 for axis in "SDHW"]
+        return out.reshape(*shape, 4)
+
+
+def bind(rdef, images: Dict[str, np.ndarray], samplers: Dict[str, Sampler] = None) -> Tuple[Dict[int, Texture], Dict[int, Sampler]]:
+    """match RDEF resource bindings to arrays & samplers by name
+    images: {"name": array or Texture}; returns ({t#: Texture}, {s#: Sampler})"""
+    # NOTE: D3D_SHADER_INPUT_TYPE 2 is TEXTURE & 3 is SAMPLER
+    textures, bound_samplers = dict(), dict()
+    for binding in rdef.resource_bindings:
+        if binding.type == 2 and binding.name in images:
+            image = images[binding.name]
+            if not isinstance(image, Texture):
+                image = Texture.from_array(image, srv_dimensions.get(binding.dimension, RD.TEXTURE_2D))
+            textures[binding.bind_point] = image
+        elif binding.type == 3 and binding.name in (samplers or dict()):
+            bound_samplers[binding.bind_point] = samplers[binding.name]
+    return textures, bound_samplers
+
+
+# addressing & filtering
+def address(index: np.ndarray, size: int, mode: Address) -> np.ndarray:
+    if mode == Address.WRAP:
+        return index % size
+    elif mode == Address.MIRROR:
+        index = index % (size * 2)
+        return np.where(index >= size, size * 2 - 1 - index, index)
+    return np.clip(index, 0, size - 1)
+
+
+def cube_faces(direction: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(N, 3) directions -> ((N,) face, (N, 2) uv)"""
+    # NOTE: no seamless filtering across cube edges
+    x, y, z = direction[:, 0], direction[:, 1], direction[:, 2]
+    ax, ay, az = np.abs(x), np.abs(y), np.abs(z)
+    is_x = (ax >= ay) & (ax >= az)
+    is_y = ~is_x & (ay >= az)
+    face = np.where(is_x, np.where(x >= 0, 0, 1), np.where(is_y, np.where(y >= 0, 2, 3), np.where(z >= 0, 4, 5)))
+    major = np.where(is_x, ax, np.where(is_y, ay, az))
+    s = np.choose(face, [-z, z, x, x, x, -x])
+    t = np.choose(face, [-y, -y, z, -z, -y, -y])
+    with np.errstate(all="ignore"):
+        uv = np.stack([s, t], axis=1) / major[:, None]
+    return face, (uv + 1) * np.float32(0.5)
+
+
+def filtered(level: np.ndarray, uvw: np.ndarray, slices: np.ndarray, modes: Tuple[Address, ...], offsets: Tuple[int, int, int], is_point: bool, compare=None) -> np.ndarray:
+    """(N, 4) float32 from one mip level; uvw: (N, axes) normalised coords
+    compare: function(texels) -> (N, 1) applied before filtering"""
+    texels = level.view(np.float32)
+    sizes = (level.shape[3], level.shape[2], level.shape[1])
+    # ^ (width, height, depth)
+    starts, fractions = list(), list()
+    for axis in range(uvw.shape[1]):
+        if is_point:
+            starts.append(np.floor(uvw[:, axis] * sizes[axis]).astype(np.int64) + offsets[axis])
+        else:
+            x = uvw[:, axis] * sizes[axis] - np.float32(0.5)
+            start = np.floor(x)
+            fractions.append((x - start).astype(np.float32))
+            starts.append(start.astype(np.int64) + offsets[axis])
+    out = 0
+    for corner in itertools.product((0, 1), repeat=len(fractions)):
+        index = [0, 0, 0]  # x, y, z
+        weight = 1
+        for axis, start in enumerate(starts):
+            step = corner[axis] if not is_point else 0
+            index[axis] = address(start + step, sizes[axis], modes[axis])
+            if not is_point:
+                weight = weight * (fractions[axis] if step else 1 - fractions[axis])
+        value = texels[slices, index[2], index[1], index[0]]
+        if compare is not None:
+            value = compare(value)
+        out = out + (value if is_point else value * weight[:, None])
+    return np.asarray(out, dtype=np.float32)
+
+
+def gradient_lod(dx: np.ndarray, dy: np.ndarray, sizes: Tuple[int, ...]) -> np.ndarray:
+    """(N,) level of detail from (N, axes) coordinate derivatives"""
+    scale = np.array(sizes[:dx.shape[1]], dtype=np.float32)
+    length_x = np.sqrt(np.sum((dx * scale) ** 2, axis=1))
+    length_y = np.sqrt(np.sum((dy * scale) ** 2, axis=1))
+    with np.errstate(divide="ignore"):
+        return np.log2(np.maximum(length_x, length_y))
+
+
+def quad_lod(coords: np.ndarray, sizes: Tuple[int, ...]) -> np.ndarray:
+    """implicit level of detail, from derivatives across each 2x2 quad"""
+    num_invocations = coords.shape[0]
+    if num_invocations < 4 or num_invocations % 4 != 0:  # no quads
+        return np.zeros(num_invocations, dtype=np.float32)
+    quads = coords.reshape(-1, 4, coords.shape[1])
+    dx = np.repeat(quads[:, 1] - quads[:, 0], 4, axis=0)
+    dy = np.repeat(quads[:, 2] - quads[:, 0], 4, axis=0)
+    # ^ coarse derivatives
+    return gradient_lod(dx, dy, sizes)
+
+
+def locate(texture: Texture, sampler: Sampler, coords: np.ndarray) -> Tuple[np.ndarray, np.ndarray, Tuple[Address, ...]]:
+    """(uvw, slices, address modes) for normalised coords"""
+    axes, slice_component = coordinates[texture.dimension]
+    num_slices = texture.levels[0].shape[0]
+    if slice_component is not None:
+        slices = np.clip(np.rint(coords[:, slice_component]), 0, num_slices - 1).astype(np.int64)
+    else:
+        slices = np.zeros(coords.shape[0], dtype=np.int64)
+    if texture.dimension in (RD.TEXTURE_CUBE, RD.TEXTURE_CUBE_ARRAY):
+        face, uv = cube_faces(coords[:, :3])
+        slices = np.minimum(slices * 6 + face, num_slices - 1)
+        return uv, slices, (Address.CLAMP,) * 2
+    return coords[:, :axes], slices, sampler.address[:axes]
+
+
+def sample(texture: Texture, sampler: Sampler, coords: np.ndarray, lod: np.ndarray, offsets: Tuple[int, int, int] = (0, 0, 0), compare=None) -> np.ndarray:
+    """(N, 4) float32; coords: (N, 4) float32; lod: (N,) before sampler bias & clamps"""
+    uvw, slices, modes = locate(texture, sampler, coords)
+    last = len(texture.levels) - 1
+    lod = np.clip(np.nan_to_num(lod + sampler.mip_lod_bias, nan=0.0), sampler.min_lod, min(sampler.max_lod, last))
+    if sampler.filter == Filter.TRILINEAR:
+        lower = np.floor(lod).astype(np.int64)
+        blend = (lod - lower).astype(np.float32)
+    else:  # nearest mip
+        lower = np.floor(lod + 0.5).astype(np.int64)
+        blend = None
+    is_point = sampler.filter == Filter.POINT
+
+    def at(levels: np.ndarray) -> np.ndarray:
+        unique = np.unique(levels)
+        if len(unique) == 1:
+            return filtered(texture.levels[unique[0]], uvw, slices, modes, offsets, is_point, compare)
+        out = np.empty((len(levels), 4), dtype=np.float32)
+        for level in unique:
+            lanes = levels == level
+            lane_compare = None if compare is None else (lambda texels, lanes=lanes: compare(texels, lanes))
+            out[lanes] = filtered(texture.levels[level], uvw[lanes], slices[lanes], modes, offsets, is_point, lane_compare)
+        return out
+
+    out = at(lower)
+    if blend is not None and np.any(blend > 0):
+        upper = at(np.minimum(lower + 1, last))
+        out = out + (upper - out) * blend[:, None]
+    return out
+
+
+def gather(texture: Texture, sampler: Sampler, coords: np.ndarray, channel: int, offsets: Tuple[int, int, int] = (0, 0, 0), compare=None) -> np.ndarray:
+    """(N, 4) uint32; the 4 texels a bilinear filter would use from the top mip"""
+    # NOTE: order is (u0, v1), (u1, v1), (u1, v0), (u0, v0)
+    uvw, slices, modes = locate(texture, sampler, coords)
+    level = texture.levels[0]
+    sizes = (level.shape[3], level.shape[2])
+    starts = [
+        np.floor(uvw[:, axis] * sizes[axis] - np.float32(0.5)).astype(np.int64) + offsets[axis]
+        for axis in range(2)]
+    out = np.empty((len(slices), 4), dtype=np.uint32)
+    for i, (du, dv) in enumerate(((0, 1), (1, 1), (1, 0), (0, 0))):
+        u = address(starts[0] + du, sizes[0], modes[0])
+        v = address(starts[1] + dv, sizes[1], modes[1]) if len(starts) > 1 else 0
+        texels = level[slices, 0, v, u]
+        if compare is not None:
+            out[:, i] = compare(texels.view(np.float32))[:, 0].view(np.uint32)
+        else:
+            out[:, i] = texels[:, channel]
+    return out
+
+
+def load(texture: Texture, address_: np.ndarray, offsets: Tuple[int, int, int] = (0, 0, 0)) -> np.ndarray:
+    """(N, 4) uint32 texels at integer coords; .w is the mip (except buffers & MS textures)
+    out of range loads read 0"""
+    coords = address_.view(np.int32).astype(np.int64)
+    axes, slice_component = coordinates[texture.dimension]
+    num_invocations = coords.shape[0]
+    if texture.dimension in (RD.BUFFER, RD.TEXTURE_2D_MS, RD.TEXTURE_2D_MS_ARRAY):
+        mips = np.zeros(num_invocations, dtype=np.int64)
+    else:
+        mips = coords[:, 3]
+    out = np.zeros((num_invocations, 4), dtype=np.uint32)
+    for mip in np.unique(mips):
+        if not 0 <= mip < len(texture.levels):
+            continue
+        level = texture.levels[mip]
+        sizes = (level.shape[3], level.shape[2], level.shape[1])
+        lanes = mips == mip
+        is_valid = lanes.copy()
+        index = [0, 0, 0]
+        for axis in range(min(axes, 3)):
+            index[axis] = coords[:, axis] + (offsets[axis] if texture.dimension != RD.BUFFER else 0)
+            is_valid &= (index[axis] >= 0) & (index[axis] < sizes[axis])
+        slices = coords[:, slice_component] if slice_component is not None else np.zeros(num_invocations, dtype=np.int64)
+        is_valid &= (slices >= 0) & (slices < level.shape[0])
+        index = [np.where(is_valid, i, 0) for i in index]
+        slices = np.where(is_valid, slices, 0)
+        out[is_valid] = level[slices, index[2], index[1], index[0]][is_valid]
+    return out
+
+
+def evaluate(opcode: opcodes.Opcode, texture: Texture, sampler: Sampler, coords: np.ndarray, extras: List[np.ndarray], offsets: Tuple[int, int, int], swizzle: List[int], channel: int = 0) -> np.ndarray:
+    """(N, 4) uint32 result of a SAMPLE*, LD or GATHER_4* instruction
+    coords & extras: (N, 4) uint32 operand bits; swizzle: resource operand components"""
+    num_invocations = max([coords.shape[0], *(extra.shape[0] for extra in extras)])
+    coords = np.broadcast_to(coords, (num_invocations, 4))
+    if opcode == D.LD:
+        return load(texture, coords, offsets)[:, swizzle]
+    coords = coords.view(np.float32)
+    extras = [np.broadcast_to(extra, (num_invocations, 4)).view(np.float32) for extra in extras]
+    compare = None
+    if opcode in (D.SAMPLE_C, D.SAMPLE_C_LZ, D11.GATHER_4_C):
+        function = comparisons[sampler.comparison]
+        reference = extras[0][:, 0]
+
+        def compare(texels: np.ndarray, lanes: np.ndarray = None) -> np.ndarray:
+            local = reference if lanes is None else reference[lanes]
+            return function(local, texels[:, 0]).astype(np.float32)[:, None]
+
+    if opcode in (D101.GATHER_4, D11.GATHER_4_C):
+        return gather(texture, sampler, coords, channel, offsets, compare)[:, swizzle]
+    level = texture.levels[0]
+    sizes = (level.shape[3], level.shape[2], level.shape[1])
+    axes = 2 if texture.dimension in (RD.TEXTURE_CUBE, RD.TEXTURE_CUBE_ARRAY) else coordinates[texture.dimension][0]
+    if opcode == D.SAMPLE_L:
+        lod = extras[0][:, 0]
+    elif opcode == D.SAMPLE_C_LZ:
+        lod = np.zeros(num_invocations, dtype=np.float32)
+    elif opcode == D.SAMPLE_D:
+        lod = gradient_lod(extras[0][:, :axes], extras[1][:, :axes], sizes)
+    else:  # SAMPLE, SAMPLE_B & SAMPLE_C
+        lod = quad_lod(locate(texture, sampler, coords)[0], sizes)
+        if opcode == D.SAMPLE_B:
+            lod = lod + extras[0][:, 0]
+    out = sample(texture, sampler, coords, lod, offsets, compare)
+    if compare is not None:  # single component result
+        out = np.repeat(out[:, :1], 4, axis=1)
+    return out.view(np.uint32)[:, swizzle]
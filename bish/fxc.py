@@ -1,12 +1,17 @@
 from __future__ import annotations
+import pickle
 import struct
-from typing import Dict, Tuple
+import time
+from typing import Dict, Tuple, Union
 
 import breki
 from breki.binary import read_struct
 from breki.files.parsed import parse_first
 
+from . import buffers
+from . import cache
 from . import chunks
+from . import profiling
 
 
 class FxcHeader(breki.Struct):
@@ -18,6 +23,13 @@ class FxcHeader(breki.Struct):
 class Fxc(breki.BinaryFile):
     exts = ["*.fxc"]
     code_page = breki.CodePage("ascii", "strict")
+    lazy: bool = False
+    # ^ if True, .parse() only reads the chunk table
+    # -- RAW_* & parsed chunks are loaded the first time they are accessed
+    mapped: bool = False
+    # ^ if True, the file is memory-mapped & RAW_* chunks are memoryviews
+    profile: bool = False
+    # ^ if True, .parse() collects timings & counters in .stats
     # header
     header: FxcHeader
     # data
@@ -25,12 +37,25 @@ class Fxc(breki.BinaryFile):
     # ^ {"id": (offset, length)}
     loading_errors: Dict[str, Exception]
     # ^ {"id": Error}
+    stats: Union[profiling.ParseStats, None]
+    # ^ None unless .profile is True
 
     def __init__(self, filepath: str, archive=None, code_page=None):
         super().__init__(filepath, archive, code_page)
         self.header = FxcHeader()
         self.chunks = dict()
         self.loading_errors = dict()
+        self.stats = None
+
+    def __getattr__(self, attr: str):
+        # NOTE: only called if attr wasn't found the usual way
+        name = attr[4:] if attr.startswith("RAW_") else attr
+        chunk_table = self.__dict__.get("chunks", dict())
+        if name in chunk_table and f"RAW_{name}" not in self.__dict__:
+            self.load_chunk(name)
+            return getattr(self, attr)
+        raise AttributeError(
+            f"{self.__class__.__name__!r} object has no attribute {attr!r}")
 
     @parse_first
     def __repr__(self) -> str:
@@ -41,8 +66,7 @@ class Fxc(breki.BinaryFile):
         chunk_offsets, chunk_data = list(), list()
         # TODO: verify chunk offsets line up
         for name, (offset, length) in self.chunks.items():
-            raw_chunk = getattr(self, f"RAW_{name}")
-            assert isinstance(raw_chunk, bytes)
+            raw_chunk = bytes(getattr(self, f"RAW_{name}"))
             assert len(raw_chunk) == length
             chunk_offsets.append(struct.pack("I", offset))
             chunk_data.extend([
@@ -58,6 +82,12 @@ class Fxc(breki.BinaryFile):
         if self.is_parsed:
             return
         self.is_parsed = True
+        if self.profile:
+            self.stats = profiling.ParseStats()
+            self.stats.num_files = 1
+            start = time.perf_counter()
+        if self.mapped:
+            self.stream = buffers.MemoryStream(buffers.buffer_for(self))
         # header
         self.header = FxcHeader.from_stream(self.stream)
         assert self.header.magic == b"DXBC"
@@ -77,13 +107,59 @@ class Fxc(breki.BinaryFile):
             assert not any(
                 offset < other_offset < offset + length
                 for other_offset in chunk_offsets)
-            raw_chunk = self.stream.read(length)
-            assert len(raw_chunk) == length
-            setattr(self, f"RAW_{name}", raw_chunk)
-            if name in chunks.parser:
-                try:
-                    parsed_chunk = chunks.parser[name].from_bytes(raw_chunk)
+        if self.stats is not None:
+            self.stats.header_time = time.perf_counter() - start
+        if cache.is_enabled():
+            entry = cache.load(self.header.checksum)
+            if entry is not None:
+                if self.stats is not None:
+                    self.stats.num_cache_hits = 1
+                # NOTE: RAW_* chunks will be loaded when accessed
+                for name, parsed_chunk in entry.chunks.items():
                     setattr(self, name, parsed_chunk)
-                except Exception as exc:
-                    self.loading_errors[name] = exc
+                self.loading_errors.update(entry.loading_errors)
+                return
+        if self.lazy:
+            return
+        for name in self.chunks:
+            self.load_chunk(name)
         assert self.stream.tell() == self.size
+        if cache.is_enabled():
+            entry = cache.Entry(
+                chunks={
+                    name: getattr(self, name)
+                    for name in self.chunks
+                    if name in chunks.parser and name not in self.loading_errors},
+                loading_errors=self.loading_errors)
+            # NOTE: the cache is best-effort; a failed save shouldn't fail the parse
+            # -- TypeError is what pickle raises for most unpicklable objects
+            try:
+                cache.save(self.header.checksum, entry)
+            except (OSError, pickle.PicklingError, TypeError):
+                if self.stats is not None:
+                    self.stats.num_cache_failures = 1
+
+    def load_chunk(self, name: str):
+        """read (& parse, if supported & not already parsed) a single chunk"""
+        stats = self.stats
+        if stats is not None:
+            start = time.perf_counter()
+        offset, length = self.chunks[name]
+        self.stream.seek(offset + 8)  # skip name & length
+        raw_chunk = self.stream.read(length)
+        assert len(raw_chunk) == length
+        setattr(self, f"RAW_{name}", raw_chunk)
+        if stats is not None:
+            stats.add_read(name, length, time.perf_counter() - start)
+        already_parsed = name in self.__dict__ or name in self.loading_errors
+        if name in chunks.parser and not already_parsed:
+            if stats is not None:
+                start = time.perf_counter()
+            parsed_chunk = None
+            try:
+                parsed_chunk = chunks.parser[name].from_bytes(raw_chunk)
+                setattr(self, name, parsed_chunk)
+            except Exception as exc:
+                self.loading_errors[name] = exc
+            if stats is not None:
+                stats.add_parse(name, parsed_chunk, time.perf_counter() - start)
@@ -0,0 +1,263 @@
+"""SQLite index for corpus-wide queries"""
+from __future__ import annotations
+import fnmatch
+import os
+import re
+import sqlite3
+from typing import Dict, Iterable, List, Tuple, Union
+
+from . import fxc
+from . import vcs
+from .asm.base import operands
+
+
+stat_columns = (
+    "num_instructions", "num_temp_registers", "num_defines",
+    "num_declarations", "num_floats", "num_ints", "num_uints",
+    "num_static_flow_controls", "num_dynamic_flow_controls",
+    "num_temp_arrays", "num_arrays", "num_cuts", "num_emits",
+    "num_texture_normals", "num_texture_loads", "num_texture_comparisons",
+    "num_texture_biases", "num_texture_gradients",
+    "num_movs", "num_movcs", "num_conversions")
+# ^ chunks.Statistics attributes
+
+shader_columns = (
+    "file", "entry", "checksum", "shader_type", "version", "instruction_count",
+    *stat_columns, "errors")
+# ^ every row in shaders sets all of these; see Index.insert_shader
+
+version = 2
+# ^ bump whenever the schema changes; outdated databases are rebuilt
+tables = ("registers", "bindings", "opcodes", "shaders", "files")
+
+schema = f"""
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS shaders (
+    id INTEGER PRIMARY KEY,
+    file INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    entry TEXT NOT NULL,
+    checksum BLOB,
+    shader_type TEXT,
+    version TEXT,
+    instruction_count INTEGER,
+    {", ".join(f"{column} INTEGER" for column in stat_columns)},
+    errors TEXT);
+CREATE TABLE IF NOT EXISTS opcodes (
+    shader INTEGER NOT NULL REFERENCES shaders(id) ON DELETE CASCADE,
+    opcode TEXT NOT NULL,
+    count INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS bindings (
+    shader INTEGER NOT NULL REFERENCES shaders(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    type INTEGER,
+    bind_point INTEGER,
+    bind_count INTEGER);
+CREATE TABLE IF NOT EXISTS registers (
+    shader INTEGER NOT NULL REFERENCES shaders(id) ON DELETE CASCADE,
+    opcode TEXT NOT NULL,
+    type TEXT NOT NULL,
+    register INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS shaders_file ON shaders(file);
+CREATE INDEX IF NOT EXISTS opcodes_opcode ON opcodes(opcode);
+CREATE INDEX IF NOT EXISTS bindings_name ON bindings(name);
+CREATE INDEX IF NOT EXISTS registers_usage ON registers(opcode, type, register);
+"""
+
+register_prefixes = {
+    "cb": operands.Type.CONSTANT_BUFFER,
+    "s": operands.Type.SAMPLER,
+    "t": operands.Type.RESOURCE,
+    "u": operands.Type.UNORDERED_ACCESS_VIEW}
+# ^ {"prefix": register_type}
+# NOTE: only these register types are indexed by usage
+
+file_patterns = ("*.fxc", "*.vcs")
+# NOTE: matched against lowercase filenames
+
+
+def parse_register(register: str) -> Tuple[operands.Type, int]:
+    """"t3" -> (Type.RESOURCE, 3)"""
+    match = re.fullmatch(r"([a-z]+)([0-9]+)", register)
+    assert match is not None, f"invalid register: {register!r}"
+    prefix, index = match.groups()
+    assert prefix in register_prefixes, f"unindexed register type: {prefix!r}"
+    return register_prefixes[prefix], int(index)
+
+
+class Index:
+    """corpus of shaders stored in a SQLite database"""
+    database: sqlite3.Connection
+
+    def __init__(self, filepath: str = ":memory:"):
+        self.database = sqlite3.connect(filepath)
+        self.database.execute("PRAGMA foreign_keys = ON")
+        if self.query("PRAGMA user_version")[0][0] != version:
+            # NOTE: the index can always be rebuilt from the files, so we don't migrate
+            self.database.executescript("".join(f"DROP TABLE IF EXISTS {table};\n" for table in tables))
+            self.database.execute(f"PRAGMA user_version = {version}")
+        self.database.executescript(schema)
+
+    def __enter__(self) -> Index:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self) -> str:
+        num_files, num_shaders = self.query(
+            "SELECT (SELECT COUNT(*) FROM files), (SELECT COUNT(*) FROM shaders)")[0]
+        descriptor = f"{num_files} files {num_shaders} shaders"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    def close(self):
+        self.database.close()
+
+    # ingest
+    def update(self, paths: Iterable[str]) -> int:
+        """add new & changed files (folders are searched recursively)"""
+        num_updated = 0
+        for path in paths:
+            if os.path.isdir(path):
+                for folder, subfolders, filenames in os.walk(path):
+                    subfolders.sort()  # os.walk visits subfolders in this order
+                    for filename in sorted(filenames):
+                        if any(fnmatch.fnmatch(filename.lower(), p) for p in file_patterns):
+                            num_updated += self.update_file(os.path.join(folder, filename))
+            else:
+                num_updated += self.update_file(path)
+        return num_updated
+
+    def update_file(self, filepath: str) -> bool:
+        """returns True if the file was (re-)indexed
+        files that fail to load get a shaders row w/ only errors, so they aren't retried until changed"""
+        filepath = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        mtime_ns, size = stat.st_mtime_ns, stat.st_size
+        # NOTE: integer nanoseconds compare exactly, float seconds might not round-trip
+        rows = self.query("SELECT mtime_ns, size FROM files WHERE path=?", (filepath,))
+        if len(rows) > 0 and rows[0] == (mtime_ns, size):
+            return False  # unchanged
+        with self.database:  # transaction
+            self.database.execute("DELETE FROM files WHERE path=?", (filepath,))
+            file_id = self.database.execute(
+                "INSERT INTO files(path, mtime_ns, size) VALUES (?, ?, ?)",
+                (filepath, mtime_ns, size)).lastrowid
+            is_archive = filepath.lower().endswith(".vcs")
+            try:
+                if is_archive:
+                    archive = vcs.Vcs.from_file(filepath)
+                    archive.mapped = True
+                    for entry in archive.namelist():
+                        shader = fxc.Fxc.from_archive(archive, entry)
+                        self.add_shader(file_id, entry, shader)
+                else:
+                    self.add_shader(file_id, "", fxc.Fxc.from_file(filepath))
+            except Exception as exc:
+                self.insert_shader({
+                    "file": file_id, "entry": "",
+                    "errors": f"{'VCS' if is_archive else 'DXBC'}: {exc!r}"})
+        return True
+
+    def insert_shader(self, row: Dict[str, object]) -> int:
+        """returns shader id; columns missing from row are NULL"""
+        assert set(row).issubset(shader_columns), f"unknown columns: {set(row) - set(shader_columns)}"
+        placeholders = ", ".join("?" * len(shader_columns))
+        return self.database.execute(
+            f"INSERT INTO shaders({', '.join(shader_columns)}) VALUES ({placeholders})",
+            tuple(row.get(column) for column in shader_columns)).lastrowid
+
+    def add_shader(self, file_id: int, entry: str, shader: fxc.Fxc):
+        errors = dict()
+        try:
+            shader.parse()
+        except Exception as exc:
+            errors["DXBC"] = exc
+        errors.update(shader.loading_errors)
+        row = {"file": file_id, "entry": entry, "checksum": shader.header.checksum}
+        if "STAT" in shader.chunks and hasattr(shader, "STAT"):
+            row.update({
+                column: getattr(shader.STAT, column)
+                for column in stat_columns})
+        opcode_counts, register_usage = dict(), set()
+        if "SHEX" in shader.chunks and hasattr(shader, "SHEX"):
+            program = shader.SHEX
+            row["shader_type"] = program.type.name
+            row["version"] = "{}.{}".format(*program.version)
+            row["instruction_count"] = len(program.instructions)
+            opcode_counts = program.instructions.opcode_counts()
+            try:
+                register_usage = self.register_usage(program)
+            except Exception as exc:
+                errors["SHEX"] = exc
+        row["errors"] = "\n".join(f"{k}: {v!r}" for k, v in errors.items()) or None
+        shader_id = self.insert_shader(row)
+        self.database.executemany(
+            "INSERT INTO opcodes(shader, opcode, count) VALUES (?, ?, ?)",
+            [(shader_id, opcode.name, count) for opcode, count in opcode_counts.items()])
+        self.database.executemany(
+            "INSERT INTO registers(shader, opcode, type, register) VALUES (?, ?, ?, ?)",
+            [(shader_id, *usage) for usage in sorted(register_usage)])
+        if "RDEF" in shader.chunks and hasattr(shader, "RDEF"):
+            self.database.executemany(
+                "INSERT INTO bindings(shader, name, type, bind_point, bind_count) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (shader_id, binding.name, binding.type, binding.bind_point, binding.bind_count)
+                    for binding in shader.RDEF.resource_bindings])
+
+    @staticmethod
+    def register_usage(program) -> set:
+        """{(opcode_name, register_type_name, register_index)}"""
+        indexed_types = set(register_prefixes.values())
+        out = set()
+        for instruction in program.instructions:
+            if instruction.declaration is not None:
+                continue
+            for operand in instruction.operands:
+                if operand.type in indexed_types and len(operand.indices) > 0:
+                    index = operand.indices[0][0]
+                    if index is not None:
+                        out.add((instruction.opcode.name, operand.type.name, index))
+        return out
+
+    def prune(self) -> int:
+        """remove files which no longer exist"""
+        missing = [
+            (path,)
+            for path, in self.query("SELECT path FROM files")
+            if not os.path.exists(path)]
+        with self.database:
+            self.database.executemany("DELETE FROM files WHERE path=?", missing)
+        return len(missing)
+
+    # queries
+    def query(self, sql: str, parameters: Union[tuple, Dict] = ()) -> List[tuple]:
+        return self.database.execute(sql, parameters).fetchall()
+
+    def shaders_binding(self, name: str) -> List[Tuple[str, str]]:
+        """[(path, entry)] of shaders w/ a matching RDEF resource binding"""
+        return self.query("""
+            SELECT DISTINCT files.path, shaders.entry FROM bindings
+            JOIN shaders ON shaders.id = bindings.shader
+            JOIN files ON files.id = shaders.file
+            WHERE bindings.name = ? ORDER BY files.path, shaders.entry""", (name,))
+
+    def shaders_using(self, opcode: str, register: str = None) -> List[Tuple[str, str]]:
+        """[(path, entry)] of shaders using opcode (on register)"""
+        # e.g. .shaders_using("SAMPLE_C", "t3")
+        if register is None:
+            return self.query("""
+                SELECT DISTINCT files.path, shaders.entry FROM opcodes
+                JOIN shaders ON shaders.id = opcodes.shader
+                JOIN files ON files.id = shaders.file
+                WHERE opcodes.opcode = ? ORDER BY files.path, shaders.entry""", (opcode,))
+        register_type, index = parse_register(register)
+        return self.query("""
+            SELECT DISTINCT files.path, shaders.entry FROM registers
+            JOIN shaders ON shaders.id = registers.shader
+            JOIN files ON files.id = shaders.file
+            WHERE registers.opcode = ? AND registers.type = ? AND registers.register = ?
+            ORDER BY files.path, shaders.entry""", (opcode, register_type.name, index))
@@ -0,0 +1,125 @@
+"""parse timings & counters"""
+# NOTE: only collected if Fxc.profile is True
+from __future__ import annotations
+from typing import Any, Dict, Iterable
+
+from .asm import index
+
+
+class ParseStats:
+    """timings & counters for one or more Fxc.parse()s"""
+    num_files: int
+    num_cache_hits: int
+    num_cache_failures: int  # entries that couldn't be saved
+    header_time: float  # seconds spent on the header & chunk table
+    read_time: Dict[str, float]
+    # ^ {"id": seconds}
+    parse_time: Dict[str, float]
+    # ^ {"id": seconds}
+    bytes_read: Dict[str, int]
+    # ^ {"id": num_bytes}
+    num_errors: Dict[str, int]
+    # ^ {"id": num_loading_errors}
+    # SHEX
+    num_tokens: int
+    num_instructions: int
+    num_custom_data: int
+    num_extended: int  # extended instructions, walked w/o vectorisation
+    index_time: float  # seconds building InstructionTables; part of parse_time["SHEX"]
+
+    def __init__(self):
+        self.num_files = 0
+        self.num_cache_hits = 0
+        self.num_cache_failures = 0
+        self.header_time = 0.0
+        self.read_time = dict()
+        self.parse_time = dict()
+        self.bytes_read = dict()
+        self.num_errors = dict()
+        self.num_tokens = 0
+        self.num_instructions = 0
+        self.num_custom_data = 0
+        self.num_extended = 0
+        self.index_time = 0.0
+
+    def __add__(self, other: ParseStats) -> ParseStats:
+        out = ParseStats()
+        out += self
+        out += other
+        return out
+
+    def __iadd__(self, other: ParseStats) -> ParseStats:
+        self.num_files += other.num_files
+        self.num_cache_hits += other.num_cache_hits
+        self.num_cache_failures += other.num_cache_failures
+        self.header_time += other.header_time
+        for attr in ("read_time", "parse_time", "bytes_read", "num_errors"):
+            totals = getattr(self, attr)
+            for name, value in getattr(other, attr).items():
+                totals[name] = totals.get(name, 0) + value
+        self.num_tokens += other.num_tokens
+        self.num_instructions += other.num_instructions
+        self.num_custom_data += other.num_custom_data
+        self.num_extended += other.num_extended
+        self.index_time += other.index_time
+        return self
+
+    def __repr__(self) -> str:
+        descriptor = f"{self.num_files} files {self.total_time() * 1000:.3f}ms"
+        return f"<{self.__class__.__name__} {descriptor} @ 0x{id(self):016X}>"
+
+    @classmethod
+    def from_dict(cls, stats: Dict[str, Any]) -> ParseStats:
+        """inverse of .as_dict()"""
+        out = cls()
+        for attr, value in stats.items():
+            setattr(out, attr, value)
+        return out
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSON-friendly"""
+        return {
+            attr: value if not isinstance(value, dict) else dict(value)
+            for attr, value in vars(self).items()}
+
+    def as_lines(self) -> Iterable[str]:
+        """human-readable table"""
+        yield f"{self.num_files} files ({self.num_cache_hits} cache hits, {self.num_cache_failures} cache failures)"
+        yield f"  {'chunk':<6} {'read ms':>10} {'parse ms':>10} {'MiB':>9} {'errors':>6}"
+        yield f"  {'header':<6} {self.header_time * 1000:>10.3f}"
+        names = sorted({*self.read_time, *self.parse_time}, key=self.chunk_time, reverse=True)
+        for name in names:
+            yield " ".join([
+                f"  {name:<6}",
+                f"{self.read_time.get(name, 0) * 1000:>10.3f}",
+                f"{self.parse_time.get(name, 0) * 1000:>10.3f}",
+                f"{self.bytes_read.get(name, 0) / 2 ** 20:>9.3f}",
+                f"{self.num_errors.get(name, 0):>6}"])
+        yield " ".join([
+            f"SHEX: {self.num_tokens:,} tokens",
+            f"{self.num_instructions:,} instructions",
+            f"{self.num_custom_data:,} custom data blocks",
+            f"{self.num_extended:,} extended",
+            f"{self.index_time * 1000:.3f}ms indexing"])
+
+    def add_read(self, name: str, num_bytes: int, seconds: float):
+        self.read_time[name] = self.read_time.get(name, 0.0) + seconds
+        self.bytes_read[name] = self.bytes_read.get(name, 0) + num_bytes
+
+    def add_parse(self, name: str, parsed_chunk: Any, seconds: float):
+        self.parse_time[name] = self.parse_time.get(name, 0.0) + seconds
+        if parsed_chunk is None:
+            self.num_errors[name] = self.num_errors.get(name, 0) + 1
+        elif name == "SHEX":
+            table = parsed_chunk.instructions
+            self.num_tokens += len(parsed_chunk.tokens)
+            self.num_instructions += len(table)
+            self.num_custom_data += int((table.opcode == index.CUSTOM_DATA).sum())
+            self.num_extended += table.num_extended
+            self.index_time += table.build_time
+
+    def chunk_time(self, name: str) -> float:
+        return self.read_time.get(name, 0.0) + self.parse_time.get(name, 0.0)
+
+    def total_time(self) -> float:
+        return self.header_time + sum(map(self.chunk_time, {*self.read_time, *self.parse_time}))
@@ -0,0 +1,308 @@
+"""generate synthetic (but valid) DXBC & VCS files"""
+# NOTE: for benchmarks & fixtures, the shaders don't do anything useful
+# -- checksums are md5 hashes, not the real DXBC checksum
+from __future__ import annotations
+import hashlib
+import random
+import struct
+from typing import Dict, List, Sequence, Tuple, Union
+
+from .asm.base import opcodes
+from .asm.base.opcodes import D3D_10_0
+from .asm.base.operands import IndexRepresentation, Modifier, Type
+
+
+Index = Union[int, Tuple[int, List[int]]]
+# ^ immediate index or (immediate, relative_operand_tokens)
+
+components = {"x": 0, "y": 1, "z": 2, "w": 3}
+
+
+# -- SHEX tokens
+def instruction(opcode: opcodes.Opcode, *operands: List[int], controls: int = 0, extensions: Sequence[int] = ()) -> List[int]:
+    tokens = [token for operand in operands for token in operand]
+    if len(extensions) > 0:
+        extensions = [*(e | 0x80000000 for e in extensions[:-1]), extensions[-1]]
+    length = 1 + len(extensions) + len(tokens)
+    assert length < 0x80, "too many tokens for one instruction"
+    head = opcode.value | (controls << 11) | (length << 24)
+    head |= int(len(extensions) > 0) << 31
+    return [head, *extensions, *tokens]
+
+
+def custom_data(values: Sequence[int], data_class: int = 3) -> List[int]:
+    """defaults to an immediate constant buffer"""
+    return [D3D_10_0.CUSTOM_DATA.value | (data_class << 11), 2 + len(values), *values]
+
+
+def operand(type_: Type, *indices: Index, mode: int = 0, bits: int = 0x0F, num_components: int = 2, modifier: Modifier = Modifier.NONE) -> List[int]:
+    token = num_components | (mode << 2) | (bits << 4) | (type_.value << 12)
+    token |= len(indices) << 20
+    index_tokens = list()
+    for i, index in enumerate(indices):
+        if isinstance(index, tuple):
+            immediate, relative = index
+            representation = IndexRepresentation.IMM32_PLUS_REL
+            index_tokens.extend([immediate, *relative])
+        else:
+            representation = IndexRepresentation.IMM32
+            index_tokens.append(index)
+        token |= representation.value << (22 + 3 * i)
+    if modifier != Modifier.NONE:
+        token |= 0x80000000
+        return [token, 0x01 | (modifier.value << 6), *index_tokens]
+    return [token, *index_tokens]
+
+
+def masked(type_: Type, *indices: Index, mask: str = "xyzw") -> List[int]:
+    bits = sum(1 << components[c] for c in mask)
+    return operand(type_, *indices, mode=0, bits=bits)
+
+
+def swizzled(type_: Type, *indices: Index, swizzle: str = "xyzw", modifier: Modifier = Modifier.NONE) -> List[int]:
+    bits = sum(components[c] << (2 * i) for i, c in enumerate(swizzle))
+    return operand(type_, *indices, mode=1, bits=bits, modifier=modifier)
+
+
+def selected(type_: Type, *indices: Index, component: str = "x") -> List[int]:
+    return operand(type_, *indices, mode=2, bits=components[component])
+
+
+def immediate(*values: int) -> List[int]:
+    if len(values) == 1:
+        return [operand(Type.IMMEDIATE_32, num_components=1, bits=0)[0], *values]
+    assert len(values) == 4
+    return [operand(Type.IMMEDIATE_32, bits=0)[0], *values]
+
+
+instruction_mix = {
+    "alu": 8,
+    "sample": 2,
+    "relative": 1,
+    "modifier": 1,
+    "branch": 1,
+    "custom_data": 0.1}
+# ^ {"kind": weight}
+
+
+def shex_tokens(num_instructions: int = 256, mix: Dict[str, float] = None, seed: int = 0, num_temps: int = 8, num_constants: int = 16, num_textures: int = 4) -> List[int]:
+    """pixel shader w/ roughly num_instructions instructions"""
+    mix = instruction_mix if mix is None else mix
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    T = Type
+    body = list()
+    # declarations
+    body += instruction(D3D_10_0.DCL_GLOBAL_FLAGS, controls=1)
+    body += instruction(
+        D3D_10_0.DCL_CONSTANT_BUFFER, swizzled(T.CONSTANT_BUFFER, 0, num_constants), controls=1)
+    body += instruction(D3D_10_0.DCL_SAMPLER, operand(T.SAMPLER, 0, num_components=0, bits=0))
+    for i in range(num_textures):  # Texture2D<float4>
+        body += instruction(
+            D3D_10_0.DCL_RESOURCE, operand(T.RESOURCE, i, num_components=0, bits=0),
+            [0x5555], controls=3)
+    body += instruction(D3D_10_0.DCL_INPUT_PS, masked(T.INPUT, 1, mask="xy"), controls=2)
+    body += instruction(D3D_10_0.DCL_OUTPUT, masked(T.OUTPUT, 0))
+    body += instruction(D3D_10_0.DCL_TEMPS, [num_temps])
+
+    def temp() -> int:
+        return rng.randrange(num_temps)
+
+    for i in range(num_instructions):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "alu":
+            opcode = rng.choice([D3D_10_0.ADD, D3D_10_0.MUL, D3D_10_0.MAD, D3D_10_0.DP_4])
+            sources = [
+                swizzled(T.TEMP, temp()),
+                swizzled(T.CONSTANT_BUFFER, 0, rng.randrange(num_constants))]
+            if opcode == D3D_10_0.MAD:
+                sources.append(swizzled(T.TEMP, temp()))
+            if opcode == D3D_10_0.DP_4:
+                body += instruction(opcode, masked(T.TEMP, temp(), mask="x"), *sources)
+            else:
+                body += instruction(opcode, masked(T.TEMP, temp()), *sources)
+        elif kind == "sample":
+            body += instruction(
+                D3D_10_0.SAMPLE, masked(T.TEMP, temp()), swizzled(T.INPUT, 1, swizzle="xyxx"),
+                swizzled(T.RESOURCE, rng.randrange(num_textures)),
+                operand(T.SAMPLER, 0, num_components=0, bits=0))
+        elif kind == "relative":  # mov r#, cb0[r#.x + #]
+            relative = selected(T.TEMP, temp(), component=rng.choice("xyzw"))
+            index = (rng.randrange(num_constants), relative)
+            body += instruction(
+                D3D_10_0.MOV, masked(T.TEMP, temp()), swizzled(T.CONSTANT_BUFFER, 0, index))
+        elif kind == "modifier":  # mov r#.xyz, -|r#.xyzx|
+            body += instruction(
+                D3D_10_0.MOV, masked(T.TEMP, temp(), mask="xyz"),
+                swizzled(T.TEMP, temp(), swizzle="xyzx", modifier=Modifier.ABS_NEG))
+        elif kind == "branch":  # if_nz r#.x; add; end_if
+            body += instruction(D3D_10_0.IF, selected(T.TEMP, temp()), controls=1 << 7)
+            body += instruction(
+                D3D_10_0.ADD, masked(T.TEMP, temp()), swizzled(T.TEMP, temp()),
+                immediate(0x3F800000, 0, 0, 0))
+            body += instruction(D3D_10_0.END_IF)
+        elif kind == "custom_data":
+            body += custom_data([rng.getrandbits(32) for j in range(4 * rng.randint(1, 16))])
+        else:
+            raise ValueError(f"unknown instruction kind: {kind!r}")
+    body += instruction(D3D_10_0.MOV, masked(T.OUTPUT, 0), swizzled(T.TEMP, 0))
+    body += instruction(D3D_10_0.RET)
+    assert opcodes.opcode_for(body[0] & 0x7FF) == D3D_10_0.DCL_GLOBAL_FLAGS
+    return [0x00000050, 2 + len(body), *body]  # ps_5_0
+
+
+def shex(*args, **kwargs) -> bytes:
+    """see shex_tokens"""
+    tokens = shex_tokens(*args, **kwargs)
+    return struct.pack(f"<{len(tokens)}I", *tokens)
+
+
+# -- other chunks
+class Strings:
+    """string table, appended to the end of a chunk"""
+    offset: int
+    raw: bytearray
+    offsets: Dict[str, int]
+
+    def __init__(self, offset: int):
+        self.offset = offset
+        self.raw = bytearray()
+        self.offsets = dict()
+
+    def __getitem__(self, string: str) -> int:
+        if string not in self.offsets:
+            self.offsets[string] = self.offset + len(self.raw)
+            self.raw += string.encode("ascii") + b"\x00"
+        return self.offsets[string]
+
+
+def rdef(num_const_buffers: int = 2, num_variables: int = 8, num_bindings: int = 5, version: Tuple[int, int] = (0, 5)) -> bytes:
+    """v0.4 or v0.5 resource definitions; every 4th variable is a struct w/ 2 members"""
+    # layout: header, bindings, const buffers, variables, types, members, strings
+    assert version in ((0, 4), (0, 5))
+    is_v5 = version == (0, 5)
+    header_size, variable_size, type_size = (60, 40, 36) if is_v5 else (28, 24, 16)
+    num_structs = len(range(0, num_variables, 4)) * num_const_buffers
+    binding_offset = header_size
+    const_buffer_offset = binding_offset + 32 * num_bindings
+    variable_offset = const_buffer_offset + 24 * num_const_buffers
+    type_offset = variable_offset + variable_size * num_variables * num_const_buffers
+    num_types = 1 + num_variables * num_const_buffers  # + shared float type
+    member_offset = type_offset + type_size * num_types
+    strings = Strings(member_offset + 12 * 2 * num_structs)
+
+    def shader_type(name: str, *fields: int) -> bytes:
+        # fields: (var_class, var_type, rows, columns, num_elements, num_members, member_offset)
+        out = struct.pack("h5HI", *fields)
+        if is_v5:
+            out += struct.pack("5I", 0, 0, 0, 0, strings[name])
+        return out
+
+    header = struct.pack(
+        "4I2BhII", num_const_buffers, const_buffer_offset, num_bindings, binding_offset,
+        *version, -1, 0x100, strings["bish.synthetic"])
+    if is_v5:
+        header += struct.pack("4s7I", b"RD11", 60, 24, 32, 40, 36, 12, 0)
+    bindings = b"".join(
+        struct.pack(
+            "4Ii3I", strings[f"texture_{i}" if i > 0 else "sampler_0"],
+            2 if i > 0 else 3,  # TEXTURE or SAMPLER
+            5, 4, -1, max(0, i - 1), 1, 0)
+        for i in range(num_bindings))
+    float_type = shader_type("float", 0, 3, 1, 1, 0, 0, 0)
+    const_buffers, variables, types, members = list(), list(), [float_type], list()
+    for i in range(num_const_buffers):
+        first_variable = variable_offset + variable_size * num_variables * i
+        const_buffers.append(struct.pack(
+            "6I", strings[f"buffer_{i}"], num_variables, first_variable, 16 * num_variables, 0, 0))
+        for j in range(num_variables):
+            is_struct = j % 4 == 0
+            variables.append(struct.pack(
+                "6I", strings[f"variable_{i}_{j}"], 16 * j, 16, 2,
+                type_offset + type_size * len(types), 0))
+            if is_v5:  # no texture or sampler
+                variables[-1] += struct.pack("iIiI", -1, 0, -1, 0)
+            if is_struct:
+                first_member = member_offset + 12 * len(members)
+                types.append(shader_type(f"struct_{i}_{j}", 5, 0, 1, 2, 0, 2, first_member))
+                members.extend(
+                    struct.pack("3I", strings[name], type_offset, 4 * k)
+                    for k, name in enumerate(["a", "b"]))
+            else:
+                types.append(shader_type("float4", 1, 3, 1, 4, 0, 0, 0))
+    out = b"".join([header, bindings, *const_buffers, *variables, *types, *members])
+    assert len(out) == strings.offset
+    return out + bytes(strings.raw)
+
+
+def signature(elements: Sequence[Tuple[str, int, int, int]] = None) -> bytes:
+    """elements: [(semantic_name, semantic_index, register, mask)]"""
+    if elements is None:
+        elements = [("SV_POSITION", 0, 0, 0x0F), ("TEXCOORD", 0, 1, 0x03)]
+    strings = Strings(8 + 24 * len(elements))
+    raw_elements = b"".join(
+        struct.pack("5I2BH", strings[name], index, 0, 3, register, mask, mask, 0)
+        for name, index, register, mask in elements)
+    return struct.pack("2I", len(elements), 8) + raw_elements + bytes(strings.raw)
+
+
+def stat(num_instructions: int = 0, num_temp_registers: int = 0) -> bytes:
+    return struct.pack("37I", num_instructions, num_temp_registers, *[0] * 35)
+
+
+# -- containers
+def dxbc(chunks: Dict[str, bytes]) -> bytes:
+    """chunks: {"id": raw_chunk}"""
+    offset = 32 + 4 * len(chunks)
+    offsets, chunk_data = list(), list()
+    for name, raw_chunk in chunks.items():
+        offsets.append(offset)
+        chunk_data.append(name.encode("ascii") + struct.pack("I", len(raw_chunk)) + raw_chunk)
+        offset += len(chunk_data[-1])
+    tail = struct.pack(f"3I{len(chunks)}I", 1, offset, len(chunks), *offsets) + b"".join(chunk_data)
+    checksum = hashlib.md5(tail).digest()
+    return b"DXBC" + checksum + tail
+
+
+def fxc(num_instructions: int = 256, mix: Dict[str, float] = None, seed: int = 0) -> bytes:
+    """pixel shader w/ RDEF, ISGN, OSGN, SHEX & STAT chunks"""
+    tokens = shex_tokens(num_instructions, mix, seed)
+    return dxbc({
+        "RDEF": rdef(),
+        "ISGN": signature(),
+        "OSGN": signature([("SV_TARGET", 0, 0, 0x0F)]),
+        "SHEX": struct.pack(f"<{len(tokens)}I", *tokens),
+        "STAT": stat(num_instructions, 8)})
+
+
+def vcs(combos: Dict[int, List[Tuple[int, bytes]]], duplicates: Sequence[Tuple[int, int]] = ()) -> bytes:
+    """combos: {combo_id: [(shader_id, raw_fxc)]}; duplicates: [(combo_id, source_id)]"""
+    offset = 28 + 8 * (len(combos) + 1) + 4 + 8 * len(duplicates)
+    static_combos, blocks = list(), list()
+    for combo_id, shaders in combos.items():
+        block = [struct.pack("I", 0)]
+        for shader_id, raw_fxc in shaders:
+            block.append(struct.pack("2I", shader_id, len(raw_fxc)) + raw_fxc)
+        block.append(struct.pack("I", 0xFFFFFFFF))  # terminator
+        static_combos.append((combo_id, offset))
+        blocks.append(b"".join(block))
+        offset += len(blocks[-1])
+    static_combos.append((-1, offset))
+    header = struct.pack("I2i4I", 6, len(combos), 0, 0, 0, len(static_combos), 0)
+    header += b"".join(struct.pack("iI", *combo) for combo in static_combos)
+    header += struct.pack("I", len(duplicates))
+    header += b"".join(struct.pack("2I", *duplicate) for duplicate in duplicates)
+    return header + b"".join(blocks)
+
+
+def archive(num_combos: int = 8, shaders_per_combo: int = 4, num_instructions: int = 64, num_duplicates: int = 0, seed: int = 0) -> bytes:
+    """.vcs w/ num_combos static combos, shaders repeat every other combo"""
+    combos = {
+        combo_id: [
+            (shader_id, fxc(num_instructions, seed=seed + shader_id + combo_id % 2))
+            for shader_id in range(shaders_per_combo)]
+        for combo_id in range(num_combos)}
+    duplicates = [
+        (num_combos + i, i % num_combos)
+        for i in range(num_duplicates)]
+    return vcs(combos, duplicates)
@@ -2,12 +2,17 @@
 # https://github.com/ValveSoftware/source-sdk-2013/blob/master/src/public/materialsystem/shader_vcs_version.h
 # https://github.com/EM4Volts/vcs_repack/blob/main/vcspy.py
 from __future__ import annotations
-from typing import Dict, List, Tuple
+import hashlib
+from typing import Container, Dict, Iterator, List, Tuple
 
 import breki
 from breki.binary import read_struct
 from breki.files.parsed import parse_first
 
+from . import batch
+from . import buffers
+from . import fxc
+
 
 # TODO: .vcssubfile (patches?)
 
@@ -24,6 +29,8 @@ class VcsHeader(breki.Struct):
 class Vcs(breki.BinaryFile, breki.Archive):
     """Valve Compiled Shader (Titanfall 1 variant)"""
     exts = ["*.vcs"]
+    mapped: bool = False
+    # ^ if True, the file is memory-mapped & .read() returns memoryviews
     header: VcsHeader
     static_combos: List[Tuple[int, int]]
     # ^ [(combo_id, offset)]
@@ -31,6 +38,7 @@ class Vcs(breki.BinaryFile, breki.Archive):
     # ^ [(combo_id, source_id)]
     entries: Dict[str, Tuple[int, int]]
     # ^ {"combo_id/unknown/shader_id.fxc": (offset, length)}
+    is_header_parsed: bool
 
     def __init__(self, filepath: str, archive=None, code_page=None):
         super().__init__(filepath, archive, code_page)
@@ -38,6 +46,7 @@ class Vcs(breki.BinaryFile, breki.Archive):
         self.static_combos = list()
         self.duplicates = list()
         self.entries = dict()
+        self.is_header_parsed = False
 
     @parse_first
     def namelist(self) -> List[str]:
@@ -47,6 +56,21 @@ class Vcs(breki.BinaryFile, breki.Archive):
         if self.is_parsed:
             return
         self.is_parsed = True
+        self.parse_header()
+        for i in range(len(self.static_combos)):
+            for filename, offset, length in self.combo_entries(i):
+                assert filename not in self.entries, f"duplicate: {filename}"
+                self.entries[filename] = (offset, length)
+        assert self.stream.tell() == self.size
+
+    def parse_header(self):
+        """read everything before the first static combo block"""
+        if self.is_header_parsed:
+            return
+        self.is_header_parsed = True
+        if self.mapped:
+            self.stream = buffers.MemoryStream(buffers.buffer_for(self))
+        self.stream.seek(0)
         self.header = VcsHeader.from_stream(self.stream)
         assert self.header.version == 6
         assert self.header.num_static_combos >= 1
@@ -62,37 +86,95 @@ class Vcs(breki.BinaryFile, breki.Archive):
         # assert we got everything before headers
         gap = self.static_combos[0][1] - self.stream.tell()
         assert gap == 0, f"gap between header and shaders of {gap} bytes"
-        # build entries table
-        next_address = [
-            address
-            for combo_id, address in self.static_combos[1:]]
-        next_address.append(self.size)
+
+    def combo_entries(self, index: int) -> Iterator[Tuple[str, int, int]]:
+        """walk the index-th static combo block, yielding (filename, offset, length)"""
+        # NOTE: seeks before every read, so .stream can be used between yields
+        combo_id, address = self.static_combos[index]
+        if index + 1 < len(self.static_combos):
+            end = self.static_combos[index + 1][1]
+        else:
+            end = self.size
+        self.stream.seek(address)
+        unknown = read_struct(self.stream, "I")  # flags?
+        position = self.stream.tell()
+        while position < end:
+            self.stream.seek(position)
+            # header
+            shader_id = read_struct(self.stream, "I")
+            if shader_id >= 128:
+                unknown = shader_id
+                position = self.stream.tell()
+                continue  # new block
+            assert 0 <= shader_id <= 127, "invalid shader_id"
+            filename = f"{combo_id}/{unknown:08X}/{shader_id}.fxc"
+            length = read_struct(self.stream, "I")
+            offset = self.stream.tell()
+            assert offset + length < self.size, "hit EOF early"
+            position = offset + length
+            yield filename, offset, length
+            # NOTE: no longer verifying length
+            # -- could confirm shader is DXBC & get internal filesize
+        assert unknown == 0xFFFFFFFF, "shader block terminator missing"
+        overshot = position - end
+        assert overshot == 0, f"past end of block by {overshot} bytes"
+        self.stream.seek(position)
+
+    def iter_shaders(self, combo_ids: Container[int] = None, shader_ids: Container[int] = None) -> Iterator[Tuple[str, fxc.Fxc]]:
+        """yield (filename, Fxc) pairs in .namelist() order"""
+        # NOTE: doesn't fill .entries or keep shaders, so memory use stays flat
+        # -- stop iterating early to skip reading the rest of the shaders
+        # NOTE: filtered combos & shaders are skipped w/o being read
+        self.parse_header()
+        entries = list()
+        # ^ [(filename, offset, length)]
         for i, (combo_id, address) in enumerate(self.static_combos):
-            self.stream.seek(address)
-            unknown = read_struct(self.stream, "I")  # flags?
-            while self.stream.tell() < next_address[i]:
-                # header
-                shader_id = read_struct(self.stream, "I")
-                if shader_id >= 128:
-                    unknown = shader_id
-                    continue  # new block
-                assert 0 <= shader_id <= 127, "invalid shader_id"
-                filename = f"{combo_id}/{unknown:08X}/{shader_id}.fxc"
-                length = read_struct(self.stream, "I")
-                offset = self.stream.tell()
-                assert offset + length < self.size, "hit EOF early"
-                assert filename not in self.entries, f"duplicate: {filename}"
-                self.entries[filename] = (offset, length)
-                self.stream.seek(length, 1)
-                # NOTE: no longer verifying length
-                # -- could confirm shader is DXBC & get internal filesize
-            assert unknown == 0xFFFFFFFF, "shader block terminator missing"
-            overshot = self.stream.tell() - next_address[i]
-            assert overshot == 0, f"past end of block by {overshot} bytes"
-        assert self.stream.tell() == self.size
+            if combo_ids is not None and combo_id not in combo_ids:
+                continue
+            for filename, offset, length in self.combo_entries(i):
+                if shader_ids is not None:
+                    shader_id = int(filename.rpartition("/")[2][:-4])
+                    if shader_id not in shader_ids:
+                        continue
+                entries.append((filename, offset, length))
+        # NOTE: sorted, so the order doesn't depend on the archive's layout
+        for filename, offset, length in sorted(entries):
+            self.stream.seek(offset)
+            yield filename, fxc.Fxc.from_bytes(filename, self.stream.read(length))
 
     @parse_first
-    def read(self, filepath: str) -> bytes:
+    def aliases(self) -> Dict[str, str]:
+        """{"duplicate_combo_id/...": "source_combo_id/..."}"""
+        combo_entries = dict()
+        # ^ {combo_id: ["unknown/shader_id.fxc"]}
+        for filename in self.entries:
+            combo_id, tail = filename.split("/", 1)
+            combo_entries.setdefault(int(combo_id), list()).append(tail)
+        return {
+            f"{combo_id}/{tail}": f"{source_id}/{tail}"
+            for combo_id, _ in self.duplicates
+            for source_id in [self.source_combo(combo_id)]
+            for tail in combo_entries.get(source_id, list())}
+
+    @parse_first
+    def checksum(self, filepath: str) -> bytes:
+        """DXBC checksum (or md5 hash, if not DXBC)"""
+        offset, length = self.entries[filepath]
+        self.stream.seek(offset)
+        magic_and_checksum = bytes(self.stream.read(20))
+        if length >= 32 and magic_and_checksum[:4] == b"DXBC":
+            return magic_and_checksum[4:]
+        return hashlib.md5(self.read(filepath)).digest()
+
+    @parse_first
+    def parse_all(self, workers: int = None, deduplicate: bool = True) -> Iterator[batch.Summary]:
+        """parse every entry as an Fxc, spread across worker processes"""
+        # NOTE: workers defaults to os.cpu_count()
+        # NOTE: if deduplicate is True, identical entries are only parsed once
+        return batch.parse_archive(self, self.namelist(), workers, deduplicate)
+
+    @parse_first
+    def read(self, filepath: str) -> buffers.Buffer:
         assert filepath in self.entries
         offset, length = self.entries[filepath]
         self.stream.seek(offset)
@@ -101,3 +183,22 @@ class Vcs(breki.BinaryFile, breki.Archive):
     @parse_first
     def sizeof(self, filepath: str) -> int:
         return self.entries[filepath][1]
+
+    @parse_first
+    def source_combo(self, combo_id: int) -> int:
+        """follow .duplicates back to the combo which stores the shaders"""
+        source_of = dict(self.duplicates)
+        visited = {combo_id}
+        while combo_id in source_of:
+            combo_id = source_of[combo_id]
+            assert combo_id not in visited, "duplicates loop back on themselves"
+            visited.add(combo_id)
+        return combo_id
+
+    @parse_first
+    def unique(self) -> Dict[bytes, List[str]]:
+        """group identical entries by checksum"""
+        out = dict()
+        for filepath in self.namelist():
+            out.setdefault(self.checksum(filepath), list()).append(filepath)
+        return out
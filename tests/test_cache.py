@@ -0,0 +1,23 @@
+import pytest
+
+import bish
+from bish import cache
+from bish import synthetic
+
+
+def test_failed_save_leaves_no_temp_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache, "directory", str(tmp_path))
+    with pytest.raises(TypeError):
+        cache.save(b"\x01" * 16, cache.Entry({"SHEX": memoryview(b"")}))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_save_doesnt_break_parse(monkeypatch, tmp_path):
+    not_a_directory = tmp_path / "cache"
+    not_a_directory.write_bytes(b"")
+    monkeypatch.setattr(cache, "directory", str(not_a_directory))
+    fxc = bish.Fxc.from_bytes("a", synthetic.fxc(64))
+    fxc.profile = True
+    fxc.parse()
+    assert len(fxc.SHEX.instructions) > 0
+    assert fxc.stats.num_cache_failures == 1
@@ -0,0 +1,77 @@
+import struct
+
+from bish import chunks
+from bish import synthetic
+from bish.asm.base.opcodes import D3D_10_0 as D
+from bish.asm.base.operands import Type
+
+
+def shader(*instructions):
+    body = [token for instruction in instructions for token in instruction]
+    tokens = [0x50, 2 + len(body), *body]
+    return chunks.Shader_v5.from_bytes(struct.pack(f"{len(tokens)}I", *tokens))
+
+
+def label(index: int):
+    return synthetic.operand(Type.LABEL, index, bits=0, num_components=0)
+
+
+def test_outputs_live_across_retc():
+    dataflow = shader(
+        synthetic.instruction(D.DCL_TEMPS, [1]),
+        synthetic.instruction(D.MOV, synthetic.masked(Type.OUTPUT, 0), synthetic.immediate(1, 1, 1, 1)),
+        synthetic.instruction(D.RET_C, synthetic.selected(Type.TEMP, 0), controls=1 << 7),
+        synthetic.instruction(D.MOV, synthetic.masked(Type.OUTPUT, 0), synthetic.immediate(0, 0, 0, 0)),
+        synthetic.instruction(D.RET)).dataflow
+    assert dataflow.live_after(2) & dataflow.variables("o0") == dataflow.variables("o0")
+    assert not dataflow.is_dead(1)
+
+
+def test_subroutine_returns_to_caller():
+    dataflow = shader(
+        synthetic.instruction(D.DCL_TEMPS, [1]),
+        synthetic.instruction(D.CALL, label(0)),
+        synthetic.instruction(D.MOV, synthetic.masked(Type.OUTPUT, 0), synthetic.swizzled(Type.TEMP, 0)),
+        synthetic.instruction(D.RET),
+        synthetic.instruction(D.LABEL, label(0)),
+        synthetic.instruction(D.MOV, synthetic.masked(Type.TEMP, 0), synthetic.immediate(1, 1, 1, 1)),
+        synthetic.instruction(D.RET)).dataflow
+    assert not dataflow.is_dead(5)
+
+
+def call_shader(is_conditional: bool = False):
+    # 0 dcl_temps 1 | 1 mov r0, 2 | 2 call l0 | 3 mov o0, r0 | 4 ret
+    # 5 label l0 | 6 mov r0, 1 | 7 ret
+    if is_conditional:  # call_nz r0.y, l0
+        call = synthetic.instruction(D.CALL_C, synthetic.selected(Type.TEMP, 0, component="y"), label(0), controls=1 << 7)
+    else:
+        call = synthetic.instruction(D.CALL, label(0))
+    return shader(
+        synthetic.instruction(D.DCL_TEMPS, [1]),
+        synthetic.instruction(D.MOV, synthetic.masked(Type.TEMP, 0), synthetic.immediate(2, 2, 2, 2)),
+        call,
+        synthetic.instruction(D.MOV, synthetic.masked(Type.OUTPUT, 0), synthetic.swizzled(Type.TEMP, 0)),
+        synthetic.instruction(D.RET),
+        synthetic.instruction(D.LABEL, label(0)),
+        synthetic.instruction(D.MOV, synthetic.masked(Type.TEMP, 0), synthetic.immediate(1, 1, 1, 1)),
+        synthetic.instruction(D.RET)).dataflow
+
+
+def test_definitions_across_call():
+    dataflow = call_shader()
+    assert dataflow.definitions(3, "r0") == [6]
+    assert dataflow.definitions(3, "r0.x") == [6]
+
+
+def test_uses_across_call():
+    dataflow = call_shader()
+    assert dataflow.uses(6) == [3]
+    assert dataflow.uses(1) == []
+    assert dataflow.is_dead(1)  # killed by the callee
+
+
+def test_definitions_across_conditional_call():
+    dataflow = call_shader(is_conditional=True)
+    assert dataflow.definitions(3, "r0") == [1, 6]
+    assert dataflow.uses(1) == [2, 3]  # call_nz reads r0.y
+    assert dataflow.uses(6) == [3]
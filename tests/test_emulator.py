@@ -0,0 +1,115 @@
+import struct
+
+import numpy as np
+import pytest
+
+import bish
+from bish import cache
+from bish import chunks
+from bish import synthetic
+from bish.asm.base.opcodes import D3D_10_0 as D
+from bish.asm.base.operands import Type
+from bish.emulator import Interpreter, Program, UnsupportedInstruction, compiler, operations
+
+
+def shader(*instructions):
+    body = [token for instruction in instructions for token in instruction]
+    tokens = [0x50, 2 + len(body), *body]
+    return chunks.Shader_v5.from_bytes(struct.pack(f"{len(tokens)}I", *tokens))
+
+
+def alu_shader(opcode):
+    """opcode w/ o# destinations & v# sources"""
+    if opcode in operations.alu:
+        sources, num_dests = operations.alu[opcode][0], 1
+    else:
+        sources, dests, _ = operations.multi[opcode]
+        num_dests = len(dests)
+    return shader(
+        synthetic.instruction(
+            opcode,
+            *[synthetic.masked(Type.OUTPUT, i) for i in range(num_dests)],
+            *[synthetic.swizzled(Type.INPUT, i) for i in range(len(sources))]),
+        synthetic.instruction(D.RET))
+
+
+def branch_shader():
+    return shader(
+        synthetic.instruction(D.DCL_TEMPS, [1]),
+        synthetic.instruction(D.MOV, synthetic.masked(Type.TEMP, 0), synthetic.swizzled(Type.INPUT, 0)),
+        synthetic.instruction(D.IF, synthetic.selected(Type.INPUT, 1), controls=1 << 7),
+        synthetic.instruction(D.ADD, synthetic.masked(Type.OUTPUT, 0), synthetic.swizzled(Type.TEMP, 0), synthetic.swizzled(Type.INPUT, 2)),
+        synthetic.instruction(D.ELSE),
+        synthetic.instruction(D.MUL, synthetic.masked(Type.OUTPUT, 0), synthetic.swizzled(Type.TEMP, 0), synthetic.swizzled(Type.INPUT, 2)),
+        synthetic.instruction(D.END_IF),
+        synthetic.instruction(D.RET))
+
+
+def inputs(num_invocations: int = 8):
+    values = np.random.default_rng(0).standard_normal((num_invocations, 3, 4)).astype(np.float32)
+    values[::2, 1] = 0  # every other invocation takes the ELSE branch
+    return values.view(np.uint32)
+
+
+alu_opcodes = sorted([*operations.alu, *operations.multi], key=lambda opcode: opcode.name)
+
+
+@pytest.mark.parametrize("opcode", alu_opcodes, ids=lambda opcode: opcode.name)
+def test_alu_opcodes_run(opcode):
+    state = Interpreter(alu_shader(opcode)).run(8, inputs())
+    assert state.outputs.shape[:2] == (8, 2 if opcode in operations.multi else 1)
+
+
+def test_add():
+    v = inputs()
+    state = Interpreter(alu_shader(D.ADD)).run(8, v)
+    expected = v[:, 0].view(np.float32) + v[:, 1].view(np.float32)
+    assert np.array_equal(state.outputs[:, 0].view(np.float32), expected)
+
+
+def test_unsupported_opcode():
+    with pytest.raises(UnsupportedInstruction) as error:
+        Interpreter(shader(
+            synthetic.instruction(D.DCL_TEMPS, [1]),
+            synthetic.instruction(D.MOV, synthetic.masked(Type.OUTPUT, 0), synthetic.swizzled(Type.INPUT, 0)),
+            synthetic.instruction(D.EMIT),
+            synthetic.instruction(D.RET)))
+    assert error.value.opcode == D.EMIT
+    assert error.value.pc == 2
+
+
+def test_unsupported_destination():
+    with pytest.raises(UnsupportedInstruction) as error:
+        Interpreter(shader(
+            synthetic.instruction(D.MOV, synthetic.masked(Type.CONSTANT_BUFFER, 0, 0), synthetic.swizzled(Type.INPUT, 0)),
+            synthetic.instruction(D.RET)))
+    assert error.value.opcode == D.MOV
+    assert error.value.pc == 0
+
+
+def test_undecoded_instruction():
+    with pytest.raises(UnsupportedInstruction) as error:
+        Interpreter(shader(
+            synthetic.instruction(D.ADD, [0xFFFFFFFF], [0x00000001]),
+            synthetic.instruction(D.RET)))
+    assert error.value.opcode == D.ADD
+
+
+@pytest.mark.parametrize(
+    "shader_for", [*(lambda opcode=opcode: alu_shader(opcode) for opcode in alu_opcodes), branch_shader],
+    ids=[*(opcode.name for opcode in alu_opcodes), "branch"])
+def test_program_matches_interpreter(shader_for):
+    shex = shader_for()
+    expected = Interpreter(shex).run(8, inputs())
+    state = Program.from_shader(shex).run(8, inputs())
+    assert np.array_equal(state.outputs, expected.outputs)
+    assert np.array_equal(state.temps, expected.temps)
+
+
+def test_unsupported_not_cached(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache, "directory", str(tmp_path))
+    tokens = [0x50, 4, *synthetic.instruction(D.EMIT), *synthetic.instruction(D.RET)]
+    fxc = bish.Fxc.from_bytes("emit", synthetic.dxbc({"SHEX": struct.pack("4I", *tokens)}))
+    with pytest.raises(UnsupportedInstruction):
+        compiler.program_for(fxc)
+    assert list(tmp_path.glob("*.kernels.py")) == []
@@ -0,0 +1,40 @@
+import os
+import sqlite3
+
+from bish import synthetic
+from bish.index import Index
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    filepath = tmp_path / "a.fxc"
+    filepath.write_bytes(synthetic.fxc(64))
+    with Index() as index:
+        assert index.update([str(tmp_path)]) == 1
+        assert index.update([str(tmp_path)]) == 0
+        mtime_ns = os.stat(filepath).st_mtime_ns
+        os.utime(filepath, ns=(mtime_ns, mtime_ns + 1))  # too small a change for float seconds
+        assert index.update([str(tmp_path)]) == 1
+        assert index.query("SELECT mtime_ns FROM files") == [(mtime_ns + 1,)]
+
+
+def test_errored_files_get_a_full_row(tmp_path):
+    (tmp_path / "good.fxc").write_bytes(synthetic.fxc(64))
+    (tmp_path / "bad.fxc").write_bytes(b"not a shader")
+    with Index() as index:
+        index.update([str(tmp_path)])
+        good, bad = index.query("""
+            SELECT shaders.* FROM shaders JOIN files ON files.id = shaders.file
+            ORDER BY files.path DESC""")
+        assert len(good) == len(bad)
+        assert bad[-1] is not None  # errors
+
+
+def test_outdated_schema_is_rebuilt(tmp_path):
+    filepath = str(tmp_path / "index.db")
+    database = sqlite3.connect(filepath)
+    database.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT, mtime REAL, size INTEGER)")
+    database.commit()
+    database.close()
+    with Index(filepath) as index:
+        columns = [row[1] for row in index.query("PRAGMA table_info(files)")]
+        assert "mtime_ns" in columns
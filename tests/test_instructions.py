@@ -0,0 +1,30 @@
+import numpy as np
+
+from bish import synthetic
+from bish.asm.base.instructions import FullInstruction
+from bish.asm.base.opcodes import D3D_10_0 as D
+from bish.asm.base.operands import Type
+from bish.asm.table import InstructionTable
+
+
+def test_as_tokens_round_trip():
+    table = InstructionTable(np.array(synthetic.shex_tokens(512), dtype=np.uint32))
+    for i, instruction in enumerate(table):
+        instruction.tokens = None  # encode from decoded attributes only
+        assert instruction.as_tokens() == table.instruction_tokens(i).tolist()
+
+
+def test_as_tokens_after_edit():
+    tokens = synthetic.instruction(D.MOV, synthetic.masked(Type.TEMP, 0), synthetic.swizzled(Type.TEMP, 1))
+    instruction = FullInstruction.from_tokens(tokens)
+    instruction.operands[1].indices = [(2, None)]
+    expected = synthetic.instruction(D.MOV, synthetic.masked(Type.TEMP, 0), synthetic.swizzled(Type.TEMP, 2))
+    assert instruction.as_tokens() == expected
+
+
+def test_decode_fallback():
+    tokens = synthetic.instruction(D.ADD, [0xFFFFFFFF], [0x00000001])
+    instruction = FullInstruction.from_tokens(tokens)
+    assert instruction.error is not None
+    assert instruction.operands == []
+    assert instruction.as_tokens() == tokens
@@ -0,0 +1,22 @@
+import pytest
+
+from bish import synthetic
+from bish.chunks import rdef
+
+
+def test_mapped_matches_bytes():
+    raw = synthetic.rdef(num_const_buffers=4, num_variables=16, num_bindings=8)
+    expected = rdef.ResourceDefinition.from_bytes(raw)
+    mapped = rdef.ResourceDefinition.from_bytes(memoryview(bytearray(raw)))
+    assert mapped.creator == expected.creator
+    assert [b.name for b in mapped.resource_bindings] == [b.name for b in expected.resource_bindings]
+    assert [v.name for v in mapped.const_buffers[-1].variables] == [v.name for v in expected.const_buffers[-1].variables]
+    assert mapped.consumed == expected.consumed
+
+
+def test_unterminated_string():
+    cache = rdef.Cache()
+    cache.raw = memoryview(b"\x00" + b"a" * 100)
+    assert cache.find_null(0) == 0
+    with pytest.raises(ValueError):
+        cache.find_null(1)
@@ -0,0 +1,12 @@
+from bish import synthetic
+from bish.vcs import Vcs
+
+
+def test_iter_shaders_order():
+    raw_fxc = synthetic.fxc(16)
+    raw_vcs = synthetic.vcs({
+        5: [(3, raw_fxc), (1, raw_fxc)],
+        1: [(2, raw_fxc)]})
+    names = [name for name, shader in Vcs.from_bytes("a.vcs", raw_vcs).iter_shaders()]
+    assert names == Vcs.from_bytes("a.vcs", raw_vcs).namelist()
+    assert names[0].startswith("1/")
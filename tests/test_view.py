@@ -0,0 +1,36 @@
+import numpy as np
+
+from bish import chunks
+from bish import synthetic
+from bish.asm.view import Viewer
+
+
+def viewer(num_instructions: int = 100, page_size: int = 32):
+    shader = chunks.Shader_v5.from_bytes(np.array(synthetic.shex_tokens(num_instructions), dtype="<u4").tobytes())
+    return Viewer(shader, page_size=page_size)
+
+
+def test_paging_moves_whole_pages():
+    view = viewer()
+    last = len(view) - view.page_size
+    view.seek(5)
+    view.next()
+    assert view.position == 5 + view.page_size
+    view.seek(last - 3)
+    view.next()
+    assert view.position == last  # clamped, the last page is still full
+    view.next()
+    assert view.position == last
+    view.previous()
+    assert view.position == last - view.page_size
+    view.seek(3)
+    view.previous()
+    assert view.position == 0
+
+
+def test_short_listing():
+    view = viewer(8)
+    assert len(view) < view.page_size
+    view.next()
+    assert view.position == 0
+    assert len(view.page().splitlines()) >= len(view)